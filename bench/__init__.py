@@ -0,0 +1,4 @@
+"""
+Pakiet `bench` zawiera benchmarki wydajności logiki `core`
+(uruchamiane ręcznie, np. `python -m bench.bench_normalize`).
+"""
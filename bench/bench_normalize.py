@@ -0,0 +1,64 @@
+"""Benchmark normalize_xml_structure: czas dla 10 … 10 000 datasource'ów w jednym <datasources>.
+
+Uruchomienie: python -m bench.bench_normalize
+Przy liniowej złożoności czas na jeden datasource powinien być w przybliżeniu stały.
+"""
+import copy
+import time
+
+from lxml import etree
+
+from core.utils import normalize_xml_structure
+
+SIZES = (10, 100, 1000, 10000)
+
+_DATASOURCE = """        <datasource jndi-name="java:/jdbc/DS{i}" pool-name="DS{i}Pool" enabled="true">
+            <driver>oracle</driver>
+            <!--<connection-url>jdbc:oracle:thin:@10.0.{a}.{b}:1521:PROD</connection-url>-->
+            <!--Produkcja-->
+            <connection-url>jdbc:oracle:thin:@10.1.{a}.{b}:1521:TEST</connection-url>
+            <!--<security>
+                <user-name>prod_{i}</user-name>
+                <password>secret</password>
+            </security>-->
+            <security>
+                <user-name>test_{i}</user-name>
+                <password>secret</password>
+            </security>
+        </datasource>
+        <!--<datasource jndi-name="java:/jdbc/Old{i}" pool-name="Old{i}"/>--><!--wycofany {i}-->
+"""
+
+
+def make_document(n):
+    body = "".join(_DATASOURCE.format(i=i, a=i // 250, b=i % 250) for i in range(n))
+    xml = ('<subsystem xmlns="urn:jboss:domain:datasources:5.0">\n    <datasources>\n'
+           f"{body}    </datasources>\n</subsystem>\n")
+    return etree.ElementTree(etree.fromstring(xml.encode("utf-8")))
+
+
+def measure(n, repeat=3):
+    tree = make_document(n)
+    best = None
+    for _ in range(repeat):
+        work = copy.deepcopy(tree)
+        t0 = time.perf_counter()
+        normalize_xml_structure(work)
+        elapsed = time.perf_counter() - t0
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    print(f"{'datasources':>12} {'czas [s]':>10} {'µs / datasource':>16}")
+    results = []
+    for n in SIZES:
+        elapsed = measure(n, repeat=1 if n >= 10000 else 3)
+        results.append((n, elapsed))
+        print(f"{n:>12} {elapsed:>10.4f} {elapsed / n * 1e6:>16.1f}")
+    (n0, t0), (n1, t1) = results[1], results[-1]
+    print(f"wzrost czasu {n0} → {n1}: x{t1 / t0:.1f} (liniowo: x{n1 / n0:.0f})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""Benchmark podglądu zmian dla dużego pliku: przygotowanie DiffModel (w tle, poza wątkiem UI)
+oraz otwarcie podglądu – pierwsza partia wierszy, a jeśli dostępny jest ekran, także jej wstawienie do HunkView.
+
+Uruchomienie: python -m bench.bench_preview [liczba_datasource'ów]
+Domyślnie ok. 5 MB XML; otwarcie podglądu powinno zająć poniżej 200 ms niezależnie od rozmiaru pliku.
+"""
+import itertools
+import os
+import sys
+import tempfile
+import time
+
+from core.processor import XMLProcessor
+from core.utils import serialize_xml
+from ui.diff_view import BATCH_LINES, model_rows
+
+from .bench_normalize import make_document
+
+DATASOURCES = 7000
+TARGET_URL = "jdbc:oracle:thin:@10.0.0.5:1521:PROD"
+TARGET_USER = "prod_0"
+
+
+def _open_view(model):
+    """Czas utworzenia HunkView z pierwszą partią wierszy albo None, gdy brak ekranu."""
+    try:
+        import tkinter as tk
+        root = tk.Tk()
+    except Exception:
+        return None
+    try:
+        from ui.diff_view import HunkView
+        t0 = time.perf_counter()
+        view = HunkView(root, False, dict(bg="#FFFFFF", fg="#000000"))
+        view.pack(fill="both", expand=True)
+        view.show_model(model)
+        root.update_idletasks()
+        return time.perf_counter() - t0
+    finally:
+        root.destroy()
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else DATASOURCES
+    data = serialize_xml(make_document(n))
+    fd, path = tempfile.mkstemp(prefix="flyboss-bench-", suffix=".xml")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        lines = data.count(b"\n")
+        print(f"plik {len(data) / 2 ** 20:.1f} MiB, {lines} linii")
+
+        t0 = time.perf_counter()
+        diff = XMLProcessor().diff_files([path], TARGET_URL, TARGET_USER, keep_model=True)[0]
+        print(f"{'diff w tle (parsowanie + model)':<36} {time.perf_counter() - t0:>8.3f} s"
+              f"   +{diff.added} −{diff.removed}, hunków: {diff.hunks}")
+
+        t0 = time.perf_counter()
+        rows = list(itertools.islice(model_rows(diff.model), BATCH_LINES))
+        print(f"{'pierwsza partia wierszy':<36} {(time.perf_counter() - t0) * 1e3:>8.1f} ms   ({len(rows)})")
+
+        opened = _open_view(diff.model)
+        if opened is None:
+            print(f"{'otwarcie HunkView':<36} {'—':>8}      (brak ekranu)")
+        else:
+            print(f"{'otwarcie HunkView':<36} {opened * 1e3:>8.1f} ms")
+    finally:
+        os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""Benchmark ścieżek zapisu: bezpośredni zapis (dawny tree.write), atomic_write (fsync na plik)
+oraz WriteBatch (jedna synchronizacja na całą partię + fsync katalogu).
+
+Uruchomienie: python -m bench.bench_write [liczba_plików] [katalog]
+Domyślnie katalog tymczasowy – czas fsync zależy od systemu plików, więc warto wskazać
+katalog na tym samym dysku co konfiguracja serwera.
+"""
+import shutil
+import sys
+import tempfile
+import time
+
+from core.atomic import WriteBatch, atomic_write
+from core.utils import serialize_xml
+
+from .bench_normalize import make_document
+
+FILES = 200
+
+
+def _direct(paths, data):
+    for p in paths:
+        with open(p, "wb") as f:
+            f.write(data)
+
+
+def _atomic(paths, data):
+    for p in paths:
+        atomic_write(p, data)
+
+
+def _batch(paths, data):
+    batch = WriteBatch()
+    for p in paths:
+        batch.stage(p, data)
+    errors = batch.commit()
+    if errors:
+        raise next(iter(errors.values()))
+
+
+METHODS = (
+    ("bezpośredni (bez ochrony)", _direct),
+    ("atomic_write (fsync/plik)", _atomic),
+    ("WriteBatch (sync/partia)", _batch),
+)
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else FILES
+    base = sys.argv[2] if len(sys.argv) > 2 else None
+    data = serialize_xml(make_document(20))
+    work = tempfile.mkdtemp(prefix="flyboss-bench-", dir=base)
+    try:
+        paths = [f"{work}/ds_{i:05d}.xml" for i in range(n)]
+        _direct(paths, data)
+        print(f"{n} plików po {len(data) // 1024} KiB w {work}")
+        print(f"{'metoda':<28} {'czas [s]':>10} {'ms / plik':>10}")
+        for name, fn in METHODS:
+            t0 = time.perf_counter()
+            fn(paths, data)
+            elapsed = time.perf_counter() - t0
+            print(f"{name:<28} {elapsed:>10.4f} {elapsed / n * 1e3:>10.3f}")
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,248 @@
+"""Generator syntetycznych plików datasource JBoss/WildFly do benchmarków.
+
+Pliki przypominają rzeczywiste konfiguracje: wiele datasource'ów (także xa-datasource),
+zakomentowane alternatywne URL i bloki <security> (jednoliniowe, wieloliniowe, z xmlns w komentarzu),
+etykiety środowisk sklejone z komentarzem, niezwiązane komentarze, różne układy dokumentu
+(*-ds.xml IronJacamar, podsystem, pełny standalone.xml), wcięcia (spacje/tabulatory), końce linii CRLF
+oraz opcjonalne wypełnienie do zadanego rozmiaru. Wynik zależy wyłącznie od ziarna.
+
+Uruchomienie: python -m bench.corpus KATALOG [--files N] [--datasources 5:30] [--seed S] [--crlf 0.3] [--padding-kb 0]
+"""
+import argparse
+import os
+import random
+
+LAYOUTS = ("ironjacamar", "subsystem", "standalone")
+INDENTS = ("    ", "  ", "\t")
+
+_CITIES = ("Warszawa", "Kraków", "Gdańsk", "Wrocław", "Poznań", "Łódź", "Szczecin", "Lublin", "Katowice",
+           "Białystok", "Rzeszów", "Olsztyn")
+_APPS = ("crm", "erp", "billing", "auth", "report", "audit", "stock", "hr", "mail", "portal")
+_NOISE = (
+    "TODO: przenieść do konfiguracji środowiska",
+    "nie zmieniać bez zgody DBA",
+    "pula zwiększona po incydencie INC-{n}",
+    "stara konfiguracja – do usunięcia",
+    "==================== {app} ====================",
+    "timeout ustawiony pod raporty nocne",
+)
+_NS = {
+    "ironjacamar": "http://www.jboss.org/ironjacamar/schema",
+    "subsystem": "urn:jboss:domain:datasources:5.0",
+    "standalone": "urn:jboss:domain:datasources:7.0",
+}
+
+
+def _span(value):
+    return value if isinstance(value, tuple) else (value, value)
+
+
+class CorpusSpec:
+    """Parametry korpusu. Zakresy (min, max) są losowane dla każdego pliku/datasource'a,
+    ułamki to prawdopodobieństwa."""
+
+    def __init__(self, datasources=(5, 30), url_alternatives=(3, 8), user_alternatives=(1, 4),
+                 noise_comments=(0, 4), environments=8, layouts=LAYOUTS, indents=INDENTS, crlf=0.3, xa=0.1,
+                 inline_xmlns=0.3, glued_labels=0.3, multiline_security=0.3, all_commented=0.05, padding_kb=0):
+        self.datasources = _span(datasources)
+        self.url_alternatives = _span(url_alternatives)
+        self.user_alternatives = _span(user_alternatives)
+        self.noise_comments = _span(noise_comments)
+        self.environments = max(environments, self.url_alternatives[1] + 1, self.user_alternatives[1] + 1)
+        self.layouts = tuple(layouts)
+        self.indents = tuple(indents)
+        self.crlf = crlf
+        self.xa = xa
+        self.inline_xmlns = inline_xmlns
+        self.glued_labels = glued_labels
+        self.multiline_security = multiline_security
+        self.all_commented = all_commented
+        self.padding_kb = padding_kb
+
+    def to_dict(self):
+        return {k: list(v) if isinstance(v, tuple) else v for k, v in vars(self).items()}
+
+    def environment(self, k):
+        """(etykieta, URL, użytkownik) środowiska k – wspólne dla wszystkich plików korpusu."""
+        label = _CITIES[k % len(_CITIES)] + ("" if k < len(_CITIES) else str(k // len(_CITIES)))
+        sid = "".join(ch for ch in label.upper() if ch.isascii() and ch.isalnum())[:3] + f"DB{k}"
+        return label, f"jdbc:oracle:thin:@192.168.{100 + k // 250}.{10 + k % 240}:1521:{sid}", f"app_env{k}"
+
+
+def targets(spec, k=1):
+    """URL i użytkownik środowiska k – do przełączania w benchmarkach aktywacji/zapisu."""
+    _label, url, user = spec.environment(k)
+    return url, user
+
+
+class _Writer:
+    def __init__(self, indent):
+        self.indent = indent
+        self.lines = []
+
+    def add(self, depth, text):
+        self.lines.append(self.indent * depth + text)
+
+
+def _datasource(w, rng, spec, depth, i, ns):
+    n_url = rng.randint(*spec.url_alternatives)
+    n_user = rng.randint(*spec.user_alternatives)
+    envs = rng.sample(range(spec.environments), max(n_url, n_user) + 1)
+    live = envs[0] if rng.random() >= spec.all_commented else None
+    app = _APPS[i % len(_APPS)]
+    xa = rng.random() < spec.xa
+    tag = "xa-datasource" if xa else "datasource"
+    w.add(depth, f'<{tag} jndi-name="java:/jdbc/{app.capitalize()}DS{i}" pool-name="{app.capitalize()}DS{i}Pool" '
+                 f'enabled="true" use-java-context="true">')
+    d = depth + 1
+    for _ in range(rng.randint(*spec.noise_comments)):
+        w.add(d, "<!-- " + rng.choice(_NOISE).format(n=rng.randint(1000, 9999), app=app.upper()) + " -->")
+    if xa:
+        w.add(d, '<xa-datasource-class>oracle.jdbc.xa.client.OracleXADataSource</xa-datasource-class>')
+    w.add(d, "<driver>oracle</driver>")
+
+    order = list(envs[:n_url + 1])
+    rng.shuffle(order)
+    for k in order:
+        label, url, _user = spec.environment(k)
+        if k == live:
+            w.add(d, f"<connection-url>{url}</connection-url>")
+            w.add(d, f"<!--{label}-->")
+            continue
+        attr = f' xmlns="{ns}"' if rng.random() < spec.inline_xmlns else ""
+        space = " " if rng.random() < 0.1 else ""
+        comment = f"<!--<connection-url{attr}>{space}{url}</connection-url>-->"
+        if rng.random() < spec.glued_labels:
+            w.add(d, f"{comment}<!--{label}-->")
+        else:
+            w.add(d, comment)
+            w.add(d, f"<!--{label}-->")
+
+    order = list(envs[:n_user + 1])
+    rng.shuffle(order)
+    for k in order:
+        _label, _url, user = spec.environment(k)
+        if k == live:
+            w.add(d, "<security>")
+            w.add(d + 1, f"<user-name>{user}</user-name>")
+            w.add(d + 1, f"<password>{user.upper()}_pw</password>")
+            w.add(d, "</security>")
+        elif rng.random() < spec.multiline_security:
+            w.add(d, "<!--")
+            w.add(d, f'<security xmlns="{ns}">' if rng.random() < spec.inline_xmlns else "<security>")
+            w.add(d + 1, f"<user-name>{user}</user-name>")
+            w.add(d + 1, f"<password>{user.upper()}_pw</password>")
+            w.add(d, "</security>")
+            w.add(d, "-->")
+        else:
+            attr = f' xmlns="{ns}"' if rng.random() < spec.inline_xmlns else ""
+            w.add(d, "<!--<security>")
+            w.add(d + 2, f"<user-name{attr}>{user}</user-name>")
+            w.add(d + 2, f"<password{attr}>{user.upper()}_pw</password>")
+            w.add(d, "</security>-->")
+
+    w.add(d, "<validation>")
+    w.add(d + 1, "<check-valid-connection-sql>SELECT 1 FROM DUAL</check-valid-connection-sql>")
+    w.add(d + 1, "<background-validation>true</background-validation>")
+    w.add(d, "</validation>")
+    w.add(d, "<timeout>")
+    w.add(d + 1, f"<blocking-timeout-millis>{rng.choice((5000, 10000, 30000))}</blocking-timeout-millis>")
+    w.add(d, "</timeout>")
+    w.add(depth, f"</{tag}>")
+
+
+def _padding(w, rng, depth, size_kb):
+    """Niezwiązane podsystemy/komentarze – zwiększają rozmiar pliku bez nowych datasource'ów."""
+    n = 0
+    while sum(len(line) for line in w.lines) < size_kb * 1024:
+        w.add(depth, f'<subsystem xmlns="urn:jboss:domain:logging:{8 + n % 3}.0">')
+        w.add(depth + 1, f'<periodic-rotating-file-handler name="FILE{n}" autoflush="true">')
+        w.add(depth + 2, f'<file relative-to="jboss.server.log.dir" path="server{n}.log"/>')
+        w.add(depth + 2, "<!-- rotacja dzienna, " + "x" * rng.randint(10, 80) + " -->")
+        w.add(depth + 1, "</periodic-rotating-file-handler>")
+        w.add(depth, "</subsystem>")
+        n += 1
+
+
+def make_file(rng, spec):
+    """Treść (bytes) jednego pliku korpusu."""
+    layout = rng.choice(spec.layouts)
+    w = _Writer(rng.choice(spec.indents))
+    ns = _NS[layout]
+    quote = rng.choice(("'", '"'))
+    w.lines.append(f"<?xml version={quote}1.0{quote} encoding={quote}UTF-8{quote}?>")
+    n = rng.randint(*spec.datasources)
+    if layout == "ironjacamar":
+        w.add(0, f'<datasources xmlns="{ns}">')
+        for i in range(n):
+            _datasource(w, rng, spec, 1, i, ns)
+        w.add(0, "</datasources>")
+    elif layout == "subsystem":
+        w.add(0, f'<subsystem xmlns="{ns}">')
+        w.add(1, "<datasources>")
+        for i in range(n):
+            _datasource(w, rng, spec, 2, i, ns)
+        w.add(1, "</datasources>")
+        w.add(0, "</subsystem>")
+    else:
+        w.add(0, '<server xmlns="urn:jboss:domain:19.0">')
+        w.add(1, "<profile>")
+        if spec.padding_kb:
+            _padding(w, rng, 2, spec.padding_kb)
+        w.add(2, f'<subsystem xmlns="{ns}">')
+        w.add(3, "<datasources>")
+        for i in range(n):
+            _datasource(w, rng, spec, 4, i, ns)
+        w.add(3, "</datasources>")
+        w.add(2, "</subsystem>")
+        w.add(1, "</profile>")
+        w.add(0, "</server>")
+    if spec.padding_kb and layout != "standalone":
+        w.lines[-1:-1] = [f"<!-- {'-' * 70} -->"] * (spec.padding_kb * 1024 // 80)
+    eol = "\r\n" if rng.random() < spec.crlf else "\n"
+    return (eol.join(w.lines) + eol).encode("utf-8")
+
+
+def generate_corpus(directory, files, spec=None, seed=0):
+    """Zapisuje `files` plików do `directory`; zwraca listę ścieżek."""
+    spec = spec or CorpusSpec()
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for i in range(files):
+        rng = random.Random(f"{seed}:{i}")
+        path = os.path.join(directory, f"ds_{i:05d}.xml")
+        with open(path, "wb") as f:
+            f.write(make_file(rng, spec))
+        paths.append(path)
+    return paths
+
+
+def parse_range(text):
+    lo, _sep, hi = text.partition(":")
+    return int(lo), int(hi or lo)
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(prog="python -m bench.corpus", description="Generator syntetycznego korpusu plików datasource.")
+    p.add_argument("directory")
+    p.add_argument("--files", type=int, default=50)
+    p.add_argument("--datasources", type=parse_range, default=(5, 30), help="liczba datasource'ów w pliku, np. 5:30")
+    p.add_argument("--url-alternatives", type=parse_range, default=(3, 8))
+    p.add_argument("--user-alternatives", type=parse_range, default=(1, 4))
+    p.add_argument("--noise", type=parse_range, default=(0, 4), help="niezwiązane komentarze na datasource")
+    p.add_argument("--crlf", type=float, default=0.3)
+    p.add_argument("--padding-kb", type=int, default=0)
+    p.add_argument("--seed", type=int, default=0)
+    args = p.parse_args(argv)
+    spec = CorpusSpec(datasources=args.datasources, url_alternatives=args.url_alternatives,
+                      user_alternatives=args.user_alternatives, noise_comments=args.noise, crlf=args.crlf,
+                      padding_kb=args.padding_kb)
+    paths = generate_corpus(args.directory, args.files, spec, args.seed)
+    size = sum(os.path.getsize(x) for x in paths)
+    url, user = targets(spec)
+    print(f"{len(paths)} plików, {size / 1024:.0f} KiB w {args.directory}")
+    print(f"przykładowy cel: --url '{url}' --user '{user}'")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,313 @@
+"""Zestaw benchmarków na syntetycznym korpusie (bench.corpus): skan strumieniowy i drzewowy,
+normalizacja, aktywacja URL/użytkownika (w całym pliku i po datasource'ach), kopie zapasowe,
+zapis grupowy oraz pełne zastosowanie zmian do N plików (jeden proces, pula procesów, profil środowiska).
+
+Każdy scenariusz jest powtarzany `--repeat` razy na świeżej kopii korpusu; mierzony jest tylko
+właściwy etap (parsowanie potrzebne do normalizacji/aktywacji odbywa się przed pomiarem).
+Scenariusze z CHECKS sprawdzają też wynik (poza pomiarem) – np. kolejność reguł profilu środowiska.
+Wyniki można zapisać do JSON (--out) i porównać z wcześniejszym przebiegiem (--compare).
+Nic nie trafia do ~/.jw_ds_manager – ustawienia i kopie zapasowe są w katalogu tymczasowym.
+
+Uruchomienie: python -m bench.suite [--files 200] [--datasources 5:30] [--repeat 3] [--only scan_stream,write]
+                                    [--out wyniki.json] [--compare poprzednie.json]
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+from lxml import etree
+
+from config.settings_manager import SettingsManager
+from core.atomic import WriteBatch
+from core.backup import BackupStore, new_operation_id
+from core.environments import EnvironmentProfile, ProfileRule
+from core.processor import XMLProcessor
+from core.scanner import scan_urls_and_users
+from core.utils import normalize_xml_structure, parse_xml_bytes, serialize_xml, tree_cache
+
+from .corpus import CorpusSpec, generate_corpus, targets, parse_range
+
+FILES = 200
+REPEAT = 3
+
+
+class _Context:
+    def __init__(self, work, corpus, spec, settings):
+        self.work = work
+        self.corpus = corpus
+        self.spec = spec
+        self.settings = settings
+        self.url, self.user = targets(spec)
+        self._runs = 0
+
+    def fresh_copy(self):
+        """Kopia korpusu dla scenariuszy, które modyfikują pliki."""
+        self._runs += 1
+        directory = os.path.join(self.work, f"run{self._runs}")
+        shutil.copytree(os.path.dirname(self.corpus[0]), directory)
+        tree_cache.invalidate()
+        return [os.path.join(directory, os.path.basename(p)) for p in self.corpus]
+
+    def parsed(self, normalized=False):
+        trees = []
+        for p in self.corpus:
+            with open(p, "rb") as f:
+                tree = parse_xml_bytes(f.read(), p)
+            if normalized:
+                normalize_xml_structure(tree)
+            trees.append(tree)
+        return trees
+
+
+# --- scenariusze: setup(ctx) -> stan, run(ctx, stan) jest mierzone ---
+
+def _scan_stream(ctx, _state):
+    for p in ctx.corpus:
+        scan_urls_and_users(p)
+
+
+def _scan_tree_setup(_ctx):
+    tree_cache.invalidate()
+
+
+def _scan_tree(ctx, _state):
+    proc = XMLProcessor(ctx.settings)
+    for p in ctx.corpus:
+        proc.collect_urls_and_users(p)
+
+
+def _normalize(_ctx, trees):
+    for tree in trees:
+        normalize_xml_structure(tree)
+
+
+def _activate(ctx, trees):
+    proc = XMLProcessor(ctx.settings)
+    for tree in trees:
+        proc.activate_connection_url(tree, ctx.url)
+        proc.activate_user(tree, ctx.user)
+
+
+def _activate_ds(ctx, trees):
+    proc = XMLProcessor(ctx.settings)
+    for tree in trees:
+        index = proc.datasource_index(tree)
+        for name in index.names():
+            proc.activate_datasources(tree, [name], ctx.url, ctx.user, index=index)
+
+
+def _backup_setup(ctx):
+    return BackupStore(tempfile.mkdtemp(prefix="backups-", dir=ctx.work), ctx.settings.get_backup_limit())
+
+
+def _backup(ctx, store):
+    op_id = new_operation_id()
+    for p in ctx.corpus:
+        store.backup(p, op_id)
+    store.manifest.compact()
+
+
+def _write_setup(ctx):
+    paths = ctx.fresh_copy()
+    proc = XMLProcessor(ctx.settings)
+    data = []
+    for tree in ctx.parsed(normalized=True):
+        proc.activate_connection_url(tree, ctx.url)
+        proc.activate_user(tree, ctx.user)
+        data.append(serialize_xml(tree))
+    return list(zip(paths, data))
+
+
+def _write(_ctx, staged):
+    batch = WriteBatch()
+    for path, data in staged:
+        batch.stage(path, data)
+    errors = batch.commit()
+    if errors:
+        raise next(iter(errors.values()))
+
+
+def _apply(workers):
+    def run(ctx, paths):
+        results = XMLProcessor(ctx.settings).apply_changes_to_files(paths, ctx.url, ctx.user, workers=workers)
+        errors = [r for r in results if r.category == "error"]
+        if errors:
+            raise RuntimeError(f"{errors[0].path}: {errors[0].error}")
+    return run
+
+
+def _reapply_setup(ctx):
+    """Kopia korpusu z już aktywnym celem – ponowne zastosowanie nie powinno niczego zapisywać."""
+    paths = ctx.fresh_copy()
+    XMLProcessor(ctx.settings).apply_changes_to_files(paths, ctx.url, ctx.user, workers=1)
+    return paths
+
+
+def _profile_setup(ctx):
+    """Kopia korpusu i profil z regułą dla każdego datasource'a (do porównania z apply_1)."""
+    paths = ctx.fresh_copy()
+    proc = XMLProcessor(ctx.settings)
+    names = sorted({d["jndi-name"] or d["pool-name"] for p in ctx.corpus for d in proc.describe_datasources(p)})
+    return paths, EnvironmentProfile("bench", [ProfileRule(datasource=n, url=ctx.url, user=ctx.user) for n in names])
+
+
+def _apply_profile(ctx, state):
+    paths, profile = state
+    proc = XMLProcessor(ctx.settings)
+    results = proc.apply_plan(proc.plan_profile(paths, profile, workers=1), workers=1)
+    errors = [r for r in results if r.category == "error"]
+    if errors:
+        raise RuntimeError(f"{errors[0].path}: {errors[0].error}")
+
+
+def _profile_mixed_setup(ctx):
+    """Profil z regułą dla całego pliku (inne środowisko) przed regułami datasource'ów – reguły
+    datasource'ów muszą wygrać także tam, gdzie reguła dla pliku zakomentuje ich cel."""
+    paths, profile = _profile_setup(ctx)
+    url, user = targets(ctx.spec, 2)
+    return paths, EnvironmentProfile("bench-mixed", [ProfileRule(url=url, user=user)] + profile.rules)
+
+
+def _check_profile_mixed(ctx, state):
+    paths, _profile = state
+    proc = XMLProcessor(ctx.settings)
+    for p in paths:
+        for ds in proc.describe_datasources(p):
+            for target, live, commented in ((ctx.url, "live_urls", "commented_urls"),
+                                            (ctx.user, "live_users", "commented_users")):
+                if target in ds[live] + ds[commented] and ds[live] != [target]:
+                    raise RuntimeError(f"{p}: {ds['jndi-name'] or ds['pool-name']}: aktywne {ds[live]}, "
+                                       f"oczekiwano {target}")
+
+
+# (nazwa, opis, setup, run)
+SCENARIOS = (
+    ("scan_stream", "skan strumieniowy (iterparse)", None, _scan_stream),
+    ("scan_tree", "skan drzewa (parsowanie + XPath)", _scan_tree_setup, _scan_tree),
+    ("normalize", "normalize_xml_structure", lambda ctx: ctx.parsed(), _normalize),
+    ("activate", "aktywacja URL i użytkownika", lambda ctx: ctx.parsed(normalized=True), _activate),
+    ("activate_ds", "aktywacja per datasource", lambda ctx: ctx.parsed(normalized=True), _activate_ds),
+    ("backup", "kopie zapasowe (BackupStore)", _backup_setup, _backup),
+    ("write", "zapis grupowy (WriteBatch)", _write_setup, _write),
+    ("apply_1", "zastosowanie end-to-end, 1 proces", lambda ctx: ctx.fresh_copy(), _apply(1)),
+    ("apply_pool", "zastosowanie end-to-end, pula procesów", lambda ctx: ctx.fresh_copy(), _apply(None)),
+    ("apply_profile", "profil (reguła na datasource), 1 proces", _profile_setup, _apply_profile),
+    ("apply_profile_mix", "profil (plik + datasource'y), 1 proces", _profile_mixed_setup, _apply_profile),
+    ("reapply_1", "ponowne zastosowanie (cel już aktywny)", _reapply_setup, _apply(1)),
+)
+
+# sprawdzenie wyniku scenariusza – poza pomiarem czasu
+CHECKS = {
+    "apply_profile_mix": _check_profile_mixed,
+}
+
+
+def run_suite(files=FILES, spec=None, seed=0, repeat=REPEAT, only=None, base=None, log=print):
+    """Generuje korpus, uruchamia scenariusze i zwraca wyniki w postaci słownika (jak w JSON)."""
+    spec = spec or CorpusSpec()
+    work = tempfile.mkdtemp(prefix="flyboss-suite-", dir=base)
+    try:
+        settings = SettingsManager(os.path.join(work, "settings", "settings.json"), save_delay=0)
+        settings.set_transient("backup_dir", os.path.join(work, "backups"))
+        corpus = generate_corpus(os.path.join(work, "corpus"), files, spec, seed)
+        ctx = _Context(work, corpus, spec, settings)
+        size = sum(os.path.getsize(p) for p in corpus)
+        log(f"korpus: {files} plików, {size / 2 ** 20:.1f} MiB, ziarno {seed}")
+
+        results = {}
+        for name, title, setup, run in SCENARIOS:
+            if only and name not in only:
+                continue
+            times = []
+            for _ in range(repeat):
+                state = setup(ctx) if setup else None
+                t0 = time.perf_counter()
+                run(ctx, state)
+                times.append(time.perf_counter() - t0)
+                if name in CHECKS:
+                    CHECKS[name](ctx, state)
+            best = min(times)
+            results[name] = {
+                "title": title,
+                "runs_s": [round(t, 6) for t in times],
+                "best_s": round(best, 6),
+                "median_s": round(statistics.median(times), 6),
+                "ms_per_file": round(best / files * 1e3, 4),
+                "mib_per_s": round(size / 2 ** 20 / best, 3) if best else None,
+            }
+            log(f"{name:<17} {title:<40} {best:>9.4f} s {best / files * 1e3:>9.3f} ms/plik")
+
+        settings.flush()
+        return {
+            "meta": {
+                "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+                "python": platform.python_version(),
+                "lxml": ".".join(map(str, etree.LXML_VERSION)),
+                "platform": platform.platform(),
+                "cpu_count": os.cpu_count(),
+                "apply_workers": settings.get_apply_workers(),
+                "files": files,
+                "bytes": size,
+                "seed": seed,
+                "repeat": repeat,
+                "spec": spec.to_dict(),
+            },
+            "scenarios": results,
+        }
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+
+def compare(old, new, log=print):
+    """Porównanie najlepszych czasów; > 1.00 oznacza, że nowy przebieg jest wolniejszy."""
+    if old["meta"].get("files") != new["meta"].get("files") or old["meta"].get("spec") != new["meta"].get("spec"):
+        log("uwaga: przebiegi użyły różnych korpusów – porównanie orientacyjne")
+    log(f"{'scenariusz':<17} {'poprzednio [s]':>15} {'teraz [s]':>11} {'stosunek':>9}")
+    for name, res in new["scenarios"].items():
+        before = old["scenarios"].get(name)
+        if not before:
+            log(f"{name:<17} {'—':>15} {res['best_s']:>11.4f}")
+            continue
+        ratio = res["best_s"] / before["best_s"] if before["best_s"] else float("inf")
+        log(f"{name:<17} {before['best_s']:>15.4f} {res['best_s']:>11.4f} {ratio:>8.2f}×")
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(prog="python -m bench.suite", description="Benchmarki na syntetycznym korpusie.")
+    p.add_argument("--files", type=int, default=FILES)
+    p.add_argument("--datasources", type=parse_range, default=(5, 30), help="liczba datasource'ów w pliku, np. 5:30")
+    p.add_argument("--padding-kb", type=int, default=0, help="wypełnienie plików do tego rozmiaru")
+    p.add_argument("--crlf", type=float, default=0.3)
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--repeat", type=int, default=REPEAT)
+    p.add_argument("--only", help="lista scenariuszy rozdzielona przecinkami: " + ",".join(s[0] for s in SCENARIOS))
+    p.add_argument("--dir", help="katalog roboczy (domyślnie tymczasowy) – czas zapisu zależy od dysku")
+    p.add_argument("--out", help="zapis wyników do pliku JSON")
+    p.add_argument("--compare", help="plik JSON z wcześniejszego przebiegu")
+    args = p.parse_args(argv)
+
+    only = set(args.only.split(",")) if args.only else None
+    unknown = (only or set()) - {s[0] for s in SCENARIOS}
+    if unknown:
+        p.error("nieznane scenariusze: " + ", ".join(sorted(unknown)))
+    spec = CorpusSpec(datasources=args.datasources, crlf=args.crlf, padding_kb=args.padding_kb)
+    result = run_suite(args.files, spec, args.seed, max(1, args.repeat), only, args.dir)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        print(f"wyniki zapisane do {args.out}")
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(json.load(f), result)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,9 +1,25 @@
-import os
+import atexit
+import copy
+import heapq
 import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
 
 APP_NAME = "JBoss/WildFly Datasource Manager"
 CONFIG_DIR = os.path.join(os.path.expanduser("~"), ".jw_ds_manager")
 CONFIG_PATH = os.path.join(CONFIG_DIR, "settings.json")
+# wersja układu settings.json; starsze pliki są migrowane przy wczytaniu
+SCHEMA_VERSION = 2
+# zapisy wywołane w tym oknie czasu są łączone w jeden
+SAVE_DELAY_S = 0.5
 
 DEFAULT_SETTINGS = {
     "paths": [],
@@ -11,55 +27,245 @@ DEFAULT_SETTINGS = {
     "color_theme": "blue",
     "last_target_url": "",
     "last_username": "",
+    "last_environment_profile": "",
     "backup_dir": "",
-    "backup_limit": 5
+    "backup_limit": 5,
+    "apply_workers": 0,
+    "write_mode": "normalize",
+    "backup_compression": "none",
+    "discovery_excludes": ["modules/", "tmp/", "data/"],
+    "metrics_export": "",
+    "profiling": False,
+    "profile_limit": 20,
+    "environment_profiles": {}
 }
 
-class SettingsManager:
-    def __init__(self):
-        os.makedirs(CONFIG_DIR, exist_ok=True)
-        if not os.path.exists(CONFIG_PATH):
-            self.data = DEFAULT_SETTINGS.copy()
-            self.save()
+class FileLock:
+    """Blokada międzyprocesowa na pliku obok settings.json (flock / msvcrt.locking)."""
+
+    def __init__(self, path):
+        self.path = path
+        self._fd = None
+
+    def __enter__(self):
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        if fcntl is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
         else:
-            self.load()
+            while True:
+                try:
+                    msvcrt.locking(self._fd, msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    pass  # LK_LOCK ponawia tylko przez ~10 s
+        return self
 
-    def load(self):
+    def __exit__(self, *exc):
         try:
-            with open(CONFIG_PATH, "r", encoding="utf-8") as f:
-                self.data = json.load(f)
-        except Exception:
-            self.data = DEFAULT_SETTINGS.copy()
-            self.save()
+            if fcntl is not None:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+            else:
+                os.lseek(self._fd, 0, os.SEEK_SET)
+                msvcrt.locking(self._fd, msvcrt.LK_UNLCK, 1)
+        finally:
+            os.close(self._fd)
+            self._fd = None
+
+
+def _migrate(data):
+    """Uzupełnia brakujące klucze i doprowadza starsze wersje pliku do SCHEMA_VERSION.
+    Nieznane klucze (np. z nowszej wersji aplikacji) są zachowywane."""
+    out = copy.deepcopy(DEFAULT_SETTINGS)
+    out.update(data)
+    if data.get("schema_version", 1) < 2:
+        # wersja 1: ścieżki mogły się powtarzać i nie musiały być bezwzględne
+        out["paths"] = sorted({os.path.abspath(p) for p in out.get("paths") or []})
+    out["schema_version"] = max(SCHEMA_VERSION, data.get("schema_version", 1))
+    return out
+
+
+class SettingsManager:
+    """Ustawienia aplikacji w settings.json.
+
+    save() nie zapisuje od razu: zapisy z krótkiego okna (SAVE_DELAY_S) są łączone, a w bloku
+    `with settings.transaction():` odkładane do jego końca; flush() zapisuje natychmiast (także przy
+    zakończeniu procesu). Zapis odbywa się pod blokadą pliku i łączy zmiany z bieżącą zawartością
+    na dysku – zapisywane są tylko klucze zmienione w tej instancji, a lista `paths` jako różnica
+    (dodane/usunięte ścieżki), więc równoległe instancje i zadania CLI nie nadpisują sobie zmian.
+    Plik jest podmieniany atomowo (plik tymczasowy + os.replace).
+    """
+
+    def __init__(self, path=CONFIG_PATH, save_delay=SAVE_DELAY_S):
+        self.path = path
+        self.lock_path = path + ".lock"
+        self.save_delay = save_delay
+        self._lock = threading.RLock()
+        self._write_lock = threading.Lock()
+        self._timer = None
+        self._transactions = 0
+        self._pending = False
+        self._transient = set()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.load()
+        if not os.path.exists(path) or self._needs_upgrade:
+            self.flush(force=True)
+        atexit.register(self.flush)
+
+    def _read_disk(self):
+        """Zawartość pliku (zmigrowana) albo None, gdy pliku nie ma. Uszkodzony plik jest
+        zachowywany obok jako settings.json.corrupt-<czas> i traktowany jak brak pliku."""
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if not isinstance(data, dict):
+                raise ValueError("settings.json nie zawiera obiektu JSON")
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError):
+            try:
+                os.replace(self.path, f"{self.path}.corrupt-{time.strftime('%Y%m%d-%H%M%S')}")
+            except OSError:
+                pass
+            return None
+        self._needs_upgrade = data.get("schema_version", 1) < SCHEMA_VERSION
+        return _migrate(data)
+
+    def load(self):
+        self._needs_upgrade = False
+        with FileLock(self.lock_path):
+            data = self._read_disk()
+        if data is None:
+            data = _migrate({})
+            self._needs_upgrade = True
+        with self._lock:
+            self.data = data
+            self._baseline = copy.deepcopy(data)
+            self._path_set = set(data["paths"])
 
     def save(self):
-        with open(CONFIG_PATH, "w", encoding="utf-8") as f:
-            json.dump(self.data, f, ensure_ascii=False, indent=2)
+        """Zaplanowanie zapisu (połączonego z kolejnymi zmianami w ciągu save_delay)."""
+        with self._lock:
+            if self._transactions:
+                self._pending = True
+                return
+            if self.save_delay <= 0:
+                timer = None
+            else:
+                if self._timer is not None:
+                    self._timer.cancel()
+                timer = self._timer = threading.Timer(self.save_delay, self.flush)
+                timer.daemon = True
+        if timer is None:
+            self.flush()
+        else:
+            timer.start()
+
+    @contextmanager
+    def transaction(self):
+        """Grupa zmian zapisywana jednym zapisem na końcu bloku."""
+        with self._lock:
+            self._transactions += 1
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self._transactions -= 1
+                pending = not self._transactions and self._pending
+                if pending:
+                    self._pending = False
+            if pending:
+                self.flush()
+
+    def flush(self, force=False):
+        """Natychmiastowy zapis zaległych zmian (połączonych ze zmianami innych instancji)."""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        with self._write_lock:
+            with self._lock:
+                snapshot = copy.deepcopy(self.data)
+                baseline = self._baseline
+            changed = {k: v for k, v in snapshot.items()
+                       if k not in self._transient and (k not in baseline or baseline[k] != v)}
+            if not changed and not force:
+                return
+            with FileLock(self.lock_path):
+                merged = self._read_disk() or _migrate({})
+                for key, value in changed.items():
+                    if key == "paths":
+                        base, mine = set(baseline.get("paths", [])), set(value)
+                        merged["paths"] = sorted((set(merged["paths"]) | (mine - base)) - (base - mine))
+                    else:
+                        merged[key] = value
+                self._dump(merged)
+            with self._lock:
+                # zmiany innych instancji trafiają też do tej – o ile nie zmieniono klucza w międzyczasie
+                for key, value in merged.items():
+                    if key in self._transient:
+                        continue
+                    if key not in self.data or self.data[key] == snapshot.get(key):
+                        self.data[key] = copy.deepcopy(value)
+                self._baseline = merged
+                self._path_set = set(self.data["paths"])
+
+    def set_transient(self, key, value):
+        """Wartość obowiązująca tylko w tym procesie (np. parametr wiersza poleceń) – nie jest zapisywana."""
+        with self._lock:
+            self._transient.add(key)
+            self.data[key] = value
+
+    def _dump(self, data):
+        tmp = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.path)
+        except BaseException:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            raise
+
+    @staticmethod
+    def _normalize_path(p):
+        return os.path.abspath(p.strip('"').strip("'"))
 
     def add_paths(self, paths):
-        orig = set(self.data["paths"])
-        for p in paths:
-            p = os.path.abspath(p.strip('"').strip("'"))
-            if os.path.isfile(p) and p.lower().endswith(".xml"):
-                orig.add(p)
-        self.data["paths"] = sorted(orig)
+        """Dodaje istniejące pliki *.xml; sprawdzane są tylko ścieżki, których jeszcze nie ma na liście."""
+        with self._lock:
+            new = set()
+            for p in paths:
+                p = self._normalize_path(p)
+                if p in self._path_set or p in new:
+                    continue
+                if p.lower().endswith(".xml") and os.path.isfile(p):
+                    new.add(p)
+            if not new:
+                return
+            self._path_set |= new
+            self.data["paths"] = list(heapq.merge(self.data["paths"], sorted(new)))
         self.save()
 
     def remove_paths(self, paths):
-        s = set(self.data["paths"])
-        for p in paths:
-            if p in s:
-                s.remove(p)
-        self.data["paths"] = sorted(s)
+        with self._lock:
+            removed = self._path_set.intersection(paths)
+            if not removed:
+                return
+            self._path_set -= removed
+            self.data["paths"] = [p for p in self.data["paths"] if p not in removed]
         self.save()
 
     def replace_path(self, old, new):
-        new = os.path.abspath(new.strip('"').strip("'"))
+        new = self._normalize_path(new)
         if not (os.path.isfile(new) and new.lower().endswith(".xml")):
             raise ValueError("Ścieżka nie wskazuje na istniejący plik XML.")
-        self.data["paths"] = [new if p == old else p for p in self.data["paths"]]
-        self.data["paths"] = sorted(set(self.data["paths"]))
-        self.save()
+        with self.transaction():
+            self.remove_paths([old])
+            self.add_paths([new])
 
     def get_effective_backup_dir(self):
         root = self.data.get("backup_dir") or os.path.join(CONFIG_DIR, "backups")
@@ -71,4 +277,67 @@ class SettingsManager:
             limit = int(self.data.get("backup_limit", 5))
         except Exception:
             limit = 5
-        return max(1, limit)
\ No newline at end of file
+        return max(1, limit)
+
+    def get_apply_workers(self):
+        """Liczba procesów dla trybu zbiorczego; 0 = automatycznie (liczba rdzeni)."""
+        try:
+            workers = int(self.data.get("apply_workers", 0))
+        except Exception:
+            workers = 0
+        if workers <= 0:
+            return max(1, min(32, os.cpu_count() or 1))
+        return workers
+
+    def get_write_mode(self):
+        mode = self.data.get("write_mode", "normalize")
+        return mode if mode in ("normalize", "surgical") else "normalize"
+
+    def get_backup_compression(self):
+        compression = self.data.get("backup_compression", "none")
+        return compression if compression in ("none", "gzip", "zstd") else "none"
+
+    def get_discovery_excludes(self):
+        """Wzorce katalogów/plików pomijanych przy dodawaniu folderu („modules/”, „*-old.xml”)."""
+        excludes = self.data.get("discovery_excludes", DEFAULT_SETTINGS["discovery_excludes"])
+        if not isinstance(excludes, list):
+            return list(DEFAULT_SETTINGS["discovery_excludes"])
+        return [str(p) for p in excludes if str(p).strip()]
+
+    def get_metrics_export(self):
+        """Plik, do którego po każdym przebiegu trafiają pomiary (*.prom – Prometheus, inaczej JSON); "" = wyłączone."""
+        return str(self.data.get("metrics_export") or "").strip()
+
+    def get_profiling(self):
+        """Profilowanie operacji (cProfile + tracemalloc) do ~/.jw_ds_manager/profiles."""
+        return bool(self.data.get("profiling", False))
+
+    def get_profile_limit(self):
+        try:
+            limit = int(self.data.get("profile_limit", 20))
+        except Exception:
+            limit = 20
+        return max(1, limit)
+
+    def get_environment_profiles(self):
+        """Profile środowisk: nazwa -> lista reguł {"datasource", "files", "url", "user"}."""
+        profiles = self.data.get("environment_profiles")
+        if not isinstance(profiles, dict):
+            return {}
+        return {str(name): [r for r in rules if isinstance(r, dict)]
+                for name, rules in profiles.items() if isinstance(rules, list)}
+
+    def set_environment_profile(self, name, rules):
+        with self._lock:
+            profiles = self.get_environment_profiles()
+            profiles[name] = [dict(r) for r in rules]
+            self.data["environment_profiles"] = dict(sorted(profiles.items()))
+        self.save()
+
+    def delete_environment_profile(self, name):
+        with self._lock:
+            profiles = self.get_environment_profiles()
+            if profiles.pop(name, None) is None:
+                return
+            self.data["environment_profiles"] = profiles
+        self.save()
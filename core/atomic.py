@@ -0,0 +1,152 @@
+# atomic.py
+import os
+import shutil
+import uuid
+
+
+def _target(path):
+    # zapis przez dowiązanie symboliczne trafia do pliku docelowego, a nie zastępuje dowiązania
+    return os.path.realpath(path)
+
+
+def _temp_path(path):
+    directory, name = os.path.split(path)
+    return os.path.join(directory, f".{name}.{os.getpid()}.{uuid.uuid4().hex[:8]}.tmp")
+
+
+def _fsync_file(path):
+    fd = os.open(path, os.O_RDWR)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _fsync_dir(directory):
+    """Utrwala wpisy katalogu (rename). Na Windows katalogu nie da się otworzyć – pomijamy."""
+    if os.name == "nt":
+        return
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def sync_file(path):
+    """Utrwala plik zapisany bez fsync wraz z jego wpisem w katalogu."""
+    _fsync_file(path)
+    _fsync_dir(os.path.dirname(path))
+
+
+def write_temp(path, data, sync=True):
+    """Zapisuje `data` do pliku tymczasowego obok `path` (ten sam katalog = ten sam system plików,
+    więc os.replace jest atomowe). Uprawnienia są kopiowane z istniejącego pliku.
+    Przy błędzie (np. brak miejsca) plik tymczasowy jest usuwany, a oryginał pozostaje nietknięty."""
+    tmp = _temp_path(path)
+    try:
+        with open(tmp, "wb") as f:
+            f.write(data)
+            f.flush()
+            if sync:
+                os.fsync(f.fileno())
+        if os.path.exists(path):
+            shutil.copymode(path, tmp)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+    return tmp
+
+
+def atomic_write(path, data):
+    """Zapis odporny na awarię: plik tymczasowy + fsync + os.replace + fsync katalogu.
+    Po przerwaniu w dowolnym momencie na dysku jest stara albo nowa wersja – nigdy ucięta."""
+    path = _target(path)
+    tmp = write_temp(path, data)
+    os.replace(tmp, path)
+    _fsync_dir(os.path.dirname(path))
+
+
+class WriteBatch:
+    """Zapis grupowy dla trybu zbiorczego.
+
+    stage() zapisuje pliki tymczasowe bez fsync; commit() utrwala każdy z nich (fsync), podmienia
+    utrwalone przez os.replace i wykonuje jeden fsync na katalog. Plik, którego nie udało się
+    utrwalić, nie jest podmieniany i trafia do błędów. track() dołącza pliki tylko do utrwalenia
+    (np. kopie zapasowe) – ich błąd blokuje podmianę pliku, do którego należą. Pliki przygotowane
+    w innych procesach (pula robocza) dołącza się przez add().
+    """
+
+    def __init__(self):
+        # [(plik tymczasowy, plik docelowy, ścieżka podana przez wołającego)];
+        # plik docelowy None – plik tylko do utrwalenia (track)
+        self.pending = []
+
+    def __len__(self):
+        return len(self.paths)
+
+    @property
+    def paths(self):
+        return [path for _tmp, target, path in self.pending if target is not None]
+
+    def stage(self, path, data):
+        target = _target(path)
+        self.pending.append((write_temp(target, data, sync=False), target, path))
+
+    def track(self, synced, path):
+        """`synced` zostanie utrwalony przed podmianą pliku `path`."""
+        self.pending.append((synced, None, path))
+
+    def add(self, pending):
+        self.pending.extend(tuple(p) for p in pending)
+
+    def discard(self):
+        for tmp, target, _path in self.pending:
+            if target is None:
+                continue
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+        self.pending = []
+
+    def commit(self):
+        """Zwraca słownik {ścieżka: wyjątek} dla plików, których nie udało się utrwalić lub podmienić."""
+        pending, self.pending = self.pending, []
+        if not pending:
+            return {}
+        errors = {}
+        for tmp, target, path in pending:
+            try:
+                _fsync_file(tmp)
+            except OSError as e:
+                errors.setdefault(path, e)
+        for directory in {os.path.dirname(tmp) for tmp, target, _path in pending if target is None}:
+            try:
+                _fsync_dir(directory)
+            except OSError:
+                pass
+        directories = set()
+        for tmp, target, path in pending:
+            if target is None or path in errors:
+                continue
+            try:
+                os.replace(tmp, target)
+                directories.add(os.path.dirname(target))
+            except OSError as e:
+                errors[path] = e
+        for tmp, target, path in pending:
+            if target is not None and path in errors:
+                try:
+                    os.remove(tmp)
+                except OSError:
+                    pass
+        for directory in directories:
+            try:
+                _fsync_dir(directory)
+            except OSError:
+                pass
+        return errors
@@ -1,39 +1,424 @@
 import os
 import shutil
 import datetime
+import gzip
+import hashlib
+import json
+import threading
+import time
+import uuid
+
+from config.settings_manager import FileLock
+from .atomic import atomic_write, sync_file, write_temp
+from .metrics import metrics
+
+try:
+    import zstandard  # opcjonalne – kompresja kopii zstd
+except ImportError:
+    zstandard = None
+
+# rodzaj kompresji → rozszerzenie obiektu i wpisu historii
+COMPRESSIONS = {"none": "", "gzip": ".gz", "zstd": ".zst"}
+
+MANIFEST_NAME = "manifest.jsonl"
+# klucz w dzienniku dla kopii sprzed dziennika – nie wiadomo, którego pliku są kopią
+LEGACY_PREFIX = "legacy:"
+
 
 def _ensure_dir(path: str):
     os.makedirs(path, exist_ok=True)
 
-def _timestamp():
-    return datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+def _timestamp(ts_ns: int) -> str:
+    # nanosekundy w nazwie – dwie kopie w tej samej sekundzie nie nadpisują się
+    stamp = datetime.datetime.fromtimestamp(ts_ns // 1_000_000_000).strftime("%Y-%m-%d_%H-%M-%S")
+    return f"{stamp}.{ts_ns % 1_000_000_000:09d}"
+
+
+def new_operation_id() -> str:
+    """Identyfikator operacji – wszystkie kopie jednego przebiegu zbiorczego mają ten sam."""
+    return uuid.uuid4().hex[:12]
+
+
+def available_compressions() -> list:
+    return [c for c in COMPRESSIONS if c != "zstd" or zstandard is not None]
+
+
+def _compress(data: bytes, compression: str) -> bytes:
+    if compression == "gzip":
+        return gzip.compress(data, mtime=0)
+    if compression == "zstd":
+        return zstandard.ZstdCompressor().compress(data)
+    return data
+
+
+def _suffix_of(path: str) -> str:
+    return next((s for s in COMPRESSIONS.values() if s and path.endswith(s)), "")
+
+
+def read_backup(backup_path: str) -> bytes:
+    """Treść kopii (rozpakowana, jeśli kopia jest skompresowana)."""
+    with open(backup_path, "rb") as f:
+        data = f.read()
+    if backup_path.endswith(".gz"):
+        return gzip.decompress(data)
+    if backup_path.endswith(".zst"):
+        if zstandard is None:
+            raise RuntimeError("Kopia skompresowana zstd – wymagany pakiet zstandard.")
+        return zstandard.ZstdDecompressor().decompress(data)
+    return data
+
+
+class BackupRecord:
+    FIELDS = ("file", "ts", "hash", "size", "op", "backup")
 
-def backup_file(src_path: str, backup_root: str, limit: int) -> str:
-    if not backup_root:
-        raise ValueError("backup_root nie może być pusty")
+    def __init__(self, root, **data):
+        self.root = root
+        self.file = data.get("file")
+        self.ts = data.get("ts", 0)          # czas utworzenia kopii [ns]
+        self.hash = data.get("hash")         # SHA-256 treści (przed kompresją)
+        self.size = data.get("size", 0)      # rozmiar treści (przed kompresją)
+        self.op = data.get("op")             # identyfikator operacji / przebiegu
+        self.backup = data.get("backup")     # ścieżka wpisu względem katalogu kopii
 
-    base = os.path.basename(src_path)
-    name, ext = os.path.splitext(base)
-    if not ext:
-        ext = ".xml"
+    @property
+    def path(self):
+        return os.path.join(self.root, self.backup)
 
-    dst_dir = os.path.join(backup_root, f"{name}_backup")
-    _ensure_dir(dst_dir)
+    @property
+    def created(self):
+        return datetime.datetime.fromtimestamp(self.ts / 1e9)
 
-    stamp = _timestamp()
-    dst_path = os.path.join(dst_dir, f"{stamp}{ext}")
+    def to_dict(self):
+        return {k: getattr(self, k) for k in self.FIELDS}
 
-    shutil.copy2(src_path, dst_path)
 
-    try:
-        entries = [os.path.join(dst_dir, f) for f in os.listdir(dst_dir) if os.path.isfile(os.path.join(dst_dir, f))]
-        entries_sorted = sorted(entries, reverse=True)
-        for old in entries_sorted[limit:]:
+class BackupManifest:
+    """Dziennik kopii <root>/manifest.jsonl – tylko dopisywany, jedna linia JSON na zdarzenie
+    ({"file", "ts", "hash", "size", "op", "backup"} lub {"drop": backup}).
+
+    Stan jest trzymany w pamięci i doczytywany przyrostowo od ostatniego przesunięcia pliku,
+    więc historia pliku i przycinanie nie wymagają listowania katalogów. Dopisywanie i kompaktowanie
+    odbywają się pod blokadą pliku manifest.jsonl.lock – procesy dopisujące równolegle nie gubią
+    wpisów, gdy inny proces przepisuje dziennik.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self.path = os.path.join(root, MANIFEST_NAME)
+        self.lock_path = self.path + ".lock"
+        self._lock = threading.Lock()
+        self._offset = 0
+        self._inode = None
+        self._lines = 0
+        self._files = {}      # plik źródłowy → {backup: BackupRecord}
+        self._by_backup = {}  # backup → plik źródłowy
+
+    def _apply(self, data):
+        if "drop" in data:
+            src = self._by_backup.pop(data["drop"], None)
+            if src is not None:
+                self._files[src].pop(data["drop"], None)
+            return
+        rec = BackupRecord(self.root, **data)
+        self._files.setdefault(rec.file, {})[rec.backup] = rec
+        self._by_backup[rec.backup] = rec.file
+
+    def _refresh(self):
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return
+        if st.st_ino != self._inode or st.st_size < self._offset:
+            # plik przepisany (kompaktowanie) – wczytujemy od nowa
+            self._offset = 0
+            self._lines = 0
+            self._files = {}
+            self._by_backup = {}
+            self._inode = st.st_ino
+        if st.st_size == self._offset:
+            return
+        with open(self.path, "rb") as f:
+            f.seek(self._offset)
+            chunk = f.read()
+        end = chunk.rfind(b"\n") + 1   # niedokończona ostatnia linia zostanie doczytana później
+        for line in chunk[:end].splitlines():
             try:
-                os.remove(old)
+                self._apply(json.loads(line))
+            except (ValueError, KeyError, TypeError):
+                continue
+            self._lines += 1
+        self._offset += end
+
+    def _append(self, items):
+        _ensure_dir(self.root)
+        payload = "".join(json.dumps(d, ensure_ascii=False, separators=(",", ":")) + "\n" for d in items)
+        with FileLock(self.lock_path):
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, payload.encode("utf-8"))
+            finally:
+                os.close(fd)
+
+    def history(self, src_path):
+        """Kopie pliku od najnowszej do najstarszej."""
+        with self._lock:
+            self._refresh()
+            records = list(self._files.get(src_path, {}).values())
+        return sorted(records, key=lambda r: (r.ts, r.backup), reverse=True)
+
+    def known(self, backup):
+        """Czy wpis (ścieżka względem katalogu kopii) jest już w dzienniku – dla dowolnego pliku."""
+        with self._lock:
+            self._refresh()
+            return backup in self._by_backup
+
+    def files(self):
+        with self._lock:
+            self._refresh()
+            return sorted(f for f, recs in self._files.items() if recs and not f.startswith(LEGACY_PREFIX))
+
+    def operation(self, op_id):
+        """Wszystkie kopie utworzone w jednej operacji (przebiegu zbiorczym)."""
+        with self._lock:
+            self._refresh()
+            return [r for recs in self._files.values() for r in recs.values() if r.op == op_id]
+
+    def add(self, record):
+        self._append([record.to_dict()])
+
+    def drop(self, backups):
+        if backups:
+            self._append([{"drop": b} for b in backups])
+
+    def compact(self):
+        """Przepisuje dziennik bez usuniętych wpisów, gdy zdarzeń jest dużo więcej niż kopii."""
+        with self._lock:
+            self._refresh()
+            live = [r for recs in self._files.values() for r in recs.values()]
+            if self._lines < 2 * len(live) + 1000:
+                return False
+            with FileLock(self.lock_path):
+                # wpisy dopisane przez inne procesy przed uzyskaniem blokady też trafiają do nowego dziennika
+                self._refresh()
+                live = [r for recs in self._files.values() for r in recs.values()]
+                live.sort(key=lambda r: (r.ts, r.backup))
+                payload = "".join(json.dumps(r.to_dict(), ensure_ascii=False, separators=(",", ":")) + "\n"
+                                  for r in live)
+                atomic_write(self.path, payload.encode("utf-8"))
+            self._offset = 0
+            self._inode = None
+            self._files = {}
+            self._by_backup = {}
+            self._refresh()
+            return True
+
+
+_manifests = {}
+_manifests_lock = threading.Lock()
+
+
+def manifest_for(root) -> BackupManifest:
+    """Jedna instancja dziennika na katalog kopii w procesie (stan doczytywany przyrostowo)."""
+    key = os.path.abspath(root)
+    with _manifests_lock:
+        m = _manifests.get(key)
+        if m is None:
+            m = _manifests[key] = BackupManifest(key)
+        return m
+
+
+class BackupStore:
+    """Magazyn kopii zapasowych adresowany treścią.
+
+    <root>/objects/<ab>/<sha256>[.gz|.zst]   – każda treść zapisana raz (opcjonalnie skompresowana),
+    <root>/<nazwa>_<skrót ścieżki>_backup/<znacznik><ext>
+                                              – wpis historii pliku: twarde dowiązanie do obiektu
+                                                (bez obsługi dowiązań – kopia obiektu),
+    <root>/manifest.jsonl                     – dziennik kopii (BackupManifest).
+
+    Kopia identyczna z ostatnią kopią pliku nie tworzy nowego wpisu. Limit `limit` dotyczy
+    liczby wpisów historii na plik; obiekt bez wpisów jest usuwany.
+    """
+
+    def __init__(self, root: str, limit: int = 5, compression: str = "none"):
+        if not root:
+            raise ValueError("backup_root nie może być pusty")
+        if compression == "zstd" and zstandard is None:
+            compression = "gzip"
+        self.root = os.path.abspath(root)
+        self.limit = max(1, limit)
+        self.compression = compression if compression in COMPRESSIONS else "none"
+
+    @property
+    def manifest(self):
+        return manifest_for(self.root)
+
+    def _object_path(self, digest: str, suffix: str) -> str:
+        return os.path.join(self.root, "objects", digest[:2], digest + suffix)
+
+    def _durable(self, path: str, batch, owner: str):
+        """Utrwala plik kopii od razu, a w zapisie grupowym – przy commit() przed podmianą pliku `owner`."""
+        if batch is None:
+            sync_file(path)
+        else:
+            batch.track(path, owner)
+
+    def _put(self, digest: str, data: bytes) -> str:
+        obj = self._object_path(digest, COMPRESSIONS[self.compression])
+        if not os.path.exists(obj):
+            _ensure_dir(os.path.dirname(obj))
+            # bez fsync – obiekt jest utrwalany przez wpis historii (ten sam i-węzeł), zob. _link
+            os.replace(write_temp(obj, _compress(data, self.compression), sync=False), obj)
+        return obj
+
+    def _link(self, digest: str, data: bytes, entry: str, batch=None, owner: str = None):
+        tmp = entry + ".tmp"
+        for _attempt in range(3):
+            obj = self._put(digest, data)
+            try:
+                os.link(obj, tmp)
+                break
+            except FileNotFoundError:
+                continue  # obiekt usunięty równolegle przy przycinaniu innego pliku – zapisujemy go ponownie
+            except OSError:
+                shutil.copyfile(obj, tmp)
+                # bez twardych dowiązań wpis jest samodzielną kopią – obiekt nie jest potrzebny
+                if os.stat(obj).st_nlink <= 1:
+                    os.remove(obj)
+                break
+        else:
+            with open(tmp, "wb") as f:
+                f.write(_compress(data, self.compression))
+        os.replace(tmp, entry)
+        # fsync wpisu utrwala też obiekt, do którego jest dowiązaniem
+        self._durable(entry, batch, owner)
+
+    def _remove(self, record: BackupRecord):
+        try:
+            os.remove(record.path)
+        except FileNotFoundError:
+            pass
+        obj = self._object_path(record.hash, _suffix_of(record.backup))
+        try:
+            if os.stat(obj).st_nlink <= 1:
+                os.remove(obj)
+        except OSError:
+            pass
+
+    def _adopt_legacy(self, legacy_dir: str, key: str):
+        """Wpisy utworzone przed wprowadzeniem dziennika trafiają do niego jednorazowo – pod kluczem
+        katalogu, nie pliku: katalog <nazwa>_backup mógł być wspólny dla plików o tej samej nazwie.
+        Wpisy już obecne w dzienniku (dla dowolnego pliku) są pomijane."""
+        try:
+            names = os.listdir(legacy_dir)
+        except FileNotFoundError:
+            return
+        for name in sorted(names):
+            entry = os.path.join(legacy_dir, name)
+            backup = os.path.relpath(entry, self.root)
+            if name.endswith(".tmp") or not os.path.isfile(entry) or self.manifest.known(backup):
+                continue
+            try:
+                data = read_backup(entry)
             except Exception:
-                pass
-    except Exception:
-        pass
+                continue
+            self.manifest.add(BackupRecord(
+                self.root, file=key, ts=os.stat(entry).st_mtime_ns, hash=hashlib.sha256(data).hexdigest(),
+                size=len(data), op=None, backup=backup,
+            ))
+
+    def history(self, src_path: str) -> list:
+        """Kopie pliku (BackupRecord) od najnowszej do najstarszej – z dziennika, bez listowania katalogu."""
+        return self.manifest.history(os.path.abspath(src_path))
+
+    def legacy(self, src_path: str) -> list:
+        """Kopie sprzed dziennika z katalogu <nazwa>_backup – nieprzypisane do pliku (mogą pochodzić
+        z innego pliku o tej samej nazwie). Nie są przycinane ani wybierane przy przywracaniu domyślnym."""
+        legacy_dir = legacy_backup_dir_for(src_path, self.root)
+        key = LEGACY_PREFIX + os.path.relpath(legacy_dir, self.root)
+        if not self.manifest.history(key):
+            self._adopt_legacy(legacy_dir, key)
+        return self.manifest.history(key)
+
+    def backup(self, src_path: str, op_id: str = None, batch=None) -> str:
+        """Kopia pliku. Bez `batch` kopia jest utrwalana (fsync) od razu, z `batch` (WriteBatch) –
+        przy commit(), przed podmianą pliku."""
+        owner = src_path
+        src_path = os.path.abspath(src_path)
+        with metrics.phase("backup", src_path):
+            return self._backup(src_path, op_id, batch, owner)
+
+    def _backup(self, src_path: str, op_id: str = None, batch=None, owner: str = None) -> str:
+        with open(src_path, "rb") as f:
+            data = f.read()
+        metrics.count("bytes_read", len(data))
+        digest = hashlib.sha256(data).hexdigest()
+        existing = self.history(src_path)
+        if existing and existing[0].hash == digest and os.path.exists(existing[0].path):
+            metrics.count("backups_unchanged")
+            return existing[0].path
+
+        _name, ext = os.path.splitext(os.path.basename(src_path))
+        if not ext:
+            ext = ".xml"
+        op_id = op_id or new_operation_id()
+        ts = time.time_ns()
+        dst_dir = backup_dir_for(src_path, self.root)
+        _ensure_dir(dst_dir)
+        entry = os.path.join(dst_dir, f"{_timestamp(ts)}_{op_id}{ext}{COMPRESSIONS[self.compression]}")
+        self._link(digest, data, entry, batch, owner)
+        self.manifest.add(BackupRecord(
+            self.root, file=src_path, ts=ts, hash=digest, size=len(data), op=op_id,
+            backup=os.path.relpath(entry, self.root),
+        ))
+
+        overflow = existing[self.limit - 1:]
+        for rec in overflow:
+            self._remove(rec)
+        self.manifest.drop([rec.backup for rec in overflow])
+        metrics.count("backups_created")
+        metrics.count("backups_pruned", len(overflow))
+        return entry
+
+    def list(self, src_path: str) -> list:
+        """Ścieżki kopii pliku od najnowszej do najstarszej."""
+        return [r.path for r in self.history(src_path) if os.path.exists(r.path)]
+
+    def restore(self, backup_path: str, dst_path: str) -> str:
+        """Przywraca kopię na miejsce pliku; bieżąca wersja jest wcześniej archiwizowana.
+        Zwraca ścieżkę kopii bieżącej wersji (lub None, jeśli plik nie istniał)."""
+        if not os.path.isfile(backup_path):
+            raise FileNotFoundError(backup_path)
+        data = read_backup(backup_path)
+        current = self.backup(dst_path) if os.path.exists(dst_path) else None
+        atomic_write(dst_path, data)
+        return current
+
+
+def backup_file(src_path: str, backup_root: str, limit: int, op_id: str = None,
+                compression: str = "none") -> str:
+    return BackupStore(backup_root, limit, compression).backup(src_path, op_id)
+
+
+def backup_dir_for(src_path: str, backup_root: str) -> str:
+    """Katalog historii pliku – z nazwą i skrótem pełnej ścieżki, więc pliki o tej samej nazwie
+    (np. a/standalone.xml i b/standalone.xml) mają osobne katalogi."""
+    src_path = os.path.abspath(src_path)
+    name, _ext = os.path.splitext(os.path.basename(src_path))
+    digest = hashlib.sha256(os.path.normcase(src_path).encode("utf-8")).hexdigest()[:12]
+    return os.path.join(backup_root, f"{name}_{digest}_backup")
+
+
+def legacy_backup_dir_for(src_path: str, backup_root: str) -> str:
+    """Katalog kopii z wersji sprzed dziennika (wspólny dla plików o tej samej nazwie)."""
+    name, _ext = os.path.splitext(os.path.basename(src_path))
+    return os.path.join(backup_root, f"{name}_backup")
+
+
+def list_backups(src_path: str, backup_root: str) -> list:
+    """Kopie pliku od najnowszej do najstarszej."""
+    return BackupStore(backup_root).list(src_path)
+
 
-    return dst_path
+def restore_backup(backup_path: str, dst_path: str, backup_root: str, limit: int) -> str:
+    return BackupStore(backup_root, limit).restore(backup_path, dst_path)
@@ -0,0 +1,166 @@
+# datasources.py
+from lxml import etree
+
+from .utils import element_to_comment, replace_comment_with_element, try_parse_comment_as_element
+
+DATASOURCE_TAGS = ("datasource", "xa-datasource")
+
+
+def _local(tag):
+    return tag.split("}")[-1] if isinstance(tag, str) else ""
+
+
+def _text(el):
+    return (el.text or "").strip()
+
+
+def user_name(sec):
+    un = sec.find(".//{*}user-name")
+    return (un.text or "").strip() if un is not None else ""
+
+
+class DatasourceNodes:
+    """Węzły jednego <datasource>/<xa-datasource>: aktywne elementy connection-url/security
+    oraz zakomentowane alternatywy jako pary (komentarz, sparsowany element)."""
+
+    def __init__(self, element):
+        self.element = element
+        self.jndi_name = element.get("jndi-name", "")
+        self.pool_name = element.get("pool-name", "")
+        self.live_urls = []
+        self.commented_urls = []
+        self.live_security = []
+        self.commented_security = []
+
+    @property
+    def name(self):
+        return self.jndi_name or self.pool_name
+
+    def matches(self, name):
+        return bool(name) and name in (self.jndi_name, self.pool_name)
+
+    def urls(self):
+        """(aktywne, zakomentowane) URL."""
+        return [_text(e) for e in self.live_urls], [_text(e) for _c, e in self.commented_urls]
+
+    def users(self):
+        return [user_name(e) for e in self.live_security], [user_name(e) for _c, e in self.commented_security]
+
+    def describe(self):
+        live_urls, commented_urls = self.urls()
+        live_users, commented_users = self.users()
+        return {
+            "jndi-name": self.jndi_name,
+            "pool-name": self.pool_name,
+            "live_urls": live_urls,
+            "commented_urls": commented_urls,
+            "live_users": live_users,
+            "commented_users": commented_users,
+        }
+
+
+class DatasourceIndex:
+    """Indeks dokumentu według datasource'ów (jndi-name / pool-name), budowany jednym przejściem
+    po drzewie. Przełączanie URL/użytkownika dotyczy tylko poddrzewa wybranego datasource'a,
+    a indeks jest aktualizowany na miejscu – kolejne przełączenia nie przeszukują dokumentu.
+
+    Zmiany w drzewie wykonane z pominięciem indeksu go unieważniają."""
+
+    def __init__(self, tree):
+        self.tree = tree
+        self.datasources = []
+        root = tree.getroot()
+        for ds in root.iter(*(f"{{*}}{t}" for t in DATASOURCE_TAGS)):
+            self.datasources.append(self._collect(ds))
+
+    @staticmethod
+    def _collect(ds):
+        nodes = DatasourceNodes(ds)
+        for node in ds.iter():
+            if node is ds:
+                continue
+            if isinstance(node, etree._Comment):
+                el = try_parse_comment_as_element(node)
+                if el is None:
+                    continue
+                local = _local(el.tag)
+                if local == "connection-url":
+                    nodes.commented_urls.append((node, el))
+                elif local == "security":
+                    nodes.commented_security.append((node, el))
+                continue
+            local = _local(node.tag)
+            if local == "connection-url":
+                nodes.live_urls.append(node)
+            elif local == "security":
+                nodes.live_security.append(node)
+        return nodes
+
+    def __iter__(self):
+        return iter(self.datasources)
+
+    def __len__(self):
+        return len(self.datasources)
+
+    def names(self):
+        return [ds.name for ds in self.datasources]
+
+    def get(self, name):
+        """Datasource o danej nazwie jndi-name lub pool-name albo None."""
+        return next((ds for ds in self.datasources if ds.matches(name)), None)
+
+    def find(self, names):
+        """(znalezione DatasourceNodes, brakujące nazwy) w kolejności `names`."""
+        found, missing = [], []
+        for name in names:
+            ds = self.get(name)
+            if ds is None:
+                missing.append(name)
+            elif ds not in found:
+                found.append(ds)
+        return found, missing
+
+    def activate_url(self, ds, target_url):
+        """Aktywuje target_url w datasource `ds` i komentuje pozostałe jego connection-url.
+        Jeśli datasource nie ma tego URL (aktywnego ani w komentarzu), nic nie zmienia. Zwraca True przy zmianie."""
+        if not target_url:
+            return False
+        restore = [(c, el) for c, el in ds.commented_urls if _text(el) == target_url]
+        if not restore and not any(_text(e) == target_url for e in ds.live_urls):
+            return False
+        changed = False
+        for c, el in restore:
+            replace_comment_with_element(c, el)
+            ds.commented_urls.remove((c, el))
+            ds.live_urls.append(el)
+            changed = True
+        for e in list(ds.live_urls):
+            if _text(e) != target_url:
+                self._comment_out(e, ds.live_urls, ds.commented_urls)
+                changed = True
+        return changed
+
+    def activate_user(self, ds, target_user):
+        """Jak activate_url dla bloków <security> (po <user-name>)."""
+        if not target_user:
+            return False
+        restore = [(c, el) for c, el in ds.commented_security if user_name(el) == target_user]
+        if not restore and not any(user_name(e) == target_user for e in ds.live_security):
+            return False
+        changed = False
+        for c, el in restore:
+            replace_comment_with_element(c, el)
+            ds.commented_security.remove((c, el))
+            ds.live_security.append(el)
+            changed = True
+        for e in list(ds.live_security):
+            if user_name(e) != target_user:
+                self._comment_out(e, ds.live_security, ds.commented_security)
+                changed = True
+        return changed
+
+    @staticmethod
+    def _comment_out(el, live, commented):
+        comment = element_to_comment(el)
+        live.remove(el)
+        commented.append((comment, try_parse_comment_as_element(comment)))
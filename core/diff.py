@@ -0,0 +1,259 @@
+# diff.py
+import bisect
+import difflib
+
+from .surgical import detect_encoding
+
+# poniżej tej liczby linii fragment jest porównywany bezpośrednio przez difflib
+_SMALL_REGION = 64
+
+
+def decode_xml(data):
+    return data.decode(detect_encoding(data), errors="replace")
+
+
+def _unique_anchors(a, alo, ahi, b, blo, bhi):
+    """Pary (i, j) linii występujących dokładnie raz w a[alo:ahi] i w b[blo:bhi],
+    ograniczone do najdłuższego rosnącego podciągu (patience diff)."""
+    counts = {}
+    for i in range(alo, ahi):
+        line = a[i]
+        c = counts.get(line)
+        counts[line] = [1, i, -1] if c is None else [c[0] + 1, i, -1]
+    for j in range(blo, bhi):
+        c = counts.get(b[j])
+        if c is not None and c[0] == 1:
+            c[2] = j if c[2] == -1 else -2
+    pairs = [(c[1], c[2]) for c in counts.values() if c[0] == 1 and c[2] >= 0]
+    pairs.sort()
+
+    # najdłuższy rosnący podciąg względem j
+    tails = []
+    tail_idx = []
+    prev = [-1] * len(pairs)
+    for k, (_i, j) in enumerate(pairs):
+        pos = bisect.bisect_left(tails, j)
+        if pos == len(tails):
+            tails.append(j)
+            tail_idx.append(k)
+        else:
+            tails[pos] = j
+            tail_idx[pos] = k
+        prev[k] = tail_idx[pos - 1] if pos else -1
+    out = []
+    k = tail_idx[-1] if tail_idx else -1
+    while k != -1:
+        out.append(pairs[k])
+        k = prev[k]
+    out.reverse()
+    return out
+
+
+def _match(a, alo, ahi, b, blo, bhi, blocks):
+    # wspólny początek i koniec
+    start = 0
+    while alo + start < ahi and blo + start < bhi and a[alo + start] == b[blo + start]:
+        start += 1
+    if start:
+        blocks.append((alo, blo, start))
+        alo += start
+        blo += start
+    end = 0
+    while alo < ahi - end and blo < bhi - end and a[ahi - end - 1] == b[bhi - end - 1]:
+        end += 1
+    tail = (ahi - end, bhi - end, end) if end else None
+    ahi -= end
+    bhi -= end
+
+    if alo < ahi and blo < bhi:
+        anchors = [] if (ahi - alo) + (bhi - blo) <= _SMALL_REGION else _unique_anchors(a, alo, ahi, b, blo, bhi)
+        if anchors:
+            i0, j0 = alo, blo
+            for i, j in anchors:
+                _match(a, i0, i, b, j0, j, blocks)
+                blocks.append((i, j, 1))
+                i0, j0 = i + 1, j + 1
+            _match(a, i0, ahi, b, j0, bhi, blocks)
+        else:
+            sm = difflib.SequenceMatcher(None, a[alo:ahi], b[blo:bhi], autojunk=False)
+            blocks.extend((alo + i, blo + j, n) for i, j, n in sm.get_matching_blocks() if n)
+    if tail:
+        blocks.append(tail)
+
+
+def line_opcodes(a, b):
+    """Odpowiednik SequenceMatcher(None, a, b).get_opcodes() dla list linii, liczony metodą
+    patience diff (unikalne linie jako kotwice, difflib tylko dla małych fragmentów między nimi).
+    Dla dużych plików z wieloma rozproszonymi zmianami jest o rzędy wielkości szybszy."""
+    blocks = []
+    _match(a, 0, len(a), b, 0, len(b), blocks)
+    blocks.sort()
+    opcodes = []
+    i = j = 0
+    for bi, bj, n in blocks + [(len(a), len(b), 0)]:
+        if i < bi and j < bj:
+            opcodes.append(("replace", i, bi, j, bj))
+        elif i < bi:
+            opcodes.append(("delete", i, bi, j, bj))
+        elif j < bj:
+            opcodes.append(("insert", i, bi, j, bj))
+        if n:
+            if opcodes and opcodes[-1][0] == "equal":
+                _tag, i1, _i2, j1, _j2 = opcodes[-1]
+                opcodes[-1] = ("equal", i1, bi + n, j1, bj + n)
+            else:
+                opcodes.append(("equal", bi, bi + n, bj, bj + n))
+        i, j = bi + n, bj + n
+    return opcodes
+
+
+def _format_range(start, stop):
+    # jak difflib._format_range_unified
+    beginning = start + 1
+    length = stop - start
+    if length == 1:
+        return f"{beginning}"
+    if not length:
+        beginning -= 1
+    return f"{beginning},{length}"
+
+
+class DiffModel:
+    """Porównanie starej i nowej treści pliku liczone raz (line_opcodes).
+
+    segments() dzieli dokument na fragmenty zmian z kontekstem („lines”) i ukryte
+    fragmenty wspólne („gap”), które podgląd może rozwijać na żądanie.
+    """
+
+    def __init__(self, old_lines, new_lines):
+        self.old = old_lines
+        self.new = new_lines
+        self.opcodes = line_opcodes(old_lines, new_lines)
+        self._segments = {}
+
+    @classmethod
+    def from_bytes(cls, old_bytes, new_bytes):
+        return cls(decode_xml(old_bytes).splitlines(keepends=True), decode_xml(new_bytes).splitlines(keepends=True))
+
+    @property
+    def changed(self):
+        return any(op[0] != "equal" for op in self.opcodes)
+
+    def segments(self, context=3):
+        """Lista fragmentów w kolejności dokumentu (liczona raz dla danego kontekstu):
+        ("lines", old_start, new_start, [(znak, tekst), ...]) – zmiany z kontekstem (znak: " ", "-", "+"),
+        ("gap", lo, hi, delta) – ukryte wspólne linie old[lo:hi] (= new[lo + delta:hi + delta])."""
+        cached = self._segments.get(context)
+        if cached is None:
+            cached = self._segments[context] = self._build_segments(context)
+        return cached
+
+    def _build_segments(self, context):
+        out = []
+        current = None
+
+        def show(kind, text, i, j):
+            nonlocal current
+            if current is None:
+                current = ("lines", i, j, [])
+                out.append(current)
+            current[3].append((kind, text))
+
+        def gap(lo, hi, delta):
+            nonlocal current
+            if lo < hi:
+                out.append(("gap", lo, hi, delta))
+                current = None
+
+        last = len(self.opcodes) - 1
+        for k, (tag, i1, i2, j1, j2) in enumerate(self.opcodes):
+            if tag == "equal":
+                delta = j1 - i1
+                head = i1 if k == 0 else min(i2, i1 + context)          # kontekst po poprzedniej zmianie
+                tail = i2 if k == last else max(head, i2 - context)     # kontekst przed następną zmianą
+                for i in range(i1, head):
+                    show(" ", self.old[i], i, i + delta)
+                gap(head, tail, delta)
+                for i in range(tail, i2):
+                    show(" ", self.old[i], i, i + delta)
+                continue
+            for i in range(i1, i2):
+                show("-", self.old[i], i, j1)
+            for j in range(j1, j2):
+                show("+", self.new[j], i2, j)
+        return out
+
+    def unified(self, path, context=3):
+        """Tekst unified diff (jak difflib.unified_diff) oraz liczba dodanych/usuniętych linii i hunków."""
+        lines = []
+        added = removed = hunks = 0
+        for seg in self.segments(context):
+            if seg[0] != "lines":
+                continue
+            _kind, old_start, new_start, body = seg
+            n_old = sum(1 for k, _t in body if k != "+")
+            n_new = sum(1 for k, _t in body if k != "-")
+            if not hunks:
+                lines.append(f"--- {path}\n+++ {path}\n")
+            hunks += 1
+            lines.append(f"@@ -{_format_range(old_start, old_start + n_old)} "
+                         f"+{_format_range(new_start, new_start + n_new)} @@\n")
+            for k, text in body:
+                if k == "+":
+                    added += 1
+                elif k == "-":
+                    removed += 1
+                lines.append(k + text)
+                if not text.endswith("\n"):
+                    lines.append("\n\\ No newline at end of file\n")
+        return "".join(lines), added, removed, hunks
+
+
+class FileDiff:
+    """Wynik próby „na sucho” dla jednego pliku: unified diff oraz statystyki zmian.
+    `model` (DiffModel) jest zachowywany na potrzeby podglądu w UI."""
+
+    def __init__(self, path, category, diff="", added=0, removed=0, hunks=0, error=None, model=None):
+        self.path = path
+        self.category = category
+        self.diff = diff
+        self.added = added
+        self.removed = removed
+        self.hunks = hunks
+        self.error = error
+        self.model = model
+
+    @property
+    def changed(self):
+        return self.error is None and bool(self.diff)
+
+    def to_dict(self):
+        return {
+            "path": self.path,
+            "status": self.category,
+            "changed": self.changed,
+            "added": self.added,
+            "removed": self.removed,
+            "hunks": self.hunks,
+            "diff": self.diff,
+        }
+
+
+def make_diff(path, category, old_bytes, new_bytes, context=3, keep_model=False):
+    if old_bytes == new_bytes:
+        return FileDiff(path, category)
+    model = DiffModel.from_bytes(old_bytes, new_bytes)
+    diff, added, removed, hunks = model.unified(path, context)
+    return FileDiff(path, category, diff, added, removed, hunks, model=model if keep_model else None)
+
+
+def summarize(diffs):
+    """Liczba plików w każdej kategorii oraz suma dodanych/usuniętych linii."""
+    summary = {"files": len(diffs), "changed": 0, "added": 0, "removed": 0}
+    for d in diffs:
+        summary[d.category] = summary.get(d.category, 0) + 1
+        if d.changed:
+            summary["changed"] += 1
+            summary["added"] += d.added
+            summary["removed"] += d.removed
+    return summary
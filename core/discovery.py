@@ -0,0 +1,129 @@
+# discovery.py
+import fnmatch
+import os
+import re
+import time
+
+# katalogi instalacji WildFly/JBoss bez konfiguracji źródeł danych (deskryptory modułów, pliki robocze)
+DEFAULT_EXCLUDES = ("modules/", "tmp/", "data/")
+# tyle bajtów z początku pliku wystarcza dla plików *-ds.xml; w standalone.xml/domain.xml
+# podsystem datasources bywa dalej, więc konfiguracje serwera są czytane dalej – porcjami
+SNIFF_BYTES = 8192
+_CHUNK = 64 * 1024
+
+_DATASOURCE_RE = re.compile(rb"<(?:[\w.-]+:)?(?:xa-)?datasource\b")
+_SERVER_RE = re.compile(rb"<(?:[\w.-]+:)?(?:server|domain|host)\b[^>]*urn:jboss:domain")
+
+
+def parse_excludes(text):
+    """Wzorce wykluczeń z tekstu rozdzielonego przecinkami/nowymi liniami."""
+    return [p.strip() for p in re.split(r"[,\n]", text or "") if p.strip()]
+
+
+def _compile(patterns):
+    """Wzorce z „/” na końcu dotyczą katalogów, pozostałe plików. Wzorzec bez „/” w środku
+    pasuje do nazwy na dowolnej głębokości, z „/” – do ścieżki względnej."""
+    dirs, files = [], []
+    for pat in patterns:
+        pat = pat.strip().replace("\\", "/")
+        if not pat:
+            continue
+        (dirs if pat.endswith("/") else files).append(pat.strip("/"))
+    return dirs, files
+
+
+def _matches(rel, name, patterns):
+    for pat in patterns:
+        if fnmatch.fnmatch(rel if "/" in pat else name, pat):
+            return True
+    return False
+
+
+def sniff_datasources(path, sniff_bytes=SNIFF_BYTES):
+    """True, jeśli plik zawiera <datasource>/<xa-datasource>. Czytany jest tylko początek pliku,
+    a całość jedynie dla konfiguracji serwera (standalone.xml, domain.xml, host.xml)."""
+    with open(path, "rb") as f:
+        head = f.read(sniff_bytes)
+        if _DATASOURCE_RE.search(head):
+            return True
+        if not _SERVER_RE.search(head):
+            return False
+        tail = head[-64:]
+        while True:
+            chunk = f.read(_CHUNK)
+            if not chunk:
+                return False
+            if _DATASOURCE_RE.search(tail + chunk):
+                return True
+            tail = chunk[-64:]
+
+
+class FolderScan:
+    """Wyszukiwanie plików XML ze źródłami danych w drzewie katalogów (os.scandir, bez podążania
+    za dowiązaniami do katalogów). Katalogi i pliki pasujące do `excludes` są pomijane w całości.
+
+    run(progress, cancel) – progress(sprawdzone, znalezione, ścieżka) co najwyżej co PROGRESS_S.
+    """
+
+    PROGRESS_S = 0.1
+
+    def __init__(self, root, excludes=DEFAULT_EXCLUDES, sniff_bytes=SNIFF_BYTES):
+        self.root = os.path.abspath(root)
+        self.dir_excludes, self.file_excludes = _compile(excludes)
+        self.sniff_bytes = sniff_bytes
+        self.found = []
+        self.checked = 0
+        self.skipped_dirs = 0
+        self.errors = []
+
+    def run(self, progress=None, cancel=None):
+        last_report = 0.0
+        stack = [(self.root, "")]
+        while stack:
+            if cancel is not None and cancel.is_set():
+                break
+            directory, rel_dir = stack.pop()
+            try:
+                with os.scandir(directory) as it:
+                    entries = sorted(it, key=lambda e: e.name)
+            except OSError as e:
+                self.errors.append((directory, e))
+                continue
+            subdirs = []
+            for entry in entries:
+                rel = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+                try:
+                    is_dir = entry.is_dir(follow_symlinks=False)
+                    is_file = not is_dir and entry.is_file()
+                except OSError:
+                    continue
+                if is_dir:
+                    if _matches(rel, entry.name, self.dir_excludes):
+                        self.skipped_dirs += 1
+                    else:
+                        subdirs.append((entry.path, rel))
+                    continue
+                if not is_file or not entry.name.lower().endswith(".xml"):
+                    continue
+                if _matches(rel, entry.name, self.file_excludes):
+                    continue
+                self.checked += 1
+                try:
+                    if sniff_datasources(entry.path, self.sniff_bytes):
+                        self.found.append(entry.path)
+                except OSError as e:
+                    self.errors.append((entry.path, e))
+                now = time.monotonic()
+                if progress is not None and now - last_report >= self.PROGRESS_S:
+                    last_report = now
+                    progress(self.checked, len(self.found), entry.path)
+            # odwrotnie, aby katalogi były przetwarzane alfabetycznie
+            stack.extend(reversed(subdirs))
+        if progress is not None:
+            progress(self.checked, len(self.found), None)
+        return self
+
+
+def discover_datasource_files(root, excludes=DEFAULT_EXCLUDES, progress=None, cancel=None):
+    """Ścieżki plików XML ze źródłami danych w `root` (w kolejności przeglądania)."""
+    return FolderScan(root, excludes).run(progress, cancel).found
@@ -0,0 +1,73 @@
+# environments.py
+import fnmatch
+import os
+
+
+class ProfileRule:
+    """Reguła profilu środowiska: docelowy URL i/lub użytkownik dla datasource'a (jndi-name lub
+    pool-name) i/lub plików pasujących do wzorca glob (pełna ścieżka albo nazwa pliku).
+    Bez datasource'a reguła zmienia cały plik, bez wzorca – dotyczy wszystkich plików."""
+
+    FIELDS = ("datasource", "files", "url", "user")
+
+    def __init__(self, datasource="", files="", url="", user=""):
+        self.datasource = (datasource or "").strip()
+        self.files = (files or "").strip()
+        self.url = (url or "").strip()
+        self.user = (user or "").strip()
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**{k: str(data.get(k) or "") for k in cls.FIELDS})
+
+    def to_dict(self):
+        return {k: getattr(self, k) for k in self.FIELDS}
+
+    @property
+    def empty(self):
+        return not self.url and not self.user
+
+    def matches_file(self, path):
+        if not self.files:
+            return True
+        pattern = os.path.normcase(os.path.expanduser(self.files))
+        path = os.path.normcase(os.path.abspath(path))
+        return fnmatch.fnmatch(path, pattern) or fnmatch.fnmatch(os.path.basename(path), pattern)
+
+    def label(self):
+        scope = [s for s in (self.datasource, self.files) if s]
+        return " @ ".join(scope) or "*"
+
+
+class EnvironmentProfile:
+    """Nazwany zestaw reguł (np. DEV, TEST, UAT, PROD) stosowany jednym przebiegiem: każdy plik jest
+    parsowany raz, dostaje wszystkie swoje zmiany i jest raz kopiowany i zapisywany.
+
+    Reguły bez datasource'a są stosowane przed regułami dla konkretnych datasource'ów, a wśród reguł
+    tego samego rodzaju późniejsza wygrywa – reguła szczegółowa nadpisuje ogólną."""
+
+    def __init__(self, name, rules=()):
+        self.name = name
+        self.rules = [r for r in rules if not r.empty]
+
+    @classmethod
+    def from_settings(cls, name, rules):
+        return cls(name, [ProfileRule.from_dict(r) for r in rules or [] if isinstance(r, dict)])
+
+    def to_settings(self):
+        return [r.to_dict() for r in self.rules]
+
+    def datasources(self):
+        """Nazwy datasource'ów z reguł profilu, w kolejności pierwszego wystąpienia."""
+        return list(dict.fromkeys(r.datasource for r in self.rules if r.datasource))
+
+    def rules_for(self, path):
+        """(reguły dla całego pliku, reguły dla datasource'ów) pasujące do pliku, w kolejności stosowania."""
+        matching = [r for r in self.rules if r.matches_file(path)]
+        return [r for r in matching if not r.datasource], [r for r in matching if r.datasource]
+
+
+def load_profile(settings, name):
+    """Profil `name` z ustawień albo None."""
+    rules = settings.get_environment_profiles().get(name)
+    return None if rules is None else EnvironmentProfile.from_settings(name, rules)
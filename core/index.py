@@ -0,0 +1,165 @@
+# index.py
+import hashlib
+import io
+import json
+import os
+import threading
+
+from config.settings_manager import CONFIG_DIR
+from .metrics import metrics
+from .scanner import describe_file
+
+INDEX_PATH = os.path.join(CONFIG_DIR, "scan_index.json")
+INDEX_VERSION = 1
+
+
+class IndexEntry:
+    FIELDS = ("mtime_ns", "size", "sha1", "live_urls", "commented_urls", "live_users",
+              "commented_users", "datasources", "error")
+
+    def __init__(self, path, **data):
+        self.path = path
+        self.mtime_ns = data.get("mtime_ns")
+        self.size = data.get("size")
+        self.sha1 = data.get("sha1")
+        self.live_urls = data.get("live_urls", [])
+        self.commented_urls = data.get("commented_urls", [])
+        self.live_users = data.get("live_users", [])
+        self.commented_users = data.get("commented_users", [])
+        self.datasources = data.get("datasources", [])
+        self.error = data.get("error")
+
+    @property
+    def urls(self):
+        return sorted(set(self.live_urls) | set(self.commented_urls))
+
+    @property
+    def users(self):
+        return sorted(set(self.live_users) | set(self.commented_users))
+
+    def to_dict(self):
+        return {k: getattr(self, k) for k in self.FIELDS}
+
+
+class ScanIndex:
+    """Trwały indeks skanowania plików (CONFIG_DIR/scan_index.json).
+
+    Wpis jest aktualny, gdy zgadzają się mtime_ns i rozmiar pliku. Przy rozbieżności liczony jest
+    skrót SHA-1 treści – jeśli treść się nie zmieniła, aktualizowany jest tylko odcisk, bez parsowania.
+    """
+
+    def __init__(self, path=INDEX_PATH):
+        self.path = path
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._dirty = False
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get("version") != INDEX_VERSION:
+            return
+        with self._lock:
+            self._entries = {p: IndexEntry(p, **e) for p, e in data.get("files", {}).items()}
+
+    def save(self):
+        with self._lock:
+            if not self._dirty:
+                return
+            data = {"version": INDEX_VERSION, "files": {p: e.to_dict() for p, e in self._entries.items()}}
+            self._dirty = False
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp, self.path)
+
+    def get(self, path):
+        with self._lock:
+            return self._entries.get(os.path.abspath(path))
+
+    def cached_entries(self, paths):
+        """Wpisy z indeksu bez sprawdzania plików na dysku (natychmiastowy start UI)."""
+        with self._lock:
+            return [self._entries[p] for p in map(os.path.abspath, paths) if p in self._entries]
+
+    def _scan(self, path, st, previous):
+        with metrics.phase("read", path), open(path, "rb") as f:
+            data = f.read()
+        metrics.count("bytes_read", len(data))
+        sha1 = hashlib.sha1(data).hexdigest()
+        if previous is not None and previous.sha1 == sha1 and previous.error is None:
+            info = {k: getattr(previous, k) for k in IndexEntry.FIELDS}
+        else:
+            metrics.count("files_scanned")
+            try:
+                with metrics.phase("scan", path):
+                    info = describe_file(io.BytesIO(data))
+            except Exception as e:
+                info = {"error": str(e)}
+        info.update(mtime_ns=st.st_mtime_ns, size=st.st_size, sha1=sha1)
+        return IndexEntry(path, **info)
+
+    def refresh(self, paths, progress=None, cancel=None):
+        """Aktualizuje wpisy dla `paths` – parsowane są tylko pliki zmienione od ostatniego skanu.
+        Zwraca aktualne wpisy w kolejności `paths` (pliki nieistniejące są pomijane)."""
+        paths = [os.path.abspath(p) for p in paths]
+        result = []
+        for i, p in enumerate(paths):
+            if cancel is not None and cancel.is_set():
+                break
+            entry = self.get(p)
+            try:
+                st = os.stat(p)
+            except OSError:
+                with self._lock:
+                    if self._entries.pop(p, None) is not None:
+                        self._dirty = True
+                entry = None
+            else:
+                if entry is None or entry.mtime_ns != st.st_mtime_ns or entry.size != st.st_size:
+                    try:
+                        entry = self._scan(p, st, entry)
+                    except OSError as e:
+                        entry = IndexEntry(p, mtime_ns=st.st_mtime_ns, size=st.st_size, error=str(e))
+                    with self._lock:
+                        self._entries[p] = entry
+                        self._dirty = True
+            if entry is not None:
+                result.append(entry)
+            if progress is not None:
+                progress(i + 1, len(paths), p)
+        self.save()
+        return result
+
+    def forget(self, paths):
+        with self._lock:
+            for p in paths:
+                if self._entries.pop(os.path.abspath(p), None) is not None:
+                    self._dirty = True
+
+
+def urls_and_users(entries):
+    urls = set()
+    users = set()
+    for e in entries:
+        urls.update(e.live_urls)
+        urls.update(e.commented_urls)
+        users.update(e.live_users)
+        users.update(e.commented_users)
+    return sorted(urls), sorted(users)
+
+
+def datasource_names(entries):
+    """Nazwy datasource'ów (jndi-name, a przy jej braku pool-name) występujące we wpisach."""
+    names = set()
+    for e in entries:
+        for ds in e.datasources:
+            name = ds.get("jndi-name") or ds.get("pool-name")
+            if name:
+                names.add(name)
+    return sorted(names)
@@ -0,0 +1,168 @@
+# metrics.py
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from .atomic import atomic_write
+
+# tyle najwolniejszych plików (z podziałem czasu na etapy) trafia do raportu
+SLOWEST_FILES = 20
+
+_PROM_PREFIX = "flyboss"
+
+
+class MetricsRegistry:
+    """Rejestr pomiarów: czasy etapów, liczniki oraz czasy etapów w rozbiciu na pliki.
+
+    Etapy są rozłączne (parse, scan, normalize, activate, serialize, backup, read, write, commit),
+    więc ich suma dla pliku to czas jego przetwarzania, a najdłuższy etap wskazuje wąskie gardło.
+    Procesy robocze zbierają pomiary we własnym rejestrze; drain()/merge() przenoszą je do
+    procesu głównego. Źródła (add_source) dodają do migawki np. statystyki cache.
+    """
+
+    def __init__(self, slowest=SLOWEST_FILES):
+        self.slowest = slowest
+        self._lock = threading.Lock()
+        self._sources = {}
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._phases = {}       # etap -> [liczba, suma_s, max_s]
+            self._counters = {}
+            self._files = {}        # ścieżka -> {etap: s}
+            self.started = time.time()
+
+    def add_source(self, name, stats):
+        self._sources[name] = stats
+
+    def count(self, name, n=1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + n
+
+    def record(self, name, seconds, path=None):
+        with self._lock:
+            entry = self._phases.get(name)
+            if entry is None:
+                entry = self._phases[name] = [0, 0.0, 0.0]
+            entry[0] += 1
+            entry[1] += seconds
+            entry[2] = max(entry[2], seconds)
+            if path is not None:
+                per_file = self._files.setdefault(path, {})
+                per_file[name] = per_file.get(name, 0.0) + seconds
+
+    @contextmanager
+    def phase(self, name, path=None):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - t0, path)
+
+    def drain(self):
+        """Surowe pomiary od ostatniego reset() (do przekazania z procesu roboczego) – rejestr jest zerowany."""
+        with self._lock:
+            raw = {"phases": self._phases, "counters": self._counters, "files": self._files}
+            self._phases, self._counters, self._files = {}, {}, {}
+        return raw
+
+    def merge(self, raw):
+        with self._lock:
+            for name, (n, total, peak) in raw["phases"].items():
+                entry = self._phases.setdefault(name, [0, 0.0, 0.0])
+                entry[0] += n
+                entry[1] += total
+                entry[2] = max(entry[2], peak)
+            for name, n in raw["counters"].items():
+                self._counters[name] = self._counters.get(name, 0) + n
+            for path, phases in raw["files"].items():
+                per_file = self._files.setdefault(path, {})
+                for name, seconds in phases.items():
+                    per_file[name] = per_file.get(name, 0.0) + seconds
+
+    def snapshot(self):
+        """Stan rejestru jako słownik gotowy do zapisu w JSON."""
+        with self._lock:
+            phases = {
+                name: {"count": n, "total_s": round(total, 6), "max_s": round(peak, 6),
+                       "avg_ms": round(total / n * 1e3, 3) if n else 0.0}
+                for name, (n, total, peak) in sorted(self._phases.items(), key=lambda kv: -kv[1][1])
+            }
+            counters = dict(sorted(self._counters.items()))
+            files = sorted(self._files.items(), key=lambda kv: -sum(kv[1].values()))[:self.slowest]
+            started = self.started
+        slowest = []
+        for path, per_phase in files:
+            top = max(per_phase, key=per_phase.get)
+            slowest.append({
+                "path": path,
+                "total_s": round(sum(per_phase.values()), 6),
+                "slowest_phase": top,
+                "phases": {k: round(v, 6) for k, v in sorted(per_phase.items(), key=lambda kv: -kv[1])},
+            })
+        sources = {}
+        for name, stats in self._sources.items():
+            try:
+                sources[name] = stats()
+            except Exception:
+                continue
+        return {
+            "started": started,
+            "collected": time.time(),
+            "phases": phases,
+            "counters": counters,
+            "slowest_files": slowest,
+            "caches": sources,
+        }
+
+    def to_json(self):
+        return json.dumps(self.snapshot(), ensure_ascii=False, indent=2)
+
+    def to_prometheus(self):
+        """Format tekstowy Prometheus (np. dla textfile collector node_exportera)."""
+        snap = self.snapshot()
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            lines.append(f"# HELP {_PROM_PREFIX}_{name} {help_text}")
+            lines.append(f"# TYPE {_PROM_PREFIX}_{name} {kind}")
+            for labels, value in samples:
+                label_text = ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items())
+                lines.append(f"{_PROM_PREFIX}_{name}{{{label_text}}} {value}" if label_text
+                             else f"{_PROM_PREFIX}_{name} {value}")
+
+        phases = snap["phases"]
+        metric("phase_seconds_total", "counter", "Łączny czas etapu przetwarzania.",
+               [({"phase": k}, v["total_s"]) for k, v in phases.items()])
+        metric("phase_calls_total", "counter", "Liczba wykonań etapu.",
+               [({"phase": k}, v["count"]) for k, v in phases.items()])
+        metric("phase_max_seconds", "gauge", "Najdłuższe pojedyncze wykonanie etapu.",
+               [({"phase": k}, v["max_s"]) for k, v in phases.items()])
+        for name, value in snap["counters"].items():
+            metric(f"{name}_total", "counter", f"Licznik {name}.", [({}, value)])
+        metric("slowest_file_seconds", "gauge", "Najwolniejsze pliki i ich najdłuższy etap.",
+               [({"path": f["path"], "phase": f["slowest_phase"]}, f["total_s"]) for f in snap["slowest_files"]])
+        for cache, stats in snap["caches"].items():
+            metric(f"{cache}", "gauge", f"Statystyki {cache}.",
+                   [({"stat": k}, v) for k, v in stats.items() if isinstance(v, (int, float))])
+        metric("last_run_timestamp_seconds", "gauge", "Czas zebrania pomiarów.", [({}, round(snap["collected"], 3))])
+        return "\n".join(lines) + "\n"
+
+    def export(self, path):
+        """Zapis atomowy: *.prom – format Prometheus, w pozostałych przypadkach JSON."""
+        path = os.path.expanduser(path)
+        text = self.to_prometheus() if path.endswith(".prom") else self.to_json()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        atomic_write(path, text.encode("utf-8"))
+        return path
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+metrics = MetricsRegistry()
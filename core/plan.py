@@ -0,0 +1,102 @@
+# plan.py
+
+
+class FilePlan:
+    """Plan zmian dla jednego pliku: co zawiera, sparsowane drzewo i planowane edycje.
+    `datasources` (nazwy jndi-name/pool-name) ogranicza zmiany do tych datasource'ów; None – cały plik.
+    `edits` – lista (datasource'y albo None, URL, użytkownik) z profilu środowiska, stosowana w miejsce
+    pojedynczego celu; `unresolved` – opisy reguł profilu, których celu nie ma w pliku.
+    `rendered` – nowa treść pliku przygotowana przy planowaniu w puli procesów (drzewo nie przechodzi
+    między procesami); zapis i podgląd używają jej bez ponownego parsowania, jeśli plik się nie zmienił."""
+
+    def __init__(self, path, has_url=False, has_user=False, tree=None, fingerprint=None, error=None,
+                 datasources=None):
+        self.path = path
+        self.datasources = datasources
+        self.found_datasources = []
+        self.has_url = has_url
+        self.has_user = has_user
+        self.tree = tree
+        self.fingerprint = fingerprint
+        self.error = error
+        self.change_url = False
+        self.change_user = False
+        self.edits = None
+        self.unresolved = []
+        self.rendered = None
+
+    @property
+    def in_scope(self):
+        """False, gdy plik nie zawiera żadnego z wybranych datasource'ów."""
+        return self.datasources is None or bool(self.found_datasources)
+
+    def file_edits(self, target_url, target_user):
+        """Edycje pliku w kolejności stosowania: (datasource'y albo None, URL, użytkownik); pusty cel – bez zmiany."""
+        if self.edits is not None:
+            return self.edits
+        return [(self.datasources, target_url if self.change_url else "", target_user if self.change_user else "")]
+
+    @property
+    def will_change(self):
+        return self.change_url or self.change_user
+
+    @property
+    def category(self):
+        """full/url/user – co zostanie zmienione; active – cel jest już aktywny, plik nie będzie
+        zapisywany ani kopiowany; skipped – brak celu w pliku (albo błąd odczytu)."""
+        if self.change_url and self.change_user:
+            return "full"
+        if self.change_url:
+            return "url"
+        if self.change_user:
+            return "user"
+        if self.error is None and (self.has_url or self.has_user):
+            return "active"
+        return "skipped"
+
+
+class ChangePlan:
+    """Plan zmian dla zbioru plików – liczony raz, używany do ostrzeżeń, zapisu i raportu."""
+
+    def __init__(self, target_url, target_user, files, datasources=None, profile=None):
+        self.target_url = target_url
+        self.target_user = target_user
+        self.files = files
+        self.datasources = datasources
+        self.profile = profile
+
+    def files_without_url(self):
+        if not self.target_url:
+            return []
+        return [f.path for f in self.files if f.in_scope and not f.has_url]
+
+    def files_without_user(self):
+        if not self.target_user:
+            return []
+        return [f.path for f in self.files if f.in_scope and not f.has_user]
+
+    def missing_datasources(self):
+        """Wybrane datasource'y (w planie profilu – z reguł profilu), których nie ma w żadnym pliku planu."""
+        if not self.datasources:
+            return []
+        found = {n for f in self.files for n in f.found_datasources}
+        return [n for n in self.datasources if n not in found]
+
+    def unresolved(self):
+        """(ścieżka, opisy reguł profilu bez celu w pliku) dla planu profilu środowiska."""
+        return [(f.path, f.unresolved) for f in self.files if f.unresolved]
+
+    def to_apply(self):
+        return [f for f in self.files if f.will_change]
+
+
+class FileResult:
+    def __init__(self, path, category, backup=None, error=None):
+        self.path = path
+        self.category = category
+        self.backup = backup
+        self.error = error
+
+    @property
+    def changed(self):
+        return self.error is None and self.category in ("full", "url", "user")
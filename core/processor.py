@@ -1,49 +1,86 @@
 # processor.py
+import copy
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from lxml import etree
 from .utils import (
-    read_xml, write_xml, findall_any_ns,
+    findall_any_ns,
     element_to_comment, try_parse_comment_as_element,
-    replace_comment_with_element, normalize_xml_structure
+    replace_comment_with_element, normalize_xml_structure,
+    load_document, file_fingerprint, parse_xml_bytes, serialize_xml, write_xml_bytes, commit_writes
 )
-from .backup import backup_file
+from .atomic import WriteBatch
+from .datasources import DatasourceIndex, user_name
+from .backup import BackupStore, new_operation_id
+from .plan import ChangePlan, FilePlan, FileResult
+from .surgical import SurgicalEditor, SurgicalMismatch
+from .diff import FileDiff, make_diff
+from .metrics import metrics
 import os
 from config.settings_manager import CONFIG_DIR
 
 
+WRITE_NORMALIZE = "normalize"
+WRITE_SURGICAL = "surgical"
+
+
 class XMLProcessor:
-    def __init__(self, settings=None):
+    def __init__(self, settings=None, write_mode=None):
         self.settings = settings
+        self._write_mode = write_mode
+
+    @property
+    def write_mode(self):
+        """"normalize" – normalizacja i pełny zapis dokumentu;
+        "surgical" – podmiana tylko zmienionych fragmentów oryginalnego pliku."""
+        if self._write_mode:
+            return self._write_mode
+        return self.settings.get_write_mode() if self.settings else WRITE_NORMALIZE
 
 
     def collect_urls_and_users(self, path):
-        tree = read_xml(path)
+        doc = load_document(path)
+        found = doc.memo.get("urls_users")
+        if found is None:
+            found = doc.memo["urls_users"] = _urls_and_users(self.describe_targets(path))
+        return found
+
+    def collect_urls_and_users_from_tree(self, tree):
+        return _urls_and_users(self.describe_targets_in_tree(tree))
+
+    def describe_targets(self, path):
+        """Aktywne i zakomentowane URL/użytkownicy całego pliku (jak DatasourceNodes.describe()) –
+        liczone raz dla wersji pliku."""
+        doc = load_document(path)
+        found = doc.memo.get("targets")
+        if found is None:
+            found = doc.memo["targets"] = self.describe_targets_in_tree(doc.tree)
+        return found
+
+    def describe_targets_in_tree(self, tree):
+        with metrics.phase("scan", tree.docinfo.URL):
+            return self._describe_targets(tree)
+
+    def _describe_targets(self, tree):
         root = tree.getroot()
-        urls = set()
-        users = set()
+        found = {"live_urls": [], "commented_urls": [], "live_users": [], "commented_users": []}
 
         for cu in findall_any_ns(root, "connection-url"):
-            if cu.text and cu.text.strip():
-                urls.add(cu.text.strip())
-
-        for c in root.iter(etree.Comment):
-            el = try_parse_comment_as_element(c)
-            if el is not None and el.tag.split("}")[-1] == "connection-url":
-                if el.text and el.text.strip():
-                    urls.add(el.text.strip())
+            found["live_urls"].append((cu.text or "").strip())
 
         for sec in findall_any_ns(root, "security"):
-            un = sec.find(".//{*}user-name")
-            if un is not None and un.text and un.text.strip():
-                users.add(un.text.strip())
+            found["live_users"].append(user_name(sec))
 
         for c in root.iter(etree.Comment):
             el = try_parse_comment_as_element(c)
-            if el is not None and el.tag.split("}")[-1] == "security":
-                un = el.find(".//{*}user-name")
-                if un is not None and un.text and un.text.strip():
-                    users.add(un.text.strip())
+            if el is None:
+                continue
+            local = el.tag.split("}")[-1]
+            if local == "connection-url":
+                found["commented_urls"].append((el.text or "").strip())
+            elif local == "security":
+                found["commented_users"].append(user_name(el))
 
-        return sorted(urls), sorted(users)
+        return found
 
     def _ensure_target_connection_url_exists(self, root, target_url):
         urls = list(findall_any_ns(root, "connection-url"))
@@ -70,6 +107,10 @@ class XMLProcessor:
         ds.insert(insert_idx, new_el)
 
     def activate_connection_url(self, tree, target_url):
+        with metrics.phase("activate", tree.docinfo.URL):
+            self._activate_connection_url(tree, target_url)
+
+    def _activate_connection_url(self, tree, target_url):
         root = tree.getroot()
 
         for c in list(root.iter(etree.Comment)):
@@ -89,6 +130,10 @@ class XMLProcessor:
         Jeśli targetu nie ma, NIE ROBI nic."""
         if not target_username:
             return
+        with metrics.phase("activate", tree.docinfo.URL):
+            self._activate_user(tree, target_username)
+
+    def _activate_user(self, tree, target_username):
         root = tree.getroot()
 
         target_found = False
@@ -115,19 +160,377 @@ class XMLProcessor:
                 if name != target_username:
                     element_to_comment(s)
 
-    def apply_changes_to_file(self, path, target_url, target_username):
-        tree = read_xml(path)
-        normalize_xml_structure(tree)
-        self.activate_connection_url(tree, target_url)
-        self.activate_user(tree, target_username)
+    def datasource_index(self, tree):
+        """DatasourceIndex drzewa – do wielokrotnego przełączania pojedynczych datasource'ów."""
+        with metrics.phase("index", tree.docinfo.URL):
+            return DatasourceIndex(tree)
+
+    def describe_datasources(self, path):
+        """Lista datasource'ów pliku (DatasourceNodes.describe()) – liczona raz dla wersji pliku."""
+        doc = load_document(path)
+        found = doc.memo.get("datasources")
+        if found is None:
+            found = doc.memo["datasources"] = [ds.describe() for ds in self.datasource_index(doc.tree)]
+        return found
+
+    def activate_datasources(self, tree, names, target_url, target_user, index=None):
+        """Przełącza URL i/lub użytkownika tylko w datasource'ach `names` (jndi-name lub pool-name);
+        pozostałe datasource'y i reszta dokumentu nie są zmieniane. Przekazanie `index` (datasource_index)
+        pozwala przełączać kolejne datasource'y bez ponownego przeszukiwania drzewa.
+        Zwraca nazwy, których nie ma w dokumencie."""
+        if index is None:
+            index = self.datasource_index(tree)
+        found, missing = index.find(names)
+        with metrics.phase("activate", tree.docinfo.URL):
+            for ds in found:
+                index.activate_url(ds, target_url)
+                index.activate_user(ds, target_user)
+        return missing
+
+    def apply_edits(self, tree, edits):
+        """Stosuje kolejno edycje (datasource'y albo None, URL, użytkownik) – wszystkie na jednym drzewie.
+        Edycje datasource'ów korzystają ze wspólnego indeksu; zmiana całego pliku go unieważnia."""
+        index = None
+        for names, target_url, target_user in edits:
+            if names:
+                if index is None:
+                    index = self.datasource_index(tree)
+                self.activate_datasources(tree, names, target_url, target_user, index)
+                continue
+            index = None
+            if target_url:
+                self.activate_connection_url(tree, target_url)
+            if target_user:
+                self.activate_user(tree, target_user)
+
+    def plan_file(self, path, target_url, target_user, datasources=None):
+        """Plan jednego pliku. Cel już aktywny (jedyny aktywny i nieobecny w komentarzach) nie jest
+        planowany do zmiany – plik, w którym wszystko jest już aktywne, ma kategorię "active"."""
+        try:
+            doc = load_document(path)
+            if datasources:
+                available = self.describe_datasources(path)
+                scopes = [d for d in available if d["jndi-name"] in datasources or d["pool-name"] in datasources]
+                found = [n for n in datasources if any(n in (d["jndi-name"], d["pool-name"]) for d in scopes)]
+            else:
+                scopes = [self.describe_targets(path)]
+        except Exception as e:
+            return FilePlan(path, error=e, datasources=datasources)
+        metrics.count("files_planned")
+        fp = FilePlan(path, tree=doc.tree, fingerprint=doc.fingerprint, datasources=datasources)
+        if datasources:
+            fp.found_datasources = found
+        fp.has_url, fp.change_url = _target_state(scopes, target_url, "live_urls", "commented_urls")
+        fp.has_user, fp.change_user = _target_state(scopes, target_user, "live_users", "commented_users")
+        return fp
+
+    def plan_changes(self, paths, target_url, target_user, progress=None, cancel=None, datasources=None,
+                     workers=None):
+        """Jednokrotnie parsuje każdy plik i ustala, co da się w nim zmienić.
+        progress(done, total, path) jest wołane po każdym pliku; ustawienie `cancel`
+        (threading.Event) przerywa planowanie – plan obejmuje wtedy tylko przejrzane pliki.
+        `datasources` – nazwy datasource'ów, do których ograniczone są zmiany (None – całe pliki).
+        Przy workers > 1 planowanie odbywa się w puli procesów (zob. _plan_in_pool)."""
+        target_url = (target_url or "").strip()
+        target_user = (target_user or "").strip()
+        datasources = list(datasources) if datasources else None
+        if workers is None:
+            workers = self._workers_setting()
+        if workers > 1 and len(paths) >= PARALLEL_MIN_FILES:
+            jobs = [(p, target_url, target_user, self.write_mode, datasources, None) for p in paths]
+            files = self._plan_in_pool(jobs, workers, progress, cancel)
+            return ChangePlan(target_url, target_user, files, datasources)
+        files = []
+        for i, p in enumerate(paths):
+            if cancel is not None and cancel.is_set():
+                break
+            files.append(self.plan_file(p, target_url, target_user, datasources))
+            if progress is not None:
+                progress(i + 1, len(paths), p)
+        return ChangePlan(target_url, target_user, files, datasources)
+
+    def _plan_in_pool(self, jobs, workers, progress=None, cancel=None):
+        """Planowanie w puli procesów: proces roboczy parsuje plik raz, planuje go i od razu przygotowuje
+        nową treść (FilePlan.rendered), więc zapis i podgląd nie parsują pliku ponownie w tym procesie."""
+        return [fp for fp in _run_in_pool(_plan_worker, jobs, workers, progress, cancel) if fp is not None]
+
+    def plan_profile_file(self, path, profile):
+        """Plan pliku dla profilu środowiska (EnvironmentProfile): wszystkie pasujące reguły jako edycje
+        jednego przebiegu. Reguła bez wzorca plików, której datasource'a nie ma w pliku, jest pomijana;
+        datasource'y znalezione w pliku trafiają do found_datasources (zob. ChangePlan.missing_datasources)."""
+        whole, scoped = profile.rules_for(path)
+        try:
+            doc = load_document(path)
+            targets = self.describe_targets(path) if whole else None
+            available = self.describe_datasources(path) if scoped else []
+        except Exception as e:
+            return FilePlan(path, error=e)
+        metrics.count("files_planned")
+        fp = FilePlan(path, tree=doc.tree, fingerprint=doc.fingerprint)
+        fp.edits = []
+
+        def resolve(rule, names, scopes):
+            has_url, change_url = _target_state(scopes, rule.url, "live_urls", "commented_urls")
+            has_user, change_user = _target_state(scopes, rule.user, "live_users", "commented_users")
+            if names is not None:
+                # stan z planowania jest sprzed edycji – wcześniejsza reguła dla całego pliku mogła
+                # zakomentować cel tej reguły, więc jej edycja musi zostać zastosowana po tamtej
+                change_url = change_url or (has_url and any(url for n, url, _u in fp.edits if n is None))
+                change_user = change_user or (has_user and any(user for n, _u, user in fp.edits if n is None))
+            if rule.url and not has_url:
+                fp.unresolved.append(f"{rule.label()}: brak URL {rule.url}")
+            if rule.user and not has_user:
+                fp.unresolved.append(f"{rule.label()}: brak użytkownika {rule.user}")
+            fp.has_url = fp.has_url or has_url
+            fp.has_user = fp.has_user or has_user
+            if change_url or change_user:
+                fp.edits.append((names, rule.url if change_url else "", rule.user if change_user else ""))
+
+        for rule in whole:
+            resolve(rule, None, [targets])
+        for rule in scoped:
+            selected = [d for d in available if rule.datasource in (d["jndi-name"], d["pool-name"])]
+            if selected and rule.datasource not in fp.found_datasources:
+                fp.found_datasources.append(rule.datasource)
+            if not selected:
+                if rule.files:
+                    fp.unresolved.append(f"{rule.label()}: brak datasource'a")
+                continue
+            resolve(rule, [rule.datasource], selected)
+        fp.change_url = any(url for _n, url, _u in fp.edits)
+        fp.change_user = any(user for _n, _u, user in fp.edits)
+        return fp
+
+    def plan_profile(self, paths, profile, progress=None, cancel=None, workers=None):
+        """ChangePlan profilu środowiska – jak plan_changes, z edycjami ustalonymi osobno dla każdego pliku."""
+        if workers is None:
+            workers = self._workers_setting()
+        if workers > 1 and len(paths) >= PARALLEL_MIN_FILES:
+            jobs = [(p, "", "", self.write_mode, None, profile) for p in paths]
+            return ChangePlan("", "", self._plan_in_pool(jobs, workers, progress, cancel),
+                              profile.datasources() or None, profile=profile.name)
+        files = []
+        for i, p in enumerate(paths):
+            if cancel is not None and cancel.is_set():
+                break
+            files.append(self.plan_profile_file(p, profile))
+            if progress is not None:
+                progress(i + 1, len(paths), p)
+        return ChangePlan("", "", files, profile.datasources() or None, profile=profile.name)
+
+    def _backup_settings(self):
         backup_root = (
             self.settings.get_effective_backup_dir() if self.settings else os.path.join(CONFIG_DIR, "backups"))
         limit = (self.settings.get_backup_limit() if self.settings else 5)
-        bkp = backup_file(path, backup_root, limit)
+        return backup_root, limit
+
+    def backup_store(self):
+        backup_root, limit = self._backup_settings()
+        compression = self.settings.get_backup_compression() if self.settings else "none"
+        return BackupStore(backup_root, limit, compression)
+
+    def _load_for_edit(self, fp):
+        """Prywatna kopia drzewa pliku oraz jego bajty źródłowe."""
+        with metrics.phase("read", fp.path), open(fp.path, "rb") as f:
+            source = f.read()
+        metrics.count("bytes_read", len(source))
+        # drzewo z planu jest współdzielone przez cache – modyfikujemy kopię;
+        # jeśli plik zmienił się od czasu planowania, parsujemy właśnie odczytaną treść
+        if fp.tree is not None and file_fingerprint(fp.path) == fp.fingerprint:
+            tree = copy.deepcopy(fp.tree)
+        else:
+            tree = parse_xml_bytes(source, fp.path)
+        return tree, source
+
+    def render_file_plan(self, fp, target_url, target_user):
+        """Zwraca nową treść pliku (bytes) po zastosowaniu planowanych edycji – bez zapisu."""
+        return self._render(fp, target_url, target_user)[1]
+
+    def _render(self, fp, target_url, target_user):
+        """(bieżąca treść, nowa treść) pliku – ta sama ścieżka co przy zapisie, w całości w pamięci."""
+        if fp.rendered is not None and file_fingerprint(fp.path) == fp.fingerprint:
+            with metrics.phase("read", fp.path), open(fp.path, "rb") as f:
+                source = f.read()
+            metrics.count("bytes_read", len(source))
+            return source, fp.rendered
+        tree, source = self._load_for_edit(fp)
+        editor = None
+        if self.write_mode == WRITE_SURGICAL:
+            try:
+                editor = SurgicalEditor(tree, source)
+            except SurgicalMismatch:
+                editor = None  # nietypowa struktura pliku – pełny zapis z normalizacją
+        if editor is None:
+            normalize_xml_structure(tree)
+        self.apply_edits(tree, fp.file_edits(target_url, target_user))
+        with metrics.phase("serialize", fp.path):
+            data = editor.render() if editor is not None else serialize_xml(tree)
+        return source, data
+
+    def diff_file_plan(self, fp, target_url, target_user, context=3, keep_model=False):
+        try:
+            source, data = self._render(fp, target_url, target_user)
+        except Exception as e:
+            return FileDiff(fp.path, "error", error=e)
+        return make_diff(fp.path, fp.category, source, data, context, keep_model)
+
+    def diff_plan(self, plan, workers=None, progress=None, cancel=None, context=3, keep_model=False):
+        """Próba „na sucho”: dla każdego pliku planu wynik FileDiff (unified diff + statystyki),
+        bez kopii zapasowych i zapisu. Przy workers > 1 pliki są przetwarzane w puli procesów.
+        keep_model=True zachowuje DiffModel (treść linii) dla podglądu w UI."""
+        if workers is None:
+            workers = self._workers_setting()
+        to_diff = plan.to_apply()
+        total = len(to_diff)
+
+        done = {}
+        if workers > 1 and total >= PARALLEL_MIN_FILES:
+            jobs = [
+                (fp.path, fp.change_url, fp.change_user, plan.target_url, plan.target_user, self.write_mode, context,
+                 keep_model, fp.datasources, fp.edits, fp.fingerprint, fp.rendered)
+                for fp in to_diff
+            ]
+            pool_results = _run_in_pool(_diff_worker, jobs, workers, progress, cancel)
+            done = {fp.path: r for fp, r in zip(to_diff, pool_results) if r is not None}
+        else:
+            for fp in to_diff:
+                if cancel is not None and cancel.is_set():
+                    break
+                done[fp.path] = self.diff_file_plan(fp, plan.target_url, plan.target_user, context, keep_model)
+                if progress is not None:
+                    progress(len(done), total, fp.path)
+
+        results = []
+        for fp in plan.files:
+            if fp.error is not None:
+                results.append(FileDiff(fp.path, "error", error=fp.error))
+            elif not fp.will_change:
+                results.append(FileDiff(fp.path, fp.category))
+            else:
+                results.append(done.get(fp.path) or FileDiff(fp.path, "cancelled"))
+        return results
+
+    def diff_files(self, paths, target_url, target_user, workers=None, progress=None, cancel=None, context=3,
+                   keep_model=False, datasources=None):
+        """Co zmieniłoby zastosowanie URL/użytkownika do `paths` – lista FileDiff w kolejności plików."""
+        plan = self.plan_changes(paths, target_url, target_user, progress=progress, cancel=cancel,
+                                 datasources=datasources, workers=workers)
+        return self.diff_plan(plan, workers=workers, progress=progress, cancel=cancel, context=context,
+                              keep_model=keep_model)
 
-        write_xml(tree, path)
+    def apply_file_plan(self, fp, target_url, target_user, store, batch=None, op_id=None):
+        """Kopia zapasowa (BackupStore) i zapis pliku. Z `batch` (WriteBatch) plik jest tylko
+        przygotowany – podmiana nastąpi przy commit_writes(batch). Jeśli nowa treść jest identyczna
+        z bieżącą, kopia i zapis są pomijane (plik zachowuje mtime) – zwraca wtedy None."""
+        source, data = self._render(fp, target_url, target_user)
+        if data == source:
+            metrics.count("files_unchanged")
+            return None
+        bkp = store.backup(fp.path, op_id, batch)
+        if batch is None:
+            write_xml_bytes(data, fp.path)
+        else:
+            with metrics.phase("write", fp.path):
+                batch.stage(fp.path, data)
+            metrics.count("bytes_written", len(data))
+        fp.tree = None
         return bkp
 
+    def apply_plan(self, plan, workers=None, progress=None, cancel=None):
+        """Wykonuje plan, wykorzystując drzewa sparsowane podczas planowania.
+        Przy workers > 1 pliki są przetwarzane w puli procesów (każdy proces parsuje swój plik) – z wyjątkiem
+        plików, których nową treść przygotowało planowanie w puli (FilePlan.rendered): te są tylko
+        kopiowane i zapisywane w tym procesie, bez ponownego parsowania.
+        Anulowanie działa pomiędzy plikami – rozpoczęty plik jest zawsze zapisywany w całości.
+        Pliki są zapisywane grupowo (WriteBatch): najpierw wszystkie pliki tymczasowe,
+        potem utrwalenie kopii i plików (fsync) i atomowa podmiana.
+        Zwraca listę FileResult w kolejności plików planu."""
+        store = self.backup_store()
+        op_id = new_operation_id()
+        if workers is None:
+            workers = self._workers_setting()
+        to_apply = plan.to_apply()
+        total = len(to_apply)
+
+        done = {}
+        if workers > 1 and sum(fp.rendered is None for fp in to_apply) >= PARALLEL_MIN_FILES:
+            jobs = [
+                (fp.path, fp.change_url, fp.change_user, plan.target_url, plan.target_user, store, op_id,
+                 self.write_mode, fp.datasources, fp.edits, fp.fingerprint, fp.rendered)
+                for fp in to_apply
+            ]
+            pool_results = _run_in_pool(_apply_plan_worker, jobs, workers, progress, cancel)
+            batch = _collect_staged(pool_results)
+            done = {fp.path: r[0] for fp, r in zip(to_apply, pool_results) if r is not None}
+            for fp in to_apply:
+                fp.tree = None
+        else:
+            batch = WriteBatch()
+            for fp in to_apply:
+                if cancel is not None and cancel.is_set():
+                    break
+                done[fp.path] = self._apply_one(fp, plan.target_url, plan.target_user, store, batch, op_id)
+                if progress is not None:
+                    progress(len(done), total, fp.path)
+        _commit(batch, done)
+        store.manifest.compact()
+
+        results = []
+        for fp in plan.files:
+            if not fp.will_change:
+                results.append(FileResult(fp.path, fp.category, error=fp.error))
+            else:
+                results.append(done.get(fp.path) or FileResult(fp.path, "cancelled"))
+        return results
+
+    def _apply_one(self, fp, target_url, target_user, store, batch=None, op_id=None):
+        try:
+            bkp = self.apply_file_plan(fp, target_url, target_user, store, batch, op_id)
+            if bkp is None:
+                return FileResult(fp.path, "active")
+            metrics.count("files_applied")
+            return FileResult(fp.path, fp.category, backup=bkp)
+        except Exception as e:
+            metrics.count("files_failed")
+            return FileResult(fp.path, "error", error=e)
+
+    def apply_changes_to_files(self, paths, target_url, target_user, workers=None, progress=None, cancel=None,
+                               datasources=None):
+        """Wersja wsadowa apply_changes_to_file: planowanie i zapis każdego pliku odbywa się
+        w procesie roboczym, więc plik jest parsowany dokładnie raz. Wyniki w kolejności `paths`."""
+        target_url = (target_url or "").strip()
+        target_user = (target_user or "").strip()
+        if workers is None:
+            workers = self._workers_setting()
+
+        if workers > 1 and len(paths) >= PARALLEL_MIN_FILES:
+            store = self.backup_store()
+            op_id = new_operation_id()
+            datasources = list(datasources) if datasources else None
+            jobs = [(p, target_url, target_user, store, op_id, self.write_mode, datasources) for p in paths]
+            pool_results = _run_in_pool(_plan_and_apply_worker, jobs, workers, progress, cancel)
+            done = {p: r[0] for p, r in zip(paths, pool_results) if r is not None}
+            _commit(_collect_staged(pool_results), done)
+            store.manifest.compact()
+            return [done.get(p) or FileResult(p, "cancelled") for p in paths]
+
+        plan = self.plan_changes(paths, target_url, target_user, cancel=cancel, datasources=datasources, workers=1)
+        results = self.apply_plan(plan, workers=1, progress=progress, cancel=cancel)
+        return results + [FileResult(p, "cancelled") for p in paths[len(results):]]
+
+    def _workers_setting(self):
+        return self.settings.get_apply_workers() if self.settings else 1
+
+    def apply_changes_to_file(self, path, target_url, target_user):
+        plan = self.plan_changes([path], target_url, target_user)
+        fp = plan.files[0]
+        if fp.error is not None:
+            raise fp.error
+        if not fp.will_change:
+            return None
+        return self.apply_file_plan(fp, plan.target_url, plan.target_user, self.backup_store())
+
+
 def activate_connection_url(self, tree, target_url):
     root = tree.getroot()
 
@@ -151,3 +554,144 @@ def activate_connection_url(self, tree, target_url):
             txt = (u.text or "").strip()
             if txt != target_url:
                 element_to_comment(u)
+
+
+PARALLEL_MIN_FILES = 8
+
+
+def _urls_and_users(found):
+    urls = {u for u in found["live_urls"] + found["commented_urls"] if u}
+    users = {u for u in found["live_users"] + found["commented_users"] if u}
+    return sorted(urls), sorted(users)
+
+
+def _target_state(scopes, target, live_key, commented_key):
+    """(cel występuje, aktywacja coś zmieni) dla zakresów – słowników jak DatasourceNodes.describe().
+    Aktywacja nic nie zmienia, gdy cel jest jedynym aktywnym elementem i nie ma go w komentarzach."""
+    present = change = False
+    if not target:
+        return present, change
+    for scope in scopes:
+        live, commented = scope[live_key], scope[commented_key]
+        if target in commented:
+            present = change = True
+        elif target in live:
+            present = True
+            change = change or any(t != target for t in live)
+    return present, change
+
+
+def _run_in_pool(fn, jobs, workers, progress=None, cancel=None):
+    """Uruchamia fn dla każdego zadania w puli procesów. Zwraca wyniki w kolejności zadań;
+    zadania anulowane przed startem mają wynik None."""
+    results = [None] * len(jobs)
+    with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as pool:
+        futures = {pool.submit(_metered, fn, job): i for i, job in enumerate(jobs)}
+        completed = 0
+        for fut in as_completed(futures):
+            i = futures[fut]
+            results[i] = _unmeter(fut.result())
+            completed += 1
+            if progress is not None:
+                progress(completed, len(jobs), jobs[i][0])
+            if cancel is not None and cancel.is_set():
+                for f in futures:
+                    f.cancel()
+                break
+    # zadania, które już działały w chwili anulowania, zostały dokończone przez pulę
+    for fut, i in futures.items():
+        if results[i] is None and not fut.cancelled():
+            results[i] = _unmeter(fut.result())
+    return results
+
+
+def _metered(fn, job):
+    # proces roboczy mógł odziedziczyć (fork) lub zebrać wcześniej pomiary – odsyłamy tylko pomiary zadania
+    metrics.drain()
+    return fn(job), metrics.drain()
+
+
+def _unmeter(outcome):
+    result, raw = outcome
+    metrics.merge(raw)
+    return result
+
+
+def _collect_staged(pool_results):
+    batch = WriteBatch()
+    for r in pool_results:
+        if r is not None:
+            batch.add(r[1])
+    return batch
+
+
+def _commit(batch, results):
+    """Podmienia przygotowane pliki; nieudana podmiana zmienia wynik pliku na błąd."""
+    for path, e in commit_writes(batch).items():
+        result = results[path]
+        results[path] = FileResult(path, "error", backup=result.backup, error=e)
+
+
+def _worker_error(e):
+    # wyjątki lxml nie dają się zserializować między procesami
+    return RuntimeError(f"{type(e).__name__}: {e}")
+
+
+def _diff_worker(job):
+    (path, change_url, change_user, target_url, target_user, write_mode, context, keep_model, datasources, edits,
+     fingerprint, rendered) = job
+    fp = FilePlan(path, has_url=change_url, has_user=change_user, fingerprint=fingerprint, datasources=datasources)
+    fp.change_url = change_url
+    fp.change_user = change_user
+    fp.edits = edits
+    fp.rendered = rendered
+    result = XMLProcessor(write_mode=write_mode).diff_file_plan(fp, target_url, target_user, context, keep_model)
+    if result.error is not None:
+        result.error = _worker_error(result.error)
+    return result
+
+
+def _apply_plan_worker(job):
+    (path, change_url, change_user, target_url, target_user, store, op_id, write_mode, datasources, edits,
+     fingerprint, rendered) = job
+    fp = FilePlan(path, has_url=change_url, has_user=change_user, fingerprint=fingerprint, datasources=datasources)
+    fp.change_url = change_url
+    fp.change_user = change_user
+    fp.edits = edits
+    fp.rendered = rendered
+    batch = WriteBatch()
+    result = XMLProcessor(write_mode=write_mode)._apply_one(fp, target_url, target_user, store, batch, op_id)
+    if result.error is not None:
+        result.error = _worker_error(result.error)
+    return result, batch.pending
+
+
+def _plan_worker(job):
+    path, target_url, target_user, write_mode, datasources, profile = job
+    processor = XMLProcessor(write_mode=write_mode)
+    if profile is not None:
+        fp = processor.plan_profile_file(path, profile)
+    else:
+        fp = processor.plan_file(path, target_url, target_user, datasources)
+    if fp.will_change:
+        try:
+            fp.rendered = processor.render_file_plan(fp, target_url, target_user)
+        except Exception:
+            pass  # błąd zostanie zgłoszony przy zapisie lub podglądzie pliku
+    fp.tree = None
+    if fp.error is not None:
+        fp.error = _worker_error(fp.error)
+    return fp
+
+
+def _plan_and_apply_worker(job):
+    path, target_url, target_user, store, op_id, write_mode, datasources = job
+    processor = XMLProcessor(write_mode=write_mode)
+    fp = processor.plan_file(path, target_url, target_user, datasources)
+    if not fp.will_change:
+        return FileResult(path, fp.category, error=_worker_error(fp.error) if fp.error else None), []
+    batch = WriteBatch()
+    result = processor._apply_one(fp, target_url, target_user, store, batch, op_id)
+    if result.error is not None:
+        result.error = _worker_error(result.error)
+    return result, batch.pending
@@ -0,0 +1,147 @@
+# profiling.py
+import cProfile
+import io
+import os
+import pstats
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+from config.settings_manager import CONFIG_DIR
+
+# FLYBOSS_PROFILE=1 włącza profilowanie niezależnie od ustawień, FLYBOSS_PROFILE=0 je wyłącza
+PROFILE_ENV = "FLYBOSS_PROFILE"
+PROFILE_DIR = os.path.join(CONFIG_DIR, "profiles")
+# liczba zachowywanych przebiegów (para .prof + .txt); starsze są usuwane
+PROFILE_LIMIT = 20
+# liczba ramek stosu zapamiętywanych przy każdej alokacji (tracemalloc)
+TRACE_FRAMES = 10
+TOP_FUNCTIONS = 40
+TOP_ALLOCATIONS = 30
+
+
+def profiling_enabled(settings=None):
+    value = os.environ.get(PROFILE_ENV, "").strip().lower()
+    if value:
+        return value not in ("0", "false", "no", "off")
+    return bool(settings.get_profiling()) if settings is not None else False
+
+
+class ProfileRun:
+    """Jeden przebieg profilowania: cProfile (wątek, w którym uruchomiono start()) oraz
+    tracemalloc (alokacje całego procesu). save() zapisuje <czas>_<nazwa>.prof (do snakeviz,
+    `python -m pstats`) i raport tekstowy <czas>_<nazwa>.txt z najkosztowniejszymi funkcjami
+    i miejscami alokacji. Procesy robocze puli nie są profilowane – pełny profil daje apply_workers = 1."""
+
+    def __init__(self, name, directory=PROFILE_DIR, limit=PROFILE_LIMIT):
+        self.name = name
+        self.directory = directory
+        self.limit = max(1, limit)
+        self.profile = None
+        self.prof_path = self.report_path = None
+        self._own_tracing = False
+        self._t0 = 0.0
+        self._snapshot = None
+        self._memory = (0, 0)
+
+    def start(self):
+        self._own_tracing = not tracemalloc.is_tracing()
+        if self._own_tracing:
+            tracemalloc.start(TRACE_FRAMES)
+        tracemalloc.reset_peak()
+        self.profile = cProfile.Profile()
+        try:
+            self.profile.enable()
+        except ValueError:
+            # inny profiler jest już aktywny (np. debugger) – zostają tylko pomiary pamięci
+            self.profile = None
+        self._t0 = time.perf_counter()
+        return self
+
+    def stop(self):
+        self.elapsed = time.perf_counter() - self._t0
+        if self.profile is not None:
+            self.profile.disable()
+        self._memory = tracemalloc.get_traced_memory()
+        self._snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+        ))
+        if self._own_tracing:
+            tracemalloc.stop()
+
+    def save(self):
+        os.makedirs(self.directory, exist_ok=True)
+        stamp = time.strftime("%Y-%m-%d_%H-%M-%S")
+        base = os.path.join(self.directory, f"{stamp}_{os.getpid()}_{self.name}")
+        if self.profile is not None:
+            self.prof_path = base + ".prof"
+            self.profile.dump_stats(self.prof_path)
+        self.report_path = base + ".txt"
+        with open(self.report_path, "w", encoding="utf-8") as f:
+            f.write(self.report())
+        prune_profiles(self.directory, self.limit)
+        return self.report_path
+
+    def report(self):
+        current, peak = self._memory
+        out = [
+            f"operacja: {self.name}",
+            f"czas: {self.elapsed:.3f} s",
+            f"pamięć (tracemalloc): bieżąca {current / 2 ** 20:.1f} MiB, szczyt {peak / 2 ** 20:.1f} MiB",
+            f"python {sys.version.split()[0]}, pid {os.getpid()}",
+            "",
+        ]
+        if self.profile is not None:
+            buf = io.StringIO()
+            stats = pstats.Stats(self.profile, stream=buf).strip_dirs()
+            stats.sort_stats("cumulative").print_stats(TOP_FUNCTIONS)
+            out += ["== funkcje wg czasu łącznego ==", buf.getvalue().strip(), ""]
+            buf = io.StringIO()
+            pstats.Stats(self.profile, stream=buf).strip_dirs().sort_stats("tottime").print_stats(TOP_FUNCTIONS)
+            out += ["== funkcje wg czasu własnego ==", buf.getvalue().strip(), ""]
+        else:
+            out += ["(cProfile niedostępny – aktywny inny profiler)", ""]
+        out.append(f"== miejsca alokacji z największą pamięcią zajętą na koniec operacji ({TOP_ALLOCATIONS}) ==")
+        for stat in self._snapshot.statistics("lineno")[:TOP_ALLOCATIONS]:
+            frame = stat.traceback[0]
+            out.append(f"{stat.size / 1024:10.1f} KiB  {stat.count:8} bloków  {frame.filename}:{frame.lineno}")
+        return "\n".join(out) + "\n"
+
+
+def prune_profiles(directory, limit=PROFILE_LIMIT):
+    """Zostawia `limit` najnowszych przebiegów (pliki o wspólnym prefiksie <czas>_<pid>_<nazwa>)."""
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return
+    runs = {}
+    for name in names:
+        stem, ext = os.path.splitext(name)
+        if ext in (".prof", ".txt"):
+            runs.setdefault(stem, []).append(os.path.join(directory, name))
+    for stem in sorted(runs, reverse=True)[limit:]:
+        for path in runs[stem]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+@contextmanager
+def profiled(name, settings=None):
+    """Profiluje blok, jeśli profilowanie jest włączone (FLYBOSS_PROFILE lub ustawienia); w przeciwnym
+    razie nic nie robi. Zwraca ProfileRun (po wyjściu z bloku – ze ścieżkami plików) albo None."""
+    if not profiling_enabled(settings):
+        yield None
+        return
+    run = ProfileRun(name, limit=settings.get_profile_limit() if settings is not None else PROFILE_LIMIT).start()
+    try:
+        yield run
+    finally:
+        run.stop()
+        try:
+            run.save()
+        except OSError as e:
+            print(f"[WARN] zapis profilu {name}: {e}", file=sys.stderr)
@@ -0,0 +1,138 @@
+# scanner.py
+from lxml import etree
+
+from .utils import try_parse_comment_as_element
+
+# elementy, wewnątrz których szukamy connection-url / security (i ich komentarzy)
+SCOPE_TAGS = ("datasources", "datasource", "xa-datasource")
+
+
+def _local(tag):
+    return tag.split("}")[-1] if isinstance(tag, str) else ""
+
+
+def _user_name(sec):
+    un = sec.find(".//{*}user-name")
+    if un is not None and un.text and un.text.strip():
+        return un.text.strip()
+    return None
+
+
+# tylko te elementy generują zdarzenia start/end; komentarze przychodzą zawsze
+_EVENT_TAGS = [f"{{*}}{t}" for t in SCOPE_TAGS + ("connection-url", "security")]
+
+
+def _release(el):
+    """Zwalnia przetworzone fragmenty drzewa: element oraz zakończonych poprzedników
+    jego i wszystkich przodków, aby pamięć pozostała stała."""
+    if not isinstance(el, etree._Comment):
+        el.clear(keep_tail=True)
+    node = el
+    parent = node.getparent()
+    while parent is not None:
+        while node.getprevious() is not None:
+            del parent[0]
+        node, parent = parent, parent.getparent()
+
+
+class StreamScan:
+    """Strumieniowy skaner pliku (etree.iterparse).
+
+    Analizowane są tylko fragmenty wewnątrz <datasources>/<datasource>/<xa-datasource>;
+    reszta dokumentu (inne podsystemy standalone.xml/domain.xml) jest zwalniana na bieżąco.
+    """
+
+    def __init__(self, source):
+        self.source = source
+        self.live_urls = set()
+        self.commented_urls = set()
+        self.live_users = set()
+        self.commented_users = set()
+        self.datasources = []
+
+    def _found_url(self, url, live):
+        (self.live_urls if live else self.commented_urls).add(url)
+
+    def _found_user(self, name, live):
+        (self.live_users if live else self.commented_users).add(name)
+
+    def _comment(self, c):
+        el = try_parse_comment_as_element(c)
+        if el is None:
+            return
+        local = _local(el.tag)
+        if local == "connection-url":
+            if el.text and el.text.strip():
+                self._found_url(el.text.strip(), live=False)
+        elif local == "security":
+            name = _user_name(el)
+            if name:
+                self._found_user(name, live=False)
+
+    def run(self):
+        scope = 0
+        context = etree.iterparse(
+            self.source, events=("start", "end", "comment"), tag=_EVENT_TAGS,
+            remove_blank_text=False, remove_comments=False, strip_cdata=False,
+        )
+        for event, el in context:
+            if event == "comment":
+                if scope:
+                    self._comment(el)
+                else:
+                    _release(el)
+            elif event == "start":
+                local = _local(el.tag)
+                if local in SCOPE_TAGS:
+                    # atrybuty odczytujemy przed zwolnieniem – clear() usuwa też atrybuty elementu
+                    if local != "datasources":
+                        self.datasources.append({
+                            "jndi-name": el.get("jndi-name", ""),
+                            "pool-name": el.get("pool-name", ""),
+                        })
+                    if not scope:
+                        _release(el)
+                    scope += 1
+            else:
+                local = _local(el.tag)
+                if scope:
+                    if local == "connection-url":
+                        if el.text and el.text.strip():
+                            self._found_url(el.text.strip(), live=True)
+                    elif local == "security":
+                        name = _user_name(el)
+                        if name:
+                            self._found_user(name, live=True)
+                if local in SCOPE_TAGS:
+                    scope -= 1
+                _release(el)
+        del context
+        return self
+
+    @property
+    def urls(self):
+        return sorted(self.live_urls | self.commented_urls)
+
+    @property
+    def users(self):
+        return sorted(self.live_users | self.commented_users)
+
+    def describe(self):
+        return {
+            "live_urls": sorted(self.live_urls),
+            "commented_urls": sorted(self.commented_urls),
+            "live_users": sorted(self.live_users),
+            "commented_users": sorted(self.commented_users),
+            "datasources": self.datasources,
+        }
+
+
+def scan_urls_and_users(source):
+    """Odpowiednik XMLProcessor.collect_urls_and_users bez budowania całego drzewa."""
+    s = StreamScan(source).run()
+    return s.urls, s.users
+
+
+def describe_file(source):
+    """Aktywne i zakomentowane URL/użytkownicy oraz nazwy datasource'ów dokumentu."""
+    return StreamScan(source).run().describe()
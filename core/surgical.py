@@ -0,0 +1,174 @@
+# surgical.py
+import codecs
+import re
+
+from lxml import etree
+
+TARGET_TAGS = ("connection-url", "security")
+
+_ATTRS = r"""(?:[^>"']|"[^"]*"|'[^']*')*?"""
+_TOKEN_RE = re.compile(
+    r"<!--(?P<comment>.*?)-->"
+    r"|<!\[CDATA\[.*?\]\]>"
+    r"|<\?.*?\?>"
+    r"|<!DOCTYPE(?:[^\[>]|\[.*?\])*>"
+    rf"|<(?P<close>/?)(?P<name>[^\s/>!?]+){_ATTRS}(?P<selfclose>/?)>",
+    re.S,
+)
+_DECL_ENCODING_RE = re.compile(rb"""^\s*<\?xml[^>]*?encoding\s*=\s*["']([A-Za-z0-9._-]+)["']""")
+
+
+class SurgicalMismatch(Exception):
+    """Drzewo nie odpowiada 1:1 tekstowi źródłowemu – należy użyć pełnego zapisu."""
+
+
+def detect_encoding(data):
+    if data.startswith(codecs.BOM_UTF8):
+        return "utf-8-sig"
+    if data.startswith(codecs.BOM_UTF16_LE) or data.startswith(codecs.BOM_UTF16_BE):
+        return "utf-16"
+    m = _DECL_ENCODING_RE.match(data[:256])
+    return m.group(1).decode("ascii").lower() if m else "utf-8"
+
+
+def _local(tag):
+    return tag.split("}")[-1].split(":")[-1]
+
+
+def _source_spans(text):
+    """Zakresy (rodzaj, nazwa/treść, start, koniec) komentarzy oraz aktywnych <connection-url>/<security>
+    wewnątrz elementu głównego, w kolejności dokumentu."""
+    spans = []
+    depth = 0            # głębokość elementów (0 = poza elementem głównym)
+    root_seen = False
+    open_target = None   # (nazwa, start, zagnieżdżenie) otwartego elementu docelowego
+    for m in _TOKEN_RE.finditer(text):
+        name = m.group("name")
+        if m.group("comment") is not None:
+            if depth and open_target is None:
+                spans.append(("comment", m.group("comment"), m.start(), m.end()))
+            continue
+        if name is None:
+            continue
+        local = _local(name)
+        if m.group("close"):
+            depth -= 1
+            if open_target is not None and local == open_target[0]:
+                nesting = open_target[2] - 1
+                if nesting == 0:
+                    spans.append(("element", local, open_target[1], m.end()))
+                    open_target = None
+                else:
+                    open_target = (open_target[0], open_target[1], nesting)
+            continue
+        if root_seen and depth == 0:
+            break  # treść po elemencie głównym
+        root_seen = True
+        if m.group("selfclose"):
+            if open_target is None and local in TARGET_TAGS and depth:
+                spans.append(("element", local, m.start(), m.end()))
+            continue
+        depth += 1
+        if open_target is not None:
+            if local == open_target[0]:
+                open_target = (local, open_target[1], open_target[2] + 1)
+        elif local in TARGET_TAGS and depth > 1:
+            open_target = (local, m.start(), 1)
+    return spans
+
+
+def _tree_candidates(root):
+    """Komentarze oraz aktywne <connection-url>/<security> (bez ich potomków) w kolejności dokumentu,
+    razem z rodzicem i pozycją – edycje zamieniają węzły w miejscu, więc pozycja pozostaje ważna."""
+    out = []
+    stack = [iter(enumerate(root))]
+    parents = [root]
+    while stack:
+        try:
+            idx, node = next(stack[-1])
+        except StopIteration:
+            stack.pop()
+            parents.pop()
+            continue
+        if isinstance(node, etree._Comment):
+            out.append((parents[-1], idx, node))
+        elif isinstance(node.tag, str):
+            if _local(node.tag) in TARGET_TAGS:
+                out.append((parents[-1], idx, node))
+            elif len(node):
+                stack.append(iter(enumerate(node)))
+                parents.append(node)
+    return out
+
+
+class SurgicalEditor:
+    """Zapis zachowujący bajty pliku: po edycjach drzewa podmieniane są wyłącznie zakresy
+    zmienionych komentarzy i elementów <connection-url>/<security>; reszta pliku (deklaracja,
+    kodowanie, końce linii CRLF, białe znaki) pozostaje bez zmian.
+
+    Należy utworzyć edytor PRZED edycją drzewa. Edycje muszą zamieniać węzły w miejscu
+    (element_to_comment, replace_comment_with_element) – bez normalizacji całego dokumentu.
+    """
+
+    def __init__(self, tree, source):
+        self.tree = tree
+        self.source = source
+        self.encoding = detect_encoding(source)
+        try:
+            self.text = source.decode(self.encoding)
+        except (LookupError, UnicodeDecodeError) as e:
+            raise SurgicalMismatch(str(e))
+        self.newline = "\r\n" if "\r\n" in self.text else "\n"
+        self._pairs = self._match(_tree_candidates(tree.getroot()), _source_spans(self.text))
+
+    @staticmethod
+    def _match(candidates, spans):
+        if len(candidates) != len(spans):
+            raise SurgicalMismatch(f"{len(candidates)} węzłów w drzewie, {len(spans)} w tekście")
+        pairs = []
+        for (parent, idx, node), (kind, value, start, end) in zip(candidates, spans):
+            if isinstance(node, etree._Comment):
+                if kind != "comment" or value.replace("\r\n", "\n") != (node.text or ""):
+                    raise SurgicalMismatch(f"niezgodny komentarz na pozycji {start}")
+            elif kind != "element" or value != _local(node.tag):
+                raise SurgicalMismatch(f"niezgodny element na pozycji {start}")
+            pairs.append((parent, idx, node, start, end))
+        return pairs
+
+    def _serialize(self, node, parent):
+        if isinstance(node, etree._Comment):
+            out = f"<!--{node.text or ''}-->"
+        else:
+            out = etree.tostring(node, encoding="unicode", with_tail=False)
+            # element wstawiony w miejscu dziedziczy domyślną przestrzeń nazw rodzica
+            default_ns = parent.nsmap.get(None)
+            if default_ns:
+                head, sep, rest = out.partition(">")
+                out = head.replace(f' xmlns="{default_ns}"', "", 1) + sep + rest
+        if self.newline != "\n":
+            out = out.replace("\r\n", "\n").replace("\n", self.newline)
+        return out
+
+    def changes(self):
+        """Lista (start, koniec, nowy_tekst) dla zmienionych zakresów."""
+        out = []
+        for parent, idx, node, start, end in self._pairs:
+            current = parent[idx] if idx < len(parent) else None
+            if current is node:
+                continue
+            if current is None:
+                raise SurgicalMismatch("węzeł usunięty z drzewa")
+            out.append((start, end, self._serialize(current, parent)))
+        return out
+
+    def render(self):
+        pieces = []
+        pos = 0
+        for start, end, new_text in self.changes():
+            pieces.append(self.text[pos:start])
+            pieces.append(new_text)
+            pos = end
+        if pos == 0:
+            return self.source
+        pieces.append(self.text[pos:])
+        return "".join(pieces).encode(self.encoding, errors="xmlcharrefreplace")
@@ -1,12 +1,138 @@
 # utils.py
+import copy
+import os
+import re
+import threading
+from collections import OrderedDict
 from lxml import etree
 
-def read_xml(path):
-    parser = etree.XMLParser(remove_blank_text=False, strip_cdata=False, remove_comments=False)
-    return etree.parse(path, parser)
+from .atomic import atomic_write
+from .metrics import metrics
+
+TREE_CACHE_SIZE = 256
+
+_parser_local = threading.local()
+
+
+def _get_parser():
+    # XMLParser nie jest bezpieczny wątkowo – jedna instancja na wątek, używana wielokrotnie
+    parser = getattr(_parser_local, "parser", None)
+    if parser is None:
+        parser = etree.XMLParser(remove_blank_text=False, strip_cdata=False, remove_comments=False)
+        _parser_local.parser = parser
+    return parser
+
+
+def file_fingerprint(path):
+    st = os.stat(path)
+    return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+
+class CachedDocument:
+    """Sparsowany dokument współdzielony przez cache – drzewa nie wolno modyfikować.
+    `memo` przechowuje wyniki wyliczone z drzewa (ważne tak długo jak dokument)."""
+
+    def __init__(self, path, fingerprint, tree):
+        self.path = path
+        self.fingerprint = fingerprint
+        self.tree = tree
+        self.memo = {}
+
+
+class TreeCache:
+    """Ograniczony cache LRU sparsowanych dokumentów, walidowany przez stat (mtime_ns, size, inode)."""
+
+    def __init__(self, maxsize=TREE_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, path):
+        key = os.path.abspath(path)
+        fingerprint = file_fingerprint(key)
+        with self._lock:
+            doc = self._entries.get(key)
+            if doc is not None and doc.fingerprint == fingerprint:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return doc
+            self.misses += 1
+
+        with metrics.phase("parse", key):
+            doc = CachedDocument(key, fingerprint, etree.parse(key, _get_parser()))
+        metrics.count("files_parsed")
+        metrics.count("bytes_read", fingerprint[1])
+
+        with self._lock:
+            self._entries[key] = doc
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return doc
+
+    def invalidate(self, path=None):
+        with self._lock:
+            if path is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(os.path.abspath(path), None)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+tree_cache = TreeCache()
+metrics.add_source("tree_cache", tree_cache.stats)
+
+
+def load_document(path):
+    """Dokument z cache (CachedDocument) – drzewo jest współdzielone; do modyfikacji należy je skopiować."""
+    return tree_cache.get(path)
+
+
+def parse_xml_bytes(data, path=None):
+    with metrics.phase("parse", path):
+        tree = etree.fromstring(data, _get_parser(), base_url=path).getroottree()
+    metrics.count("files_parsed")
+    return tree
+
+
+def serialize_xml(tree):
+    return etree.tostring(tree, pretty_print=True, xml_declaration=True, encoding="UTF-8")
+
 
 def write_xml(tree, path):
-    tree.write(path, pretty_print=True, xml_declaration=True, encoding="utf-8")
+    write_xml_bytes(serialize_xml(tree), path)
+
+
+def write_xml_bytes(data, path):
+    with metrics.phase("write", path):
+        atomic_write(path, data)
+    metrics.count("files_written")
+    metrics.count("bytes_written", len(data))
+    tree_cache.invalidate(path)
+
+
+def commit_writes(batch):
+    """Podmienia pliki przygotowane w WriteBatch; zwraca {ścieżka: wyjątek} dla nieudanych."""
+    paths = batch.paths
+    with metrics.phase("commit"):
+        errors = batch.commit()
+    metrics.count("files_written", len(paths) - len(errors))
+    for p in paths:
+        tree_cache.invalidate(p)
+    return errors
 
 def findall_any_ns(root, local_name: str):
     return root.findall(f".//{{*}}{local_name}")
@@ -24,16 +150,30 @@ def _detect_indent_width(parent):
             return after_nl.replace("\t", "    ").count(" ")
     return 4
 
-def get_indent(node):
+class IndentMap:
+    """Mapa wcięć na czas jednego przebiegu normalizacji.
+
+    Szerokość wcięcia jest liczona raz dla każdego rodzica, a poprzednik węzła pobierany
+    w O(1) przez getprevious() – wskaźniki rodzeństwa w libxml2 pozostają poprawne po
+    zamianie węzłów (replace), więc mapa nie wymaga przebudowy po edycjach.
+    """
+
+    def __init__(self):
+        self._widths = {}
+
+    def width(self, parent):
+        w = self._widths.get(parent)
+        if w is None:
+            w = self._widths[parent] = _detect_indent_width(parent)
+        return w
+
+
+def get_indent(node, indents=None):
     parent = node.getparent()
     if parent is None:
         return ("", "    ")
-    base_width = _detect_indent_width(parent)
-    prev = None
-    for ch in parent:
-        if ch is node:
-            break
-        prev = ch
+    base_width = indents.width(parent) if indents is not None else _detect_indent_width(parent)
+    prev = node.getprevious()
     if prev is not None:
         sample = prev.tail or ""
     else:
@@ -87,21 +227,73 @@ def _make_block_comment_text(el, indent_for_node, indent_for_children):
         return f"<!--\n{indented_inner}\n{indent_for_node}-->"
 
 
-def element_to_comment(el):
+def element_to_comment(el, indents=None):
     parent = el.getparent()
-    idx = parent.index(el)
     old_tail = el.tail
     raw_xml = etree.tostring(el, encoding="unicode", with_tail=False)
-    indent_for_node, _ = get_indent(el)
+    indent_for_node, _ = get_indent(el, indents)
     comment_text = f"<!--\n{indent_for_node}{raw_xml}\n{indent_for_node}-->"
     new_comment = etree.Comment(comment_text[4:-3])
-    parent.remove(el)
-    parent.insert(idx, new_comment)
+    parent.replace(el, new_comment)
     new_comment.tail = old_tail
+    return new_comment
 
 
-def try_parse_comment_as_element(comment_node):
-    txt = (comment_node.text or "")
+# komentarz może zawierać <connection-url>/<security> tylko jeśli pojawia się taki znacznik otwierający
+_COMMENT_CANDIDATE_RE = re.compile(r"<\s*(?:[\w.-]+:)?(?:connection-url|security)[\s/>]")
+
+COMMENT_MEMO_SIZE = 4096
+
+
+class CommentParseMemo:
+    """Ograniczony cache LRU wyników parsowania treści komentarzy (tekst -> element lub None)."""
+
+    def __init__(self, maxsize=COMMENT_MEMO_SIZE):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.skipped = 0
+        self.parsed = 0
+        self.hits = 0
+
+    def lookup(self, text):
+        with self._lock:
+            if text in self._entries:
+                self._entries.move_to_end(text)
+                self.hits += 1
+                return True, self._entries[text]
+        return False, None
+
+    def store(self, text, el):
+        with self._lock:
+            self.parsed += 1
+            self._entries[text] = el
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def count_skipped(self):
+        with self._lock:
+            self.skipped += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "skipped": self.skipped,
+                "parsed": self.parsed,
+                "hits": self.hits,
+            }
+
+
+comment_memo = CommentParseMemo()
+metrics.add_source("comment_memo", comment_memo.stats)
+
+
+def _parse_comment_text(txt):
     s = txt.strip()
     if s.startswith("<") and s.endswith(">"):
         try:
@@ -120,26 +312,33 @@ def try_parse_comment_as_element(comment_node):
     return None
 
 
-
-def replace_comment_with_element(comment_node, element):
+def try_parse_comment_as_element(comment_node):
+    """Parsuje treść komentarza jako element. Rozpoznawane są tylko komentarze mogące zawierać
+    <connection-url>/<security> – pozostałe są odrzucane bez parsowania. Zwraca nową kopię
+    elementu (wywołujący może wstawić ją do drzewa) albo None."""
+    txt = (comment_node.text or "")
+    metrics.count("comments_inspected")
+    if not _COMMENT_CANDIDATE_RE.search(txt):
+        comment_memo.count_skipped()
+        return None
+    found, el = comment_memo.lookup(txt)
+    if not found:
+        el = _parse_comment_text(txt)
+        comment_memo.store(txt, el)
+    return copy.deepcopy(el) if el is not None else None
+
+
+def replace_comment_with_element(comment_node, element, indents=None):
     parent = comment_node.getparent()
-    idx = parent.index(comment_node)
 
     old_tail = comment_node.tail
 
-    parent.remove(comment_node)
-    parent.insert(idx, element)
+    parent.replace(comment_node, element)
 
     element.tail = old_tail
 
 
-def deep_clone_tree(tree):
-    from lxml import etree as _et
-    xml_bytes = _et.tostring(tree, pretty_print=False, xml_declaration=True, encoding="utf-8")
-    return _et.ElementTree(_et.fromstring(xml_bytes))
-
-
-def _normalize_comment_node(comment_node):
+def _normalize_comment_node(comment_node, indents=None):
     el = try_parse_comment_as_element(comment_node)
     if el is None:
         return False
@@ -148,19 +347,21 @@ def _normalize_comment_node(comment_node):
         return False
 
     parent = comment_node.getparent()
-    idx = parent.index(comment_node)
-    indent_for_node, indent_for_children = get_indent(comment_node)
+    indent_for_node, indent_for_children = get_indent(comment_node, indents)
 
     comment_text = _make_block_comment_text(el, indent_for_node, indent_for_children)
-    new_comment = etree.Comment(comment_text[4:-3].strip() if comment_text.startswith("<!--") else comment_text)
-    new_comment.tail = comment_node.tail
-    parent.remove(comment_node)
-    parent.insert(idx, new_comment)
+    text = comment_text[4:-3].strip() if comment_text.startswith("<!--") else comment_text
+    if comment_node.text == text:
+        return False  # już znormalizowany – bez przebudowy węzła
+    new_comment = etree.Comment(text)
+    old_tail = comment_node.tail
+    parent.replace(comment_node, new_comment)
+    new_comment.tail = old_tail
     return True
 
 
-def _normalize_live_element(el):
-    indent_for_node, indent_for_children = get_indent(el)
+def _normalize_live_element(el, indents=None):
+    indent_for_node, indent_for_children = get_indent(el, indents)
     if len(el):
         if not (el.text or "").strip():
             el.text = "\n" + indent_for_children
@@ -174,26 +375,34 @@ def _normalize_live_element(el):
 
 
 def normalize_xml_structure(tree):
+    with metrics.phase("normalize", tree.docinfo.URL):
+        _normalize_xml_structure(tree)
+
+
+def _normalize_xml_structure(tree):
     root = tree.getroot()
+    indents = IndentMap()
 
     changed = True
     for _ in range(2):
         changed = False
         for c in list(root.iter(etree.Comment)):
-            if _normalize_comment_node(c):
+            if _normalize_comment_node(c, indents):
                 changed = True
         if not changed:
             break
 
-    split_adjacent_comments(tree)
+    split_adjacent_comments(tree, indents)
 
     for cu in findall_any_ns(root, "connection-url"):
-        _normalize_live_element(cu)
+        _normalize_live_element(cu, indents)
     for sec in findall_any_ns(root, "security"):
-        _normalize_live_element(sec)
+        _normalize_live_element(sec, indents)
 
-def split_adjacent_comments(tree):
+def split_adjacent_comments(tree, indents=None):
     root = tree.getroot()
+    if indents is None:
+        indents = IndentMap()
 
     for parent in root.iter():
         children = list(parent)
@@ -209,7 +418,7 @@ def split_adjacent_comments(tree):
             is_b_comment = (type(b) is etree._Comment)
 
             if is_a_comment and is_b_comment:
-                indent_for_node, _ = get_indent(b)
+                indent_for_node, _ = get_indent(b, indents)
 
                 tail = a.tail or ""
                 if "\n" not in tail or tail.strip() == "":
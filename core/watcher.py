@@ -0,0 +1,285 @@
+# watcher.py
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import struct
+import sys
+import threading
+import time
+
+# zdarzenia z jednej serii (np. skrypt wdrożeniowy podmieniający kilka plików) są łączone
+DEBOUNCE_S = 0.5
+# przy ciągłych zmianach powiadomienie i tak przychodzi najpóźniej po tym czasie
+MAX_DELAY_S = 5.0
+# okres odpytywania os.stat, gdy inotify jest niedostępne (oraz ponawiania obserwacji brakujących katalogów)
+POLL_INTERVAL_S = 2.0
+
+_IN_ATTRIB = 0x00000004
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_FROM = 0x00000040
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_DELETE = 0x00000200
+_IN_DELETE_SELF = 0x00000400
+_IN_MOVE_SELF = 0x00000800
+_IN_Q_OVERFLOW = 0x00004000
+_IN_IGNORED = 0x00008000
+_IN_ONLYDIR = 0x01000000
+# obserwowany jest katalog, a nie sam plik: zapis atomowy (os.replace) podmienia i-węzeł pliku
+_DIR_MASK = (_IN_ATTRIB | _IN_CLOSE_WRITE | _IN_MOVED_FROM | _IN_MOVED_TO | _IN_CREATE | _IN_DELETE
+             | _IN_DELETE_SELF | _IN_MOVE_SELF | _IN_ONLYDIR)
+_EVENT = struct.Struct("iIII")
+
+
+def _load_libc():
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        libc.inotify_init1
+        libc.inotify_add_watch
+        libc.inotify_rm_watch
+    except (OSError, AttributeError):
+        return None
+    libc.inotify_add_watch.argtypes = (ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32)
+    libc.inotify_rm_watch.argtypes = (ctypes.c_int, ctypes.c_int)
+    return libc
+
+
+def _watch_names(paths):
+    """{katalog: {nazwa: {ścieżki}}} – dla dowiązań symbolicznych obserwowany jest też katalog pliku docelowego."""
+    dirs = {}
+    for p in paths:
+        for variant in {os.path.abspath(p), os.path.realpath(p)}:
+            directory, name = os.path.split(variant)
+            dirs.setdefault(directory, {}).setdefault(name, set()).add(p)
+    return dirs
+
+
+class _PollBackend:
+    """Porównuje (mtime_ns, rozmiar, i-węzeł) każdego pliku co POLL_INTERVAL_S."""
+
+    name = "poll"
+
+    def __init__(self, stop, poll_interval):
+        self._stop = stop
+        self._interval = poll_interval
+        self._stats = {}
+        self._next_poll = 0.0
+
+    @staticmethod
+    def _stat(path):
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_size, st.st_ino
+
+    def set_paths(self, paths):
+        self._stats = {p: self._stat(p) for p in paths}
+        self._next_poll = time.monotonic() + self._interval
+
+    def wait(self, timeout):
+        delay = max(0.0, self._next_poll - time.monotonic())
+        if timeout is not None:
+            delay = min(delay, timeout)
+        if self._stop.wait(delay) or time.monotonic() < self._next_poll:
+            return set()
+        self._next_poll = time.monotonic() + self._interval
+        changed = set()
+        for p, before in self._stats.items():
+            now = self._stat(p)
+            if now != before:
+                self._stats[p] = now
+                changed.add(p)
+        return changed
+
+    def close(self):
+        pass
+
+
+class _InotifyBackend:
+    """inotify (Linux) przez ctypes: jedna obserwacja na katalog, filtrowanie po nazwach plików."""
+
+    name = "inotify"
+
+    def __init__(self, libc, stop, poll_interval):
+        self._libc = libc
+        self._stop = stop
+        self._interval = poll_interval
+        fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1")
+        self._fd = fd
+        self._names = {}        # katalog -> {nazwa: {ścieżki}}
+        self._wd = {}           # katalog -> deskryptor obserwacji
+        self._dirs = {}         # deskryptor -> katalog
+        self._missing = set()   # katalogi, których (jeszcze) nie ma – ponawiane co poll_interval
+        self._next_retry = 0.0
+
+    def _add(self, directory):
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(directory), _DIR_MASK)
+        if wd < 0:
+            err = ctypes.get_errno()
+            if err in (errno.ENOENT, errno.ENOTDIR, errno.EACCES):
+                self._missing.add(directory)
+                return False
+            raise OSError(err, os.strerror(err), directory)
+        self._missing.discard(directory)
+        self._wd[directory] = wd
+        self._dirs[wd] = directory
+        return True
+
+    def set_paths(self, paths):
+        self._names = _watch_names(paths)
+        for directory in set(self._wd) - set(self._names):
+            wd = self._wd.pop(directory)
+            self._dirs.pop(wd, None)
+            self._libc.inotify_rm_watch(self._fd, wd)
+        self._missing &= set(self._names)
+        for directory in self._names:
+            if directory not in self._wd:
+                self._add(directory)
+
+    def _retry_missing(self):
+        changed = set()
+        for directory in list(self._missing):
+            if directory in self._names and self._add(directory):
+                changed.update(*self._names[directory].values())
+        return changed
+
+    def wait(self, timeout):
+        changed = set()
+        now = time.monotonic()
+        if self._missing and now >= self._next_retry:
+            self._next_retry = now + self._interval
+            changed |= self._retry_missing()
+        # krótki limit, aby stop() działał bez osobnego kanału wybudzania
+        limit = 0.25 if timeout is None else min(timeout, 0.25)
+        if self._missing:
+            limit = min(limit, max(0.0, self._next_retry - now))
+        ready, _w, _x = select.select([self._fd], [], [], limit)
+        if not ready or self._stop.is_set():
+            return changed
+        try:
+            data = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return changed
+        offset = 0
+        while offset + _EVENT.size <= len(data):
+            wd, mask, _cookie, length = _EVENT.unpack_from(data, offset)
+            name = data[offset + _EVENT.size:offset + _EVENT.size + length].rstrip(b"\0")
+            offset += _EVENT.size + length
+            if mask & _IN_Q_OVERFLOW:
+                for names in self._names.values():
+                    changed.update(*names.values())
+                continue
+            directory = self._dirs.get(wd)
+            if directory is None:
+                continue
+            names = self._names.get(directory, {})
+            if mask & (_IN_IGNORED | _IN_DELETE_SELF | _IN_MOVE_SELF):
+                # katalog usunięty lub przeniesiony – wszystkie jego pliki zniknęły
+                changed.update(*names.values())
+                if mask & _IN_IGNORED:
+                    del self._dirs[wd]
+                    self._wd.pop(directory, None)
+                    self._missing.add(directory)
+                continue
+            changed.update(names.get(os.fsdecode(name), ()))
+        return changed
+
+    def close(self):
+        os.close(self._fd)
+
+
+class FileWatcher:
+    """Obserwuje listę plików w wątku w tle i zgłasza zmienione ścieżki.
+
+    Na Linuksie używa inotify (obserwacja katalogów plików), w pozostałych przypadkach odpytuje
+    os.stat co `poll_interval`. Zdarzenia są łączone: on_change(ścieżki) jest wołane z wątku
+    obserwatora, gdy przez `debounce` sekund nie przyszła kolejna zmiana (najpóźniej po MAX_DELAY_S).
+    """
+
+    def __init__(self, paths, on_change, debounce=DEBOUNCE_S, poll_interval=POLL_INTERVAL_S, use_inotify=True):
+        self.on_change = on_change
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self.use_inotify = use_inotify
+        self.backend = None
+        self._paths = [os.path.abspath(p) for p in paths]
+        self._paths_dirty = True
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._pending = set()
+        self._first = self._last = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if not self.running:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="FileWatcher", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=2.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self._thread = None
+
+    def set_paths(self, paths):
+        with self._lock:
+            self._paths = [os.path.abspath(p) for p in paths]
+            self._paths_dirty = True
+
+    def _make_backend(self):
+        libc = _load_libc() if self.use_inotify else None
+        if libc is not None:
+            try:
+                return _InotifyBackend(libc, self._stop, self.poll_interval)
+            except OSError:
+                pass
+        return _PollBackend(self._stop, self.poll_interval)
+
+    def _timeout(self):
+        if self._last is None:
+            return None
+        now = time.monotonic()
+        return max(0.0, min(self._last + self.debounce, self._first + MAX_DELAY_S) - now)
+
+    def _run(self):
+        backend = self.backend = self._make_backend()
+        try:
+            while not self._stop.is_set():
+                with self._lock:
+                    dirty, paths = self._paths_dirty, list(self._paths)
+                    self._paths_dirty = False
+                if dirty:
+                    try:
+                        backend.set_paths(paths)
+                    except OSError:
+                        # np. wyczerpany limit obserwacji inotify
+                        backend.close()
+                        backend = self.backend = _PollBackend(self._stop, self.poll_interval)
+                        backend.set_paths(paths)
+                    self._pending &= set(paths)
+                changed = backend.wait(self._timeout())
+                now = time.monotonic()
+                if changed:
+                    self._pending |= changed
+                    self._first = self._first or now
+                    self._last = now
+                if self._last is not None and self._timeout() == 0.0:
+                    pending, self._pending = sorted(self._pending), set()
+                    self._first = self._last = None
+                    if pending and not self._stop.is_set():
+                        self.on_change(pending)
+        finally:
+            backend.close()
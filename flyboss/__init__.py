@@ -0,0 +1,8 @@
+"""
+Pakiet `flyboss` udostępnia wiersz poleceń (CLI) narzędzia:
+
+    python -m flyboss scan | apply | preview | diff | backups
+
+CLI korzysta wyłącznie z pakietów `core` i `config` – nie importuje GUI
+(customtkinter / tkinter), więc działa na serwerach i w CI bez ekranu.
+"""
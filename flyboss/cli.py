@@ -0,0 +1,347 @@
+import argparse
+import glob
+import json
+import os
+import sys
+
+from config.settings_manager import SettingsManager
+from core.environments import load_profile
+from core.index import ScanIndex
+from core.metrics import metrics
+from core.processor import XMLProcessor
+from core.profiling import profiled
+
+EXIT_OK = 0
+EXIT_CHANGES = 1       # diff: są zmiany do zastosowania
+EXIT_USAGE = 2         # błędne argumenty (argparse)
+EXIT_MISSING = 3       # apply: wybrany URL/użytkownik nie występuje we wszystkich plikach
+EXIT_ERRORS = 4        # błąd odczytu/zapisu co najmniej jednego pliku
+EXIT_INTERRUPTED = 130
+
+
+def _emit(data):
+    json.dump(data, sys.stdout, ensure_ascii=False, indent=2)
+    sys.stdout.write("\n")
+
+
+def _error_text(e):
+    return None if e is None else str(e)
+
+
+def _resolve_paths(args, settings):
+    if not args.paths:
+        return list(settings.data["paths"])
+    found = []
+    for pattern in args.paths:
+        matches = sorted(glob.glob(pattern, recursive=True))
+        # dosłowna ścieżka bez dopasowań zostaje – błąd zostanie zgłoszony per plik
+        found.extend(matches or [pattern])
+    unique = []
+    seen = set()
+    for p in found:
+        p = os.path.abspath(p)
+        if p not in seen:
+            seen.add(p)
+            unique.append(p)
+    return unique
+
+
+def cmd_scan(args, settings, processor):
+    paths = _resolve_paths(args, settings)
+    index = ScanIndex()
+    entries = {e.path: e for e in index.refresh(paths)}
+    out = []
+    status = EXIT_OK
+    for p in paths:
+        e = entries.get(p)
+        if e is None:
+            out.append({"path": p, "urls": [], "users": [], "error": "file not found"})
+            status = EXIT_ERRORS
+            continue
+        item = {
+            "path": p,
+            "urls": e.urls,
+            "users": e.users,
+            "live_urls": e.live_urls,
+            "live_users": e.live_users,
+            "datasources": e.datasources,
+        }
+        if e.error:
+            item["error"] = e.error
+            status = EXIT_ERRORS
+        out.append(item)
+    _emit(out)
+    return status
+
+
+def _profile(args, settings):
+    profile = load_profile(settings, args.profile)
+    if profile is None:
+        _emit({"error": "unknown profile", "profile": args.profile,
+               "available": sorted(settings.get_environment_profiles())})
+    return profile
+
+
+def cmd_apply(args, settings, processor):
+    if args.profile:
+        return _apply_profile(args, settings, processor)
+    paths = _resolve_paths(args, settings)
+    target_url = (args.url or "").strip()
+    target_user = (args.user or "").strip()
+
+    if args.only_if_present:
+        results = processor.apply_changes_to_files(paths, target_url, target_user, workers=args.jobs,
+                                                   datasources=args.datasource)
+    else:
+        plan = processor.plan_changes(paths, target_url, target_user, datasources=args.datasource, workers=args.jobs)
+        missing_url = plan.files_without_url()
+        missing_user = plan.files_without_user()
+        missing_ds = plan.missing_datasources()
+        if missing_url or missing_user or missing_ds:
+            _emit({
+                "error": "target not present in every file (use --only-if-present to apply where possible)",
+                "missing_url": missing_url,
+                "missing_user": missing_user,
+                "missing_datasources": missing_ds,
+            })
+            return EXIT_MISSING
+        results = processor.apply_plan(plan, workers=args.jobs)
+
+    summary = {}
+    for r in results:
+        summary[r.category] = summary.get(r.category, 0) + 1
+    _emit({
+        "target_url": target_url,
+        "target_user": target_user,
+        "datasources": args.datasource,
+        "files": [
+            {"path": r.path, "status": r.category, "backup": r.backup, "error": _error_text(r.error)}
+            for r in results
+        ],
+        "summary": summary,
+    })
+    return EXIT_ERRORS if any(r.category == "error" for r in results) else EXIT_OK
+
+
+def _apply_profile(args, settings, processor):
+    profile = _profile(args, settings)
+    if profile is None:
+        return EXIT_USAGE
+    plan = processor.plan_profile(_resolve_paths(args, settings), profile, workers=args.jobs)
+    unresolved = {path: rules for path, rules in plan.unresolved()}
+    missing_ds = plan.missing_datasources()
+    if (unresolved or missing_ds) and not args.only_if_present:
+        _emit({
+            "error": "profile targets not present in every file (use --only-if-present to apply where possible)",
+            "profile": profile.name,
+            "unresolved": unresolved,
+            "missing_datasources": missing_ds,
+        })
+        return EXIT_MISSING
+    results = processor.apply_plan(plan, workers=args.jobs)
+
+    summary = {}
+    for r in results:
+        summary[r.category] = summary.get(r.category, 0) + 1
+    _emit({
+        "profile": profile.name,
+        "missing_datasources": missing_ds,
+        "files": [
+            {"path": r.path, "status": r.category, "backup": r.backup, "error": _error_text(r.error),
+             "unresolved": unresolved.get(r.path, [])}
+            for r in results
+        ],
+        "summary": summary,
+    })
+    return EXIT_ERRORS if any(r.category == "error" for r in results) else EXIT_OK
+
+
+def _pending_changes(args, settings, processor):
+    paths = _resolve_paths(args, settings)
+    if args.profile:
+        profile = _profile(args, settings)
+        if profile is None:
+            return None
+        diffs = processor.diff_plan(processor.plan_profile(paths, profile, workers=args.jobs), workers=args.jobs)
+    else:
+        diffs = processor.diff_files(paths, args.url, args.user, workers=args.jobs, datasources=args.datasource)
+    out = []
+    for d in diffs:
+        entry = d.to_dict()
+        if d.error is not None:
+            entry.update(status="error", error=str(d.error))
+        out.append(entry)
+    return out
+
+
+def cmd_preview(args, settings, processor):
+    out = _pending_changes(args, settings, processor)
+    if out is None:
+        return EXIT_USAGE
+    _emit(out)
+    if any(e["status"] == "error" for e in out):
+        return EXIT_ERRORS
+    return EXIT_OK
+
+
+def cmd_diff(args, settings, processor):
+    out = _pending_changes(args, settings, processor)
+    if out is None:
+        return EXIT_USAGE
+    for e in out:
+        if e.get("error"):
+            print(f"{e['path']}: {e['error']}", file=sys.stderr)
+        elif e["diff"]:
+            sys.stdout.write(e["diff"])
+    if any(e["status"] == "error" for e in out):
+        return EXIT_ERRORS
+    return EXIT_CHANGES if any(e["changed"] for e in out) else EXIT_OK
+
+
+def cmd_profiles_list(args, settings, processor):
+    _emit(settings.get_environment_profiles())
+    return EXIT_OK
+
+
+def cmd_backups_list(args, settings, processor):
+    store = processor.backup_store()
+    out = []
+    # kopie sprzed dziennika nie są przypisane do pliku – mogą pochodzić z innego pliku o tej samej nazwie
+    for legacy, records in ((False, store.history(args.file)), (True, store.legacy(args.file))):
+        for r in records:
+            out.append({
+                "path": r.path,
+                "created": r.created.isoformat(),
+                "size": r.size,
+                "sha256": r.hash,
+                "operation": r.op,
+                "exists": os.path.exists(r.path),
+                "legacy": legacy,
+            })
+    _emit(out)
+    return EXIT_OK
+
+
+def cmd_backups_restore(args, settings, processor):
+    target = os.path.abspath(args.file)
+    store = processor.backup_store()
+    source = args.backup
+    if not source:
+        available = store.list(target)
+        if not available:
+            _emit({"error": "no backups found", "file": target})
+            return EXIT_ERRORS
+        source = available[0]
+    try:
+        previous = store.restore(source, target)
+    except Exception as e:
+        _emit({"error": str(e), "file": target, "backup": source})
+        return EXIT_ERRORS
+    _emit({"file": target, "restored_from": source, "previous_version_backup": previous})
+    return EXIT_OK
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="python -m flyboss",
+        description="Przełączanie connection-url / <security> w plikach datasource JBoss/WildFly (bez GUI).",
+    )
+    parser.add_argument("--backup-dir", help="katalog kopii zapasowych (domyślnie z ustawień)")
+    parser.add_argument("--backup-limit", type=int, help="maks. liczba kopii na plik (domyślnie z ustawień)")
+    parser.add_argument("--metrics", metavar="PLIK",
+                        help="zapis pomiarów etapów po zakończeniu: *.prom – Prometheus, inaczej JSON "
+                             "(domyślnie z ustawień)")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    def add_paths(p):
+        p.add_argument("paths", nargs="*",
+                       help="pliki lub wzorce glob (np. 'conf/**/*.xml'); domyślnie ścieżki z ustawień")
+
+    def add_targets(p):
+        p.add_argument("--url", default="", help="docelowy connection-url")
+        p.add_argument("--user", default="", help="docelowy użytkownik (<security>/<user-name>)")
+        p.add_argument("--datasource", "-d", action="append", metavar="NAZWA",
+                       help="zmień tylko ten datasource (jndi-name lub pool-name); można podać wielokrotnie")
+        p.add_argument("--profile", "-p", metavar="NAZWA",
+                       help="profil środowiska z ustawień (zamiast --url/--user/--datasource)")
+        p.set_defaults(targets_required=True)
+
+    def add_jobs(p):
+        p.add_argument("--jobs", "-j", type=int, default=None,
+                       help="liczba procesów roboczych (domyślnie z ustawień, 0 = liczba rdzeni)")
+
+    p = sub.add_parser("scan", help="lista URL i użytkowników w każdym pliku")
+    add_paths(p)
+    p.set_defaults(func=cmd_scan)
+
+    p = sub.add_parser("apply", help="aktywuje URL i/lub użytkownika")
+    add_paths(p)
+    add_targets(p)
+    p.add_argument("--only-if-present", action="store_true",
+                   help="zmień tylko pliki zawierające cel (bez tego brak celu w którymkolwiek pliku przerywa)")
+    add_jobs(p)
+    p.set_defaults(func=cmd_apply)
+
+    for name, func, help_text in (
+        ("preview", cmd_preview, "JSON z planowanymi zmianami i diffem dla każdego pliku"),
+        ("diff", cmd_diff, "unified diff planowanych zmian; kod wyjścia 1, jeśli są zmiany"),
+    ):
+        p = sub.add_parser(name, help=help_text)
+        add_paths(p)
+        add_targets(p)
+        add_jobs(p)
+        p.set_defaults(func=func)
+
+    p = sub.add_parser("profiles", help="profile środowisk")
+    psub = p.add_subparsers(dest="profiles_command", required=True)
+    pp = psub.add_parser("list", help="profile i ich reguły (JSON)")
+    pp.set_defaults(func=cmd_profiles_list)
+
+    p = sub.add_parser("backups", help="kopie zapasowe")
+    bsub = p.add_subparsers(dest="backups_command", required=True)
+    bp = bsub.add_parser("list", help="lista kopii pliku (od najnowszej)")
+    bp.add_argument("file")
+    bp.set_defaults(func=cmd_backups_list)
+    bp = bsub.add_parser("restore", help="przywraca kopię (domyślnie najnowszą)")
+    bp.add_argument("file")
+    bp.add_argument("--backup", help="ścieżka konkretnej kopii")
+    bp.set_defaults(func=cmd_backups_restore)
+
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if getattr(args, "targets_required", False):
+        has_target = bool((args.url or "").strip() or (args.user or "").strip())
+        if args.profile and (has_target or args.datasource):
+            parser.error("--profile nie łączy się z --url/--user/--datasource")
+        if not args.profile and not has_target:
+            parser.error("podaj --url i/lub --user albo --profile")
+    if getattr(args, "jobs", None) == 0:
+        args.jobs = max(1, min(32, os.cpu_count() or 1))
+
+    settings = SettingsManager()
+    if args.backup_dir:
+        settings.set_transient("backup_dir", args.backup_dir)
+    if args.backup_limit is not None:
+        settings.set_transient("backup_limit", args.backup_limit)
+    processor = XMLProcessor(settings=settings)
+
+    try:
+        with profiled(f"cli-{args.command}", settings):
+            return args.func(args, settings, processor)
+    except KeyboardInterrupt:
+        return EXIT_INTERRUPTED
+    finally:
+        _export_metrics(args.metrics or settings.get_metrics_export())
+
+
+def _export_metrics(path):
+    if not path:
+        return
+    try:
+        metrics.export(path)
+    except OSError as e:
+        print(f"nie udało się zapisać pomiarów do {path}: {e}", file=sys.stderr)
@@ -1,5 +1,6 @@
 import customtkinter as ctk
 from config.settings_manager import SettingsManager, APP_NAME
+from core.index import ScanIndex
 from core.processor import XMLProcessor
 from .main_view import MainView
 from .settings_view import SettingsView
@@ -16,6 +17,7 @@ class App(ctk.CTk):
         ctk.set_default_color_theme(self.settings.data.get("color_theme", "blue"))
 
         self.processor = XMLProcessor(settings=self.settings)
+        self.index = ScanIndex()
 
         self.nav = ctk.CTkSegmentedButton(self, values=["Główny", "Ustawienia"], command=self._switch_view)
         self.nav.pack(fill="x", padx=10, pady=10)
@@ -26,7 +28,7 @@ class App(ctk.CTk):
         self.container.rowconfigure(0, weight=1)
         self.container.columnconfigure(0, weight=1)
 
-        self.main_view = MainView(self.container, self.settings, self.processor)
+        self.main_view = MainView(self.container, self.settings, self.processor, index=self.index)
         self.settings_view = SettingsView(
             self.container,
             settings=self.settings,
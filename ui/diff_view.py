@@ -0,0 +1,269 @@
+import itertools
+import os
+import re
+import tkinter as tk
+
+import customtkinter as ctk
+
+from core.diff import summarize
+
+# liczba wierszy wstawianych przy otwarciu pliku i przy każdym doczytaniu w trakcie przewijania
+BATCH_LINES = 400
+# ile ukrytych wspólnych linii odsłania jedno kliknięcie „pokaż”
+EXPAND_STEP = 20
+# dłuższe linie (np. zminifikowany XML) nie są kolorowane
+HIGHLIGHT_MAX_CHARS = 2000
+
+_LINE_TAGS = {"+": "add", "-": "remove"}
+_XML_TOKEN_RE = re.compile(r"(<!--.*?(?:-->|$)|^(?:(?!<!--).)*?-->)|(</?[\w:.-]+|/?>)|(\"[^\"]*\"|'[^']*')")
+_XML_TOKEN_TAGS = ("xml_comment", "xml_tag", "xml_value")
+
+
+def model_rows(model, context=3):
+    """Wiersze podglądu DiffModel w kolejności dokumentu, generowane leniwie:
+    ("text", treść, tag) albo ("gap", lo, hi, delta) dla ukrytych wspólnych linii."""
+    for seg in model.segments(context):
+        if seg[0] == "gap":
+            yield seg
+            continue
+        _kind, old_start, new_start, body = seg
+        yield ("text", f"@@ linia {old_start + 1} → {new_start + 1} @@\n", "hunk")
+        for kind, line in body:
+            yield ("text", kind + (line if line.endswith("\n") else line + "\n"), _LINE_TAGS.get(kind))
+
+
+def unified_rows(diff):
+    """Wiersze podglądu dla gotowego tekstu unified diff (gdy model nie został zachowany)."""
+    for line in diff.splitlines(keepends=True):
+        if line.startswith(("+++", "---")):
+            tag = "header"
+        elif line.startswith("@@"):
+            tag = "hunk"
+        else:
+            tag = _LINE_TAGS.get(line[:1])
+        yield ("text", line, tag)
+
+
+class HunkView(tk.Frame):
+    """Widok różnic wstawiany partiami: na starcie tylko pierwsze BATCH_LINES wierszy,
+    kolejne przy zbliżeniu się do końca przewijania. Wspólne fragmenty między zmianami są zwinięte
+    i rozwijane kliknięciem. Składnia XML jest kolorowana tylko dla linii widocznych na ekranie."""
+
+    def __init__(self, master, dark, colors):
+        super().__init__(master, bg=colors["bg"])
+        self.rowconfigure(0, weight=1)
+        self.columnconfigure(0, weight=1)
+        self.text = tk.Text(self, wrap="none", highlightthickness=0, borderwidth=0, **colors)
+        self.text.grid(row=0, column=0, sticky="nsew")
+        ysb = ctk.CTkScrollbar(self, command=self.text.yview)
+        ysb.grid(row=0, column=1, sticky="ns")
+        xsb = ctk.CTkScrollbar(self, orientation="horizontal", command=self.text.xview)
+        xsb.grid(row=1, column=0, sticky="ew")
+        self._ysb = ysb
+        self.text.configure(yscrollcommand=self._on_yscroll, xscrollcommand=xsb.set)
+
+        self.text.tag_configure("add", background="#12301c" if dark else "#e6ffec")
+        self.text.tag_configure("remove", background="#3a1518" if dark else "#ffebe9")
+        self.text.tag_configure("hunk", foreground="#58a6ff" if dark else "#0550ae")
+        self.text.tag_configure("header", foreground="#8b949e")
+        self.text.tag_configure("gap", foreground="#8b949e", background="#2a2f36" if dark else "#f0f3f6")
+        self.text.tag_configure("link", underline=True)
+        self.text.tag_configure("xml_comment", foreground="#8b949e")
+        self.text.tag_configure("xml_tag", foreground="#7ee787" if dark else "#116329")
+        self.text.tag_configure("xml_value", foreground="#a5d6ff" if dark else "#0a3069")
+        self.text.tag_bind("link", "<Enter>", lambda _e: self.text.configure(cursor="hand2"))
+        self.text.tag_bind("link", "<Leave>", lambda _e: self.text.configure(cursor=""))
+        self.text.bind("<Configure>", lambda _e: self._schedule_highlight())
+
+        self._rows = None       # generator pozostałych wierszy albo None, gdy wszystko wstawiono
+        self._old = []          # linie starej wersji (treść zwiniętych fragmentów)
+        self._gaps = {}         # id -> [lo, hi]
+        self._gap_ids = itertools.count()
+        self._more_job = None
+        self._hl_job = None
+
+    # --- wypełnianie ---
+
+    def show_rows(self, rows, old_lines=()):
+        self._cancel_jobs()
+        self._rows = iter(rows)
+        self._old = old_lines
+        self._gaps.clear()
+        self.text.configure(state="normal")
+        self.text.delete("1.0", tk.END)
+        self.text.configure(state="disabled")
+        self.text.yview_moveto(0)
+        self._render_more()
+
+    def show_model(self, model):
+        self.show_rows(model_rows(model), model.old)
+
+    def show_message(self, message):
+        self.show_rows([("text", message, None)])
+
+    def _cancel_jobs(self):
+        for job in (self._more_job, self._hl_job):
+            if job is not None:
+                self.after_cancel(job)
+        self._more_job = self._hl_job = None
+
+    def _render_more(self):
+        self._more_job = None
+        if self._rows is None:
+            return
+        batch = list(itertools.islice(self._rows, BATCH_LINES))
+        if len(batch) < BATCH_LINES:
+            self._rows = None
+        self.text.configure(state="normal")
+        # kolejne wiersze z tym samym tagiem wstawiane jednym wywołaniem
+        run, run_tag = [], None
+        for row in batch:
+            if row[0] == "gap":
+                if run:
+                    self.text.insert(tk.END, "".join(run), run_tag)
+                    run = []
+                self._add_gap(tk.END, row[1], row[2])
+                continue
+            _kind, chars, tag = row
+            if run and tag != run_tag:
+                self.text.insert(tk.END, "".join(run), run_tag)
+                run = []
+            run_tag = tag
+            run.append(chars)
+        if run:
+            self.text.insert(tk.END, "".join(run), run_tag)
+        self.text.configure(state="disabled")
+        self._schedule_highlight()
+
+    def _on_yscroll(self, first, last):
+        self._ysb.set(first, last)
+        if self._rows is not None and float(last) > 0.9 and self._more_job is None:
+            self._more_job = self.after_idle(self._render_more)
+        self._schedule_highlight()
+
+    # --- zwinięte fragmenty wspólne ---
+
+    def _add_gap(self, index, lo, hi):
+        gid = next(self._gap_ids)
+        self._gaps[gid] = [lo, hi]
+        self._insert_gap(index, gid)
+        tag = f"gap{gid}"
+        self.text.tag_bind(f"{tag}_step", "<Button-1>", lambda _e: self._expand(gid, EXPAND_STEP))
+        self.text.tag_bind(f"{tag}_all", "<Button-1>", lambda _e: self._expand(gid, None))
+
+    def _insert_gap(self, index, gid):
+        lo, hi = self._gaps[gid]
+        tag = f"gap{gid}"
+        n = hi - lo
+        parts = [f"⋯ {n} wspólnych linii ukrytych   ", ("gap", tag)]
+        if n > EXPAND_STEP:
+            parts += [f"pokaż {EXPAND_STEP}", ("gap", "link", tag, f"{tag}_step"), "   ", ("gap", tag)]
+        parts += ["pokaż wszystkie", ("gap", "link", tag, f"{tag}_all"), "\n", ("gap", tag)]
+        self.text.insert(index, *parts)
+
+    def _expand(self, gid, count):
+        lo, hi = self._gaps[gid]
+        take = hi - lo if count is None else min(count, hi - lo)
+        tag = f"gap{gid}"
+        index = self.text.index(f"{tag}.first")
+        self.text.configure(state="normal")
+        self.text.delete(f"{tag}.first", f"{tag}.last")
+        # fragment na początku pliku odsłaniany od dołu (od pierwszej zmiany), pozostałe od góry
+        if lo == 0:
+            shown = self._old[hi - take:hi]
+            self._gaps[gid][1] = hi - take
+        else:
+            shown = self._old[lo:lo + take]
+            self._gaps[gid][0] = lo + take
+        chars = "".join(" " + (line if line.endswith("\n") else line + "\n") for line in shown)
+        if take == hi - lo:
+            del self._gaps[gid]
+            self.text.insert(index, chars)
+        elif lo == 0:
+            self._insert_gap(index, gid)
+            self.text.insert(f"{tag}.last", chars)
+        else:
+            self.text.insert(index, chars)
+            self._insert_gap(f"{index} + {len(chars)} chars", gid)
+        self.text.configure(state="disabled")
+        self._schedule_highlight()
+        return "break"
+
+    # --- kolorowanie składni ---
+
+    def _schedule_highlight(self):
+        if self._hl_job is None:
+            self._hl_job = self.after(30, self._highlight_visible)
+
+    def _highlight_visible(self):
+        self._hl_job = None
+        first = int(self.text.index("@0,0").split(".")[0])
+        last = int(self.text.index(f"@0,{self.text.winfo_height()}").split(".")[0])
+        for ln in range(first, last + 1):
+            start = f"{ln}.0"
+            if "hl" in self.text.tag_names(start):
+                continue
+            line = self.text.get(start, f"{ln}.end")
+            self.text.tag_add("hl", start)
+            if not line or line[0] not in " +-" or len(line) > HIGHLIGHT_MAX_CHARS:
+                continue
+            for m in _XML_TOKEN_RE.finditer(line[1:]):
+                tag = _XML_TOKEN_TAGS[m.lastindex - 1]
+                self.text.tag_add(tag, f"{ln}.{m.start() + 1}", f"{ln}.{m.end() + 1}")
+
+
+class DiffDialog(ctk.CTkToplevel):
+    """Podgląd zmian („na sucho”) dla zbioru plików: lista plików ze statystykami
+    i zmienione fragmenty zaznaczonego pliku."""
+
+    def __init__(self, master, diffs, title="Podgląd zmian"):
+        super().__init__(master)
+        self.title(title)
+        self.geometry("1100x650")
+        self.columnconfigure(1, weight=1)
+        self.rowconfigure(1, weight=1)
+
+        self.diffs = [d for d in diffs if d.changed or d.error is not None]
+        s = summarize(diffs)
+        errors = sum(1 for d in diffs if d.error is not None)
+        ctk.CTkLabel(
+            self,
+            text=(f"Plików: {s['files']}  •  do zmiany: {s['changed']}  •  bez zmian: {s['files'] - s['changed'] - errors}"
+                  f"  •  błędy: {errors}  •  linie: +{s['added']} / −{s['removed']}"),
+            anchor="w",
+        ).grid(row=0, column=0, columnspan=2, sticky="ew", padx=10, pady=(10, 0))
+
+        dark = ctk.get_appearance_mode() == "Dark"
+        colors = dict(bg="#333333", fg="#FFFFFF") if dark else dict(bg="#FFFFFF", fg="#000000")
+
+        self.files_list = tk.Listbox(self, width=45, exportselection=False, highlightthickness=0, borderwidth=0,
+                                     **colors)
+        self.files_list.grid(row=1, column=0, sticky="ns", padx=(10, 5), pady=10)
+        for d in self.diffs:
+            if d.error is not None:
+                label = f"BŁĄD   {os.path.basename(d.path)}"
+            else:
+                label = f"+{d.added:<4} −{d.removed:<4} {os.path.basename(d.path)}"
+            self.files_list.insert(tk.END, label)
+        self.files_list.bind("<<ListboxSelect>>", lambda _e: self._show_selected())
+
+        self.view = HunkView(self, dark, colors)
+        self.view.grid(row=1, column=1, sticky="nsew", padx=(5, 10), pady=10)
+
+        if self.diffs:
+            self.files_list.selection_set(0)
+            self._show_selected()
+        else:
+            self.view.show_message("Brak zmian – pliki mają już wybraną konfigurację.")
+
+    def _show_selected(self):
+        sel = self.files_list.curselection()
+        if not sel:
+            return
+        d = self.diffs[sel[0]]
+        if d.error is not None:
+            self.view.show_message(f"{d.path}\n\n{d.error}")
+        elif d.model is not None:
+            self.view.show_model(d.model)
+        else:
+            self.view.show_rows(unified_rows(d.diff))
@@ -0,0 +1,262 @@
+import tkinter as tk
+import tkinter.font as tkfont
+
+import customtkinter as ctk
+
+# opóźnienie filtrowania podczas pisania
+FILTER_DELAY_MS = 120
+
+_PALETTES = {
+    "Dark": dict(bg="#333333", fg="#FFFFFF", select="#555555", header="#2b2b2b", muted="#9a9a9a"),
+    "Light": dict(bg="#FFFFFF", fg="#000000", select="#E5E5E5", header="#F0F0F0", muted="#6a6a6a"),
+}
+
+
+class Column:
+    """Kolumna statusu przed ścieżką: value(path) -> (tekst, kolor albo None)."""
+
+    def __init__(self, title, width, value):
+        self.title = title
+        self.width = width
+        self.value = value
+
+
+class VirtualFileList(tk.Frame):
+    """Lista ścieżek rysowana na Canvas – tylko wiersze widoczne na ekranie, więc działa płynnie
+    także dla tysięcy plików.
+
+    - filtr w trakcie pisania: wszystkie słowa zapytania muszą wystąpić w ścieżce lub w tekście
+      z `search_text(path)` (np. nazwy datasource'ów, URL, użytkownicy); zawężenie zapytania
+      przeszukuje tylko poprzedni wynik,
+    - zaznaczenie jest zbiorem ścieżek – przetrwa filtrowanie i ponowne wczytanie listy,
+    - `columns` – dodatkowe kolumny statusu, `path_color(path)` – kolor ścieżki.
+    """
+
+    def __init__(self, master, selectmode="browse", columns=(), search_text=None, path_color=None,
+                 on_select=None, placeholder="Filtruj (ścieżka, datasource, URL, użytkownik)…"):
+        super().__init__(master)
+        self.selectmode = selectmode
+        self.columns = list(columns)
+        self.search_text = search_text
+        self.path_color = path_color
+        self.on_select = on_select
+        self.enabled = True
+
+        self._items = []            # wszystkie ścieżki
+        self._visible = []          # ścieżki po filtrze
+        self._selected = set()
+        self._anchor = None
+        self._top = 0
+        self._query = ""
+        self._texts = {}            # ścieżka -> tekst do wyszukiwania (małe litery)
+        self._filter_job = None
+
+        self.columnconfigure(0, weight=1)
+        self.rowconfigure(2, weight=1)
+
+        bar = ctk.CTkFrame(self, fg_color="transparent")
+        bar.grid(row=0, column=0, columnspan=2, sticky="ew", pady=(0, 4))
+        bar.columnconfigure(0, weight=1)
+        # bez textvariable – CTkEntry nie pokazuje wtedy tekstu zastępczego
+        self.filter_entry = ctk.CTkEntry(bar, placeholder_text=placeholder)
+        self.filter_entry.grid(row=0, column=0, sticky="ew")
+        self.filter_entry.bind("<KeyRelease>", lambda _e: self._schedule_filter())
+        self.count_label = ctk.CTkLabel(bar, text="", width=110, anchor="e")
+        self.count_label.grid(row=0, column=1, padx=(8, 0))
+
+        self.font = tkfont.nametofont("TkDefaultFont")
+        self.row_height = self.font.metrics("linespace") + 6
+        self.header = tk.Canvas(self, height=self.row_height, highlightthickness=0, borderwidth=0)
+        self.header.grid(row=1, column=0, sticky="ew")
+        self.canvas = tk.Canvas(self, highlightthickness=0, borderwidth=0, takefocus=1)
+        self.canvas.grid(row=2, column=0, sticky="nsew")
+        self.scrollbar = ctk.CTkScrollbar(self, command=self._on_scrollbar)
+        self.scrollbar.grid(row=2, column=1, sticky="ns")
+
+        self.canvas.bind("<Configure>", lambda _e: self.redraw())
+        self.canvas.bind("<Button-1>", self._on_click)
+        self.canvas.bind("<Shift-Button-1>", lambda e: self._on_click(e, extend=True))
+        self.canvas.bind("<Control-Button-1>", lambda e: self._on_click(e, toggle=True))
+        self.canvas.bind("<MouseWheel>", lambda e: self.scroll(-1 if e.delta > 0 else 1, "units"))
+        self.canvas.bind("<Button-4>", lambda _e: self.scroll(-1, "units"))
+        self.canvas.bind("<Button-5>", lambda _e: self.scroll(1, "units"))
+        self.canvas.bind("<Up>", lambda _e: self._move_selection(-1))
+        self.canvas.bind("<Down>", lambda _e: self._move_selection(1))
+        self.canvas.bind("<Prior>", lambda _e: self.scroll(-1, "pages"))
+        self.canvas.bind("<Next>", lambda _e: self.scroll(1, "pages"))
+        self.update_style()
+
+    # --- dane ---
+
+    def set_items(self, paths):
+        """Nowa lista ścieżek; zaznaczenie i filtr są zachowywane."""
+        self._items = list(paths)
+        present = set(self._items)
+        self._selected &= present
+        self._texts = {p: t for p, t in self._texts.items() if p in present}
+        self._apply_filter(refine=False)
+
+    def invalidate(self, paths=None):
+        """Dane skanowania ścieżek się zmieniły – ponowne wyszukiwanie i odświeżenie statusów."""
+        if paths is None:
+            self._texts.clear()
+        else:
+            for p in paths:
+                self._texts.pop(p, None)
+        self._apply_filter(refine=False)
+
+    def selected_paths(self):
+        return [p for p in self._items if p in self._selected]
+
+    def select(self, paths):
+        self._selected = set(paths) & set(self._items)
+        self.redraw()
+
+    def set_enabled(self, enabled):
+        self.enabled = enabled
+        self.redraw()
+
+    # --- filtr ---
+
+    def _schedule_filter(self):
+        if self._filter_job is not None:
+            self.after_cancel(self._filter_job)
+        self._filter_job = self.after(FILTER_DELAY_MS, self._run_filter)
+
+    def _run_filter(self):
+        self._filter_job = None
+        query = self.filter_entry.get().strip().lower()
+        refine = bool(self._query) and query.startswith(self._query)
+        self._query = query
+        self._apply_filter(refine)
+
+    def _text(self, path):
+        text = self._texts.get(path)
+        if text is None:
+            extra = self.search_text(path) if self.search_text else ""
+            text = self._texts[path] = f"{path}\n{extra}".lower()
+        return text
+
+    def _apply_filter(self, refine):
+        words = self._query.split()
+        source = self._visible if refine else self._items
+        if words:
+            self._visible = [p for p in source if all(w in self._text(p) for w in words)]
+        else:
+            self._visible = list(self._items)
+        self._top = min(self._top, max(0, len(self._visible) - 1))
+        total = len(self._items)
+        self.count_label.configure(text=f"{len(self._visible)} / {total}" if words else f"{total}")
+        self.redraw()
+
+    # --- rysowanie ---
+
+    def update_style(self):
+        self.palette = _PALETTES["Dark" if ctk.get_appearance_mode() == "Dark" else "Light"]
+        self.canvas.configure(bg=self.palette["bg"])
+        self.header.configure(bg=self.palette["header"])
+        self.configure(bg=self.palette["bg"])
+        self.redraw()
+
+    def _page(self):
+        return max(1, self.canvas.winfo_height() // self.row_height)
+
+    def redraw(self):
+        c = self.canvas
+        c.delete("all")
+        p = self.palette
+        width = max(c.winfo_width(), 1)
+        rows = self._visible[self._top:self._top + self._page() + 1]
+        for n, path in enumerate(rows):
+            y = n * self.row_height
+            if path in self._selected:
+                c.create_rectangle(0, y, width, y + self.row_height, fill=p["select"], width=0)
+            x = 6
+            for col in self.columns:
+                text, color = col.value(path)
+                c.create_text(x, y + self.row_height // 2, text=text, anchor="w", font=self.font,
+                              fill=color or p["fg"])
+                x += col.width
+            color = (self.path_color(path) if self.path_color else None) or p["fg"]
+            c.create_text(x, y + self.row_height // 2, text=path, anchor="w", font=self.font,
+                          fill=color if self.enabled else p["muted"])
+        self._draw_header()
+        self._update_scrollbar()
+
+    def _draw_header(self):
+        h = self.header
+        h.delete("all")
+        x = 6
+        for col in self.columns:
+            h.create_text(x, self.row_height // 2, text=col.title, anchor="w", font=self.font, fill=self.palette["muted"])
+            x += col.width
+        h.create_text(x, self.row_height // 2, text="Plik", anchor="w", font=self.font, fill=self.palette["muted"])
+
+    def _update_scrollbar(self):
+        total = len(self._visible)
+        if not total:
+            self.scrollbar.set(0, 1)
+            return
+        self.scrollbar.set(self._top / total, min(1.0, (self._top + self._page()) / total))
+
+    # --- przewijanie i zaznaczanie ---
+
+    def scroll(self, amount, what="units"):
+        step = self._page() if what == "pages" else 3
+        self._scroll_to(self._top + int(amount) * step)
+
+    def _scroll_to(self, top):
+        top = max(0, min(int(top), len(self._visible) - self._page()))
+        if top != self._top:
+            self._top = top
+            self.redraw()
+
+    def _on_scrollbar(self, *args):
+        if args[0] == "moveto":
+            self._scroll_to(round(float(args[1]) * len(self._visible)))
+        elif args[0] == "scroll":
+            self.scroll(int(args[1]), args[2])
+
+    def see(self, index):
+        if index < self._top:
+            self._scroll_to(index)
+        elif index >= self._top + self._page():
+            self._scroll_to(index - self._page() + 1)
+
+    def _on_click(self, event, extend=False, toggle=False):
+        self.canvas.focus_set()
+        if not self.enabled:
+            return "break"
+        index = self._top + event.y // self.row_height
+        if index >= len(self._visible):
+            return "break"
+        path = self._visible[index]
+        if self.selectmode == "extended" and toggle:
+            self._selected ^= {path}
+            self._anchor = path
+        elif self.selectmode == "extended" and extend and self._anchor in self._visible:
+            a = self._visible.index(self._anchor)
+            lo, hi = sorted((a, index))
+            self._selected = set(self._visible[lo:hi + 1])
+        else:
+            self._selected = {path}
+            self._anchor = path
+        self._selection_changed()
+        return "break"
+
+    def _move_selection(self, delta):
+        if not self.enabled or not self._visible:
+            return "break"
+        current = [i for i, p in enumerate(self._visible) if p in self._selected]
+        index = max(0, min(len(self._visible) - 1, (current[0] if delta < 0 else current[-1]) + delta
+                           if current else 0))
+        self._selected = {self._visible[index]}
+        self._anchor = self._visible[index]
+        self.see(index)
+        self._selection_changed()
+        return "break"
+
+    def _selection_changed(self):
+        self.redraw()
+        if self.on_select is not None:
+            self.on_select()
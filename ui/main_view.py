@@ -1,20 +1,35 @@
 import os
+import queue
 import sys
+import time
 import tkinter as tk
 from tkinter import messagebox
 import customtkinter as ctk
-from lxml import etree
 
 from config.settings_manager import APP_NAME
+from core.environments import load_profile
+from core.index import ScanIndex, datasource_names, urls_and_users
+from core.metrics import metrics
 from core.processor import XMLProcessor
-from core.utils import deep_clone_tree
+from core.profiling import profiled
+from core.watcher import FileWatcher
+from .diff_view import DiffDialog
+from .file_list import Column, VirtualFileList
+from .profile_dialog import ProfileDialog
+from .worker import BackgroundTask
 
 
 class MainView(ctk.CTkFrame):
-    def __init__(self, master, settings, processor: XMLProcessor):
+    # jak często wątek Tk odbiera zgłoszenia obserwatora plików
+    WATCH_POLL_MS = 250
+    # pozycja listy datasource'ów oznaczająca zmianę w całych plikach
+    ALL_DATASOURCES = "(wszystkie)"
+
+    def __init__(self, master, settings, processor: XMLProcessor, index: ScanIndex = None):
         super().__init__(master)
         self.settings = settings
         self.processor = processor
+        self.index = index if index is not None else ScanIndex()
 
         self.columnconfigure(0, weight=1)
         self.rowconfigure(2, weight=1)
@@ -50,35 +65,49 @@ class MainView(ctk.CTkFrame):
         self.user_combo = ctk.CTkComboBox(form, values=[], variable=self.user_var)
         self.user_combo.grid(row=1, column=1, padx=10, pady=10, sticky="ew")
 
+        ctk.CTkLabel(form, text="Datasource:").grid(row=2, column=0, padx=10, pady=10, sticky="w")
+        self.datasource_var = tk.StringVar(value=self.ALL_DATASOURCES)
+        self.datasource_combo = ctk.CTkComboBox(form, values=[self.ALL_DATASOURCES], variable=self.datasource_var)
+        self.datasource_combo.grid(row=2, column=1, padx=10, pady=10, sticky="ew")
+
+        ctk.CTkLabel(form, text="Profil środowiska:").grid(row=3, column=0, padx=10, pady=10, sticky="w")
+        profile_row = ctk.CTkFrame(form, fg_color="transparent")
+        profile_row.grid(row=3, column=1, padx=10, pady=10, sticky="ew")
+        profile_row.columnconfigure(0, weight=1)
+        self.profile_var = tk.StringVar(value=self.settings.data.get("last_environment_profile", ""))
+        self.profile_combo = ctk.CTkComboBox(profile_row, values=sorted(self.settings.get_environment_profiles()),
+                                             variable=self.profile_var)
+        self.profile_combo.grid(row=0, column=0, sticky="ew")
+        ctk.CTkButton(profile_row, text="Edytuj profile…", width=120,
+                      command=self.edit_profiles).grid(row=0, column=1, padx=(10, 0))
+        self.btn_preview_profile = ctk.CTkButton(profile_row, text="Podgląd profilu…", width=130,
+                                                 command=self.preview_profile)
+        self.btn_preview_profile.grid(row=0, column=2, padx=(10, 0))
+        self.btn_apply_profile = ctk.CTkButton(profile_row, text="Zastosuj profil", width=120,
+                                               command=self.apply_profile, fg_color="#0b6e4f",
+                                               hover_color="#0c7d59")
+        self.btn_apply_profile.grid(row=0, column=3, padx=(10, 0))
+
         list_frame = ctk.CTkFrame(self)
         list_frame.grid(row=2, column=0, sticky="nsew", padx=10, pady=(0, 10))
         list_frame.rowconfigure(0, weight=1)
         list_frame.columnconfigure(0, weight=1)
 
-        self.files_list = tk.Listbox(list_frame, height=10)
-
-        if ctk.get_appearance_mode() == "Dark":
-            self.files_list.configure(
-                bg="#333333",
-                fg="#FFFFFF",
-                selectbackground="#555555",
-                selectforeground="#FFFFFF",
-                highlightthickness=0,
-                borderwidth=0,
-            )
-        else:
-            self.files_list.configure(
-                bg="#FFFFFF",
-                fg="#000000",
-                selectbackground="#E5E5E5",
-                selectforeground="#000000",
-                highlightthickness=0,
-                borderwidth=0,
-            )
-
-
+        self.files_list = VirtualFileList(
+            list_frame,
+            columns=[
+                Column("URL", 110, lambda p: self._target_status(p, self.url_var, "live_urls", "commented_urls")),
+                Column("Użytkownik", 110, lambda p: self._target_status(p, self.user_var, "live_users",
+                                                                        "commented_users")),
+                Column("Zmieniono", 140, self._changed_status),
+            ],
+            search_text=self._search_text,
+            path_color=self._path_color,
+            on_select=self._on_file_selected,
+        )
         self.files_list.grid(row=0, column=0, sticky="nsew", padx=10, pady=10)
-        self.files_list.bind("<<ListboxSelect>>", lambda _e: self._update_buttons_state())
+        self.url_var.trace_add("write", lambda *_a: self.files_list.redraw())
+        self.user_var.trace_add("write", lambda *_a: self.files_list.redraw())
 
         btns = ctk.CTkFrame(self)
         btns.grid(row=3, column=0, sticky="ew", padx=10, pady=10)
@@ -96,32 +125,135 @@ class MainView(ctk.CTkFrame):
         self.btn_preview = ctk.CTkButton(btns, text="Podgląd (1 plik)…", command=self.preview_one)
         self.btn_preview.pack(side="left", padx=6)
 
+        self.btn_preview_all = ctk.CTkButton(btns, text="Podgląd zmian (wszystkie)…", command=self.preview_all)
+        self.btn_preview_all.pack(side="left", padx=6)
+
+        progress_frame = ctk.CTkFrame(self)
+        progress_frame.grid(row=4, column=0, sticky="ew", padx=10, pady=(0, 10))
+        progress_frame.columnconfigure(0, weight=1)
+
+        self.progress_bar = ctk.CTkProgressBar(progress_frame)
+        self.progress_bar.grid(row=0, column=0, sticky="ew", padx=10, pady=10)
+        self.progress_bar.set(0)
+        self.progress_label = ctk.CTkLabel(progress_frame, text="Gotowy.", width=260, anchor="w")
+        self.progress_label.grid(row=0, column=1, padx=10, pady=10)
+        self.btn_cancel = ctk.CTkButton(progress_frame, text="Anuluj", width=90, command=self.cancel_task,
+                                        fg_color="#8b0000", hover_color="#a40000", state="disabled")
+        self.btn_cancel.grid(row=0, column=2, padx=10, pady=10)
 
+        self.task = None
+        self._task_title = ""
+
+        # zmiany plików na dysku (wdrożenia, edycja przez innych) – doskanowanie tylko zmienionych plików
+        self._changed_files = queue.Queue()
+        self._pending_rescan = set()
+        self._rescan_task = None
+        self.watcher = FileWatcher(self.settings.data["paths"], on_change=self._changed_files.put).start()
+        self.after(self.WATCH_POLL_MS, self._poll_watcher)
 
         self.reload_files()
+        # natychmiast wartości z indeksu, w tle doskanowanie tylko zmienionych plików
+        self._on_sources_scanned(urls_and_users(self.index.cached_entries(self.settings.data["paths"])))
         self.refresh_sources()
 
         self.toggle_mode()
         self._update_buttons_state()
 
     def reload_files(self):
-        self.files_list.delete(0, tk.END)
-        for p in self.settings.data["paths"]:
-            self.files_list.insert(tk.END, p)
+        self.files_list.set_items(self.settings.data["paths"])
+        self.watcher.set_paths(self.settings.data["paths"])
+
+    # --- kolumny listy plików (z indeksu skanowania, bez czytania plików) ---
+
+    def _target_status(self, path, var, live_field, commented_field):
+        entry = self.index.get(path)
+        if entry is None or entry.error:
+            return "?", "#888888"
+        target = var.get().strip()
+        if not target:
+            return "–", "#888888"
+        if target in getattr(entry, live_field):
+            return "● aktywny", "#3fb950"
+        if target in getattr(entry, commented_field):
+            return "○ dostępny", "#d29922"
+        return "✖ brak", "#d9534f"
+
+    def _changed_status(self, path):
+        entry = self.index.get(path)
+        if entry is None or entry.mtime_ns is None:
+            return "", None
+        return time.strftime("%Y-%m-%d %H:%M", time.localtime(entry.mtime_ns / 1e9)), "#888888"
+
+    def _path_color(self, path):
+        """Brak pliku – szary, błąd odczytu – czerwony."""
+        entry = self.index.get(path)
+        if entry is None:
+            return None if os.path.exists(path) else "#888888"
+        return "#d9534f" if entry.error else None
+
+    def _search_text(self, path):
+        entry = self.index.get(path)
+        if entry is None:
+            return ""
+        names = [n for ds in entry.datasources for n in (ds.get("jndi-name"), ds.get("pool-name")) if n]
+        return "\n".join(names + entry.urls + entry.users)
+
+    def _poll_watcher(self):
+        try:
+            while True:
+                self._pending_rescan.update(self._changed_files.get_nowait())
+        except queue.Empty:
+            pass
+        # w trakcie zapisu/analizy zmiany czekają – pliki zapisane przez aplikację też tu trafią
+        busy = (self.task is not None and self.task.running) or self._rescan_task is not None
+        if self._pending_rescan and not busy:
+            self._rescan(sorted(self._pending_rescan))
+            self._pending_rescan.clear()
+        self.after(self.WATCH_POLL_MS, self._poll_watcher)
+
+    def _rescan(self, paths):
+        def work(_progress, _cancel):
+            self.index.refresh(paths)
+            return urls_and_users(self.index.cached_entries(self.settings.data["paths"]))
+
+        def done(found):
+            self._rescan_task = None
+            self._on_sources_scanned(found)
+            self.files_list.invalidate(paths)
+
+        def failed(error):
+            self._rescan_task = None
+            print(f"[WARN] Ponowne skanowanie: {error}", file=sys.stderr)
+
+        self._rescan_task = BackgroundTask(self, work, on_done=done, on_error=failed).start()
+
+    def destroy(self):
+        self.watcher.stop()
+        super().destroy()
 
     def refresh_sources(self):
-        all_urls = set()
-        all_users = set()
-        for p in self.settings.data["paths"]:
-            try:
-                urls, users = self.processor.collect_urls_and_users(p)
-                all_urls.update(urls)
-                all_users.update(users)
-            except Exception as e:
-                print(f"[WARN] {p}: {e}", file=sys.stderr)
-
-        urls_sorted = sorted(all_urls)
-        users_sorted = sorted(all_users)
+        paths = list(self.settings.data["paths"])
+
+        def work(progress, cancel):
+            with profiled("refresh_sources", self.settings):
+                entries = self.index.refresh(paths, progress=progress, cancel=cancel)
+            if cancel.is_set():
+                return None
+            for e in entries:
+                if e.error:
+                    print(f"[WARN] {e.path}: {e.error}", file=sys.stderr)
+            return urls_and_users(entries)
+
+        def done(found):
+            self._on_sources_scanned(found)
+            self.files_list.invalidate()
+
+        self._run_task("Skanowanie", work, done)
+
+    def _on_sources_scanned(self, found):
+        if found is None:
+            return
+        urls_sorted, users_sorted = found
         self.url_combo.configure(values=urls_sorted)
         self.user_combo.configure(values=users_sorted)
 
@@ -129,6 +261,19 @@ class MainView(ctk.CTkFrame):
             self.url_var.set(urls_sorted[0])
         if users_sorted and not self.user_var.get():
             self.user_var.set(users_sorted[0])
+        self._update_datasource_choices()
+
+    def _update_datasource_choices(self):
+        """Tryb zbiorczy – datasource'y ze wszystkich plików, tryb pojedynczy – z zaznaczonego pliku."""
+        if self.bulk_mode_var.get():
+            entries = self.index.cached_entries(self.settings.data["paths"])
+        else:
+            entries = [e for e in map(self.index.get, self.files_list.selected_paths()[:1]) if e is not None]
+        self.datasource_combo.configure(values=[self.ALL_DATASOURCES] + datasource_names(entries))
+
+    def _selected_datasources(self):
+        name = self.datasource_var.get().strip()
+        return None if not name or name == self.ALL_DATASOURCES else [name]
 
     def apply_to_all(self):
         target_url = self.url_var.get().strip()
@@ -139,17 +284,22 @@ class MainView(ctk.CTkFrame):
             return
 
         paths = list(self.settings.data["paths"])
-        files_with_url = []
-        files_with_user = []
-        files_without_url = []
-        files_without_user = []
-
-        for p in paths:
-            has_url, has_user = self._file_contains(p, target_url, target_user)
-            if target_url:
-                (files_with_url if has_url else files_without_url).append(p)
-            if target_user:
-                (files_with_user if has_user else files_without_user).append(p)
+        datasources = self._selected_datasources()
+
+        def work(progress, cancel):
+            with profiled("apply_to_all-plan", self.settings):
+                plan = self.processor.plan_changes(paths, target_url, target_user, progress=progress, cancel=cancel,
+                                                   datasources=datasources)
+            return None if cancel.is_set() else plan
+
+        self._run_task("Analiza", work, self._confirm_and_apply)
+
+    def _confirm_and_apply(self, plan):
+        if plan is None:
+            return
+        target_url, target_user = plan.target_url, plan.target_user
+        files_without_url = plan.files_without_url()
+        files_without_user = plan.files_without_user()
 
         warn_needed = False
         lines = []
@@ -164,6 +314,20 @@ class MainView(ctk.CTkFrame):
             lines.append("Brak wybranego użytkownika w plikach:")
             lines += [f" - {os.path.basename(x)}" for x in files_without_user]
 
+        unresolved = plan.unresolved()
+        if unresolved:
+            warn_needed = True
+            if lines:
+                lines.append("")
+            lines.append(f"Reguły profilu {plan.profile} bez celu w plikach:")
+            for path, rules in unresolved:
+                lines += [f" - {os.path.basename(path)}: {rule}" for rule in rules]
+
+        missing_datasources = plan.missing_datasources()
+        if missing_datasources:
+            messagebox.showwarning(APP_NAME, "Żaden plik nie zawiera datasource'a: " + ", ".join(missing_datasources))
+            return
+
         if warn_needed:
             resp = messagebox.askyesno(
                 APP_NAME,
@@ -175,37 +339,38 @@ class MainView(ctk.CTkFrame):
             if not resp:
                 return
 
-        backups = []
-        changed_full = []
-        changed_url_only = []
-        changed_user_only = []
-        unchanged = []
-
-        for p in paths:
-            has_url, has_user = self._file_contains(p, target_url, target_user)
-            if (target_url and not has_url) and (target_user and not has_user):
-                unchanged.append(p)
-                continue
-
-            try:
-                bkp = self.processor.apply_changes_to_file(p, target_url, target_user)
-                backups.append((p, bkp))
-                if (target_url and has_url) and (target_user and has_user):
-                    changed_full.append(p)
-                elif (target_url and has_url) and (not target_user or not has_user):
-                    changed_url_only.append(p)
-                elif (target_user and has_user) and (not target_url or not has_url):
-                    changed_user_only.append(p)
-                else:
-                    unchanged.append(p)
-            except Exception as e:
-                unchanged.append(p)
-
-        self.settings.data["last_target_url"] = target_url
-        self.settings.data["last_username"] = target_user
+        workers = self.settings.get_apply_workers()
+
+        def work(progress, cancel):
+            with profiled("apply_to_all", self.settings):
+                return self.processor.apply_plan(plan, workers=workers, progress=progress, cancel=cancel)
+
+        self._run_task("Zapisywanie", work, lambda results: self._show_apply_report(plan, results))
+
+    def _show_apply_report(self, plan, results):
+        backups = [(r.path, r.backup) for r in results if r.backup]
+        changed_full = [r.path for r in results if r.changed and r.category == "full"]
+        changed_url_only = [r.path for r in results if r.changed and r.category == "url"]
+        changed_user_only = [r.path for r in results if r.changed and r.category == "user"]
+        cancelled = [r.path for r in results if r.category == "cancelled"]
+        active = [r.path for r in results if r.category == "active"]
+        # błąd odczytu, kopii, utrwalenia lub podmiany pliku – nie jest zwykłym pominięciem
+        errors = [r for r in results if r.error is not None]
+        unchanged = [r.path for r in results
+                     if not r.changed and r.error is None and r.category not in ("cancelled", "active")]
+
+        if plan.profile is not None:
+            self.settings.data["last_environment_profile"] = plan.profile
+        else:
+            self.settings.data["last_target_url"] = plan.target_url
+            self.settings.data["last_username"] = plan.target_user
         self.settings.save()
 
         msg = []
+        if errors:
+            msg.append("Błędy (plik nie został zmieniony):")
+            msg += [f" ⚠ {os.path.basename(r.path)}: {r.error}" for r in errors]
+            msg.append("")
         if changed_full:
             msg.append("Zmieniono (URL + użytkownik):")
             msg += [f" ✅ {os.path.basename(x)}" for x in changed_full]
@@ -218,28 +383,95 @@ class MainView(ctk.CTkFrame):
             msg.append("Zmieniono tylko użytkownika:")
             msg += [f" ✅ {os.path.basename(x)}" for x in changed_user_only]
             msg.append("")
+        if active:
+            msg.append("Już aktywne (bez zapisu i kopii):")
+            msg += [f" ● {os.path.basename(x)}" for x in active]
+            msg.append("")
         if unchanged:
             msg.append("Pominięto (brak wybranego URL i/lub użytkownika):")
             msg += [f" ❌ {os.path.basename(x)}" for x in unchanged]
             msg.append("")
+        if cancelled:
+            msg.append("Anulowano (plik nie został zmieniony):")
+            msg += [f" ⏹ {os.path.basename(x)}" for x in cancelled]
+            msg.append("")
 
         if backups:
             msg.append("Utworzono kopie:")
             msg += [f" • {os.path.basename(p)} → {os.path.basename(b)}" for p, b in backups]
 
-        messagebox.showinfo(APP_NAME, "\n".join([line for line in msg if line is not None]) or "Brak zmian.")
+        show = messagebox.showwarning if errors else messagebox.showinfo
+        show(APP_NAME, "\n".join([line for line in msg if line is not None]) or "Brak zmian.")
+
+    def _selected_profile(self):
+        name = self.profile_var.get().strip()
+        profile = load_profile(self.settings, name) if name else None
+        if profile is None:
+            messagebox.showwarning(APP_NAME, "Wybierz zapisany profil środowiska.")
+        return profile
+
+    def apply_profile(self):
+        """Profil dla wszystkich plików jednym przebiegiem: każdy plik jest raz parsowany, kopiowany i zapisywany."""
+        profile = self._selected_profile()
+        if profile is None:
+            return
+        paths = list(self.settings.data["paths"])
+
+        def work(progress, cancel):
+            with profiled("apply_profile-plan", self.settings):
+                plan = self.processor.plan_profile(paths, profile, progress=progress, cancel=cancel)
+            return None if cancel.is_set() else plan
+
+        self._run_task("Analiza", work, self._confirm_and_apply)
+
+    def preview_profile(self):
+        profile = self._selected_profile()
+        if profile is None:
+            return
+        paths = list(self.settings.data["paths"])
+        workers = self.settings.get_apply_workers()
+
+        def work(progress, cancel):
+            with profiled("preview_profile", self.settings):
+                plan = self.processor.plan_profile(paths, profile, progress=progress, cancel=cancel, workers=workers)
+                diffs = self.processor.diff_plan(plan, workers=workers, progress=progress, cancel=cancel,
+                                                 keep_model=True)
+            return None if cancel.is_set() else diffs
+
+        def done(diffs):
+            if diffs is not None:
+                DiffDialog(self, diffs, f"Podgląd profilu: {profile.name}")
+
+        self._run_task("Podgląd", work, done, error_prefix="Błąd podglądu")
+
+    def edit_profiles(self):
+        def suggestions():
+            entries = self.index.cached_entries(self.settings.data["paths"])
+            urls, users = urls_and_users(entries)
+            return datasource_names(entries), urls, users
+
+        def current():
+            names = self._selected_datasources()
+            return (names[0] if names else ""), self.url_var.get().strip(), self.user_var.get().strip()
+
+        ProfileDialog(self, self.settings, suggestions, current, on_saved=self._on_profiles_saved,
+                      name=self.profile_var.get().strip())
+
+    def _on_profiles_saved(self, name):
+        self.profile_combo.configure(values=sorted(self.settings.get_environment_profiles()))
+        self.profile_var.set(name)
 
     def apply_to_selected(self):
         bulk = self.bulk_mode_var.get()
         if bulk:
             return
 
-        sel = self.files_list.curselection()
+        sel = self.files_list.selected_paths()
         if len(sel) != 1:
             messagebox.showwarning(APP_NAME, "Wybierz dokładnie jeden plik na liście.")
             return
 
-        path = self.files_list.get(sel[0])
+        path = sel[0]
         target_url = self.url_var.get().strip()
         target_user = self.user_var.get().strip()
 
@@ -247,18 +479,30 @@ class MainView(ctk.CTkFrame):
             messagebox.showwarning(APP_NAME, "Wybierz przynajmniej URL lub użytkownika.")
             return
 
-        has_url, has_user = self._file_contains(path, target_url, target_user)
+        plan = self.processor.plan_changes([path], target_url, target_user,
+                                           datasources=self._selected_datasources())
+        fp = plan.files[0]
+        has_url, has_user = fp.has_url, fp.has_user
 
-        if (target_url and not has_url) and (target_user and not has_user):
+        already_active = (f"Wybrana konfiguracja jest już aktywna w pliku {os.path.basename(path)} "
+                          "– plik nie został zmieniony.")
+        if fp.category == "active":
+            messagebox.showinfo(APP_NAME, already_active)
+            return
+        if not fp.will_change:
             messagebox.showinfo(APP_NAME,
                                 "Nie da się zmienić konfiguracji w wybranym pliku (zmodyfikuj plik samodzielnie).")
             return
 
-        try:
-            bkp = self.processor.apply_changes_to_file(path, target_url, target_user)
-        except Exception as e:
-            messagebox.showerror(APP_NAME, f"Błąd zapisu: {e}")
+        result = self.processor.apply_plan(plan)[0]
+        self._export_metrics()
+        if result.error is not None:
+            messagebox.showerror(APP_NAME, f"Błąd zapisu: {result.error}")
+            return
+        if result.category == "active":
+            messagebox.showinfo(APP_NAME, already_active)
             return
+        bkp = result.backup
 
         msg_lines = [f"W pliku {os.path.basename(path)} zmieniono:"]
 
@@ -280,64 +524,119 @@ class MainView(ctk.CTkFrame):
         messagebox.showinfo(APP_NAME, "\n".join(msg_lines))
 
     def preview_one(self):
-        sel = self.files_list.curselection()
+        sel = self.files_list.selected_paths()
         if not sel:
             messagebox.showinfo(APP_NAME, "Zaznacz plik na liście.")
             return
-        path = self.files_list.get(sel[0])
+        path = sel[0]
+        self._preview([path], f"Podgląd: {os.path.basename(path)}", "preview_one")
+
+    def preview_all(self):
+        self._preview(list(self.settings.data["paths"]), "Podgląd zmian – wszystkie pliki", "preview_all")
+
+    def _preview(self, paths, title, profile_name):
+        target_url = self.url_var.get().strip()
+        target_user = self.user_var.get().strip()
+        if not target_url and not target_user:
+            messagebox.showwarning(APP_NAME, "Wybierz przynajmniej URL lub użytkownika.")
+            return
+        workers = self.settings.get_apply_workers()
+        datasources = self._selected_datasources()
+
+        def work(progress, cancel):
+            with profiled(profile_name, self.settings):
+                diffs = self.processor.diff_files(paths, target_url, target_user, workers=workers,
+                                                  progress=progress, cancel=cancel, keep_model=True,
+                                                  datasources=datasources)
+            return None if cancel.is_set() else diffs
+
+        def done(diffs):
+            if diffs is not None:
+                DiffDialog(self, diffs, title)
+
+        self._run_task("Podgląd", work, done, error_prefix="Błąd podglądu")
+
+    def _run_task(self, title, fn, on_done, error_prefix="Błąd"):
+        if self.task is not None and self.task.running:
+            messagebox.showinfo(APP_NAME, "Poczekaj na zakończenie bieżącej operacji lub ją anuluj.")
+            return
 
+        def finished(result):
+            self.task = None
+            self._set_busy(False)
+            self.progress_label.configure(text="Anulowano." if task.cancelled else "Gotowy.")
+            self._export_metrics()
+            on_done(result)
+
+        def failed(error):
+            self.task = None
+            self._set_busy(False)
+            self.progress_label.configure(text="Błąd.")
+            self._export_metrics()
+            messagebox.showerror(APP_NAME, f"{error_prefix}: {error}")
+
+        self._task_title = title
+        self._set_busy(True)
+        task = BackgroundTask(self, fn, on_done=finished, on_progress=self._on_task_progress, on_error=failed)
+        self.task = task.start()
+
+    def _export_metrics(self):
+        """Pomiary etapów do pliku z ustawień (Ustawienia → Diagnostyka) po każdej operacji."""
+        path = self.settings.get_metrics_export()
+        if not path:
+            return
         try:
-            target_url = self.url_var.get().strip()
-            target_user = self.user_var.get().strip()
-
-            from core.utils import read_xml
-            tree = read_xml(path)
-            tree_copy = deep_clone_tree(tree)
-
-            self.processor.activate_connection_url(tree_copy, target_url)
-            if target_user:
-                self.processor.activate_user(tree_copy, target_user)
-
-            xml_text = etree.tostring(
-                tree_copy, pretty_print=True, xml_declaration=True, encoding="utf-8"
-            ).decode("utf-8")
-
-            win = ctk.CTkToplevel(self)
-            win.title(f"Podgląd: {os.path.basename(path)}")
-            win.geometry("900x600")
-            txt = tk.Text(win, wrap="none")
-            txt.pack(fill="both", expand=True, padx=10, pady=10)
-            txt.insert("1.0", xml_text)
-            txt.configure(state="disabled")
-        except Exception as e:
-            messagebox.showerror(APP_NAME, f"Błąd podglądu: {e}")
+            metrics.export(path)
+        except OSError as e:
+            print(f"[WARN] zapis pomiarów do {path}: {e}", file=sys.stderr)
+
+    def _on_task_progress(self, done, total, _path=None):
+        self.progress_bar.set(done / total if total else 1)
+        rate = self.task.throughput(done) if self.task else 0.0
+        self.progress_label.configure(text=f"{self._task_title}: {done}/{total} plików ({rate:.1f} plików/s)")
+
+    def cancel_task(self):
+        if self.task is not None and self.task.running:
+            self.task.cancel()
+            self.btn_cancel.configure(state="disabled")
+            self.progress_label.configure(text="Anulowanie – kończenie bieżącego pliku…")
+
+    def _set_busy(self, busy):
+        state = "disabled" if busy else "normal"
+        for btn in (self.btn_refresh, self.btn_preview, self.btn_preview_all, self.btn_preview_profile,
+                    self.btn_apply_profile):
+            btn.configure(state=state)
+        self.btn_cancel.configure(state=("normal" if busy else "disabled"))
+        if busy:
+            self.btn_apply_all.configure(state="disabled")
+            self.btn_apply_selected.configure(state="disabled")
+            self.progress_bar.set(0)
+            self.progress_label.configure(text=f"{self._task_title}…")
+        else:
+            self._update_buttons_state()
 
     def update_listbox_style(self):
-        if ctk.get_appearance_mode() == "Dark":
-            self.files_list.configure(bg="#333333", fg="#FFFFFF", selectbackground="#555555", selectforeground="#FFFFFF")
-        else:
-            self.files_list.configure(bg="#FFFFFF", fg="#000000", selectbackground="#E5E5E5", selectforeground="#000000")
+        self.files_list.update_style()
 
     def toggle_mode(self):
         bulk = self.bulk_mode_var.get()
-        self.files_list.configure(state=("disabled" if bulk else "normal"))
+        self.files_list.set_enabled(not bulk)
+        self._update_datasource_choices()
+        self._update_buttons_state()
+
+    def _on_file_selected(self):
+        if not self.bulk_mode_var.get():
+            self._update_datasource_choices()
         self._update_buttons_state()
 
     def _update_buttons_state(self):
+        if self.task is not None and self.task.running:
+            return
         bulk = self.bulk_mode_var.get()
         if bulk:
             self.btn_apply_all.configure(state="normal")
             self.btn_apply_selected.configure(state="disabled")
         else:
-            sel = self.files_list.curselection()
+            sel = self.files_list.selected_paths()
             self.btn_apply_all.configure(state="disabled")
             self.btn_apply_selected.configure(state=("normal" if len(sel) == 1 else "disabled"))
-
-    def _file_contains(self, path, url, user):
-        try:
-            urls, users = self.processor.collect_urls_and_users(path)
-            has_url = (url.strip() in urls) if url.strip() else False
-            has_user = (user.strip() in users) if user.strip() else False
-            return has_url, has_user
-        except Exception:
-            return False, False
@@ -0,0 +1,121 @@
+import tkinter as tk
+from tkinter import messagebox
+import customtkinter as ctk
+
+from core.environments import ProfileRule
+
+
+class ProfileDialog(ctk.CTkToplevel):
+    """Edycja profili środowisk: reguły (datasource i/lub wzorzec plików → URL, użytkownik).
+    `suggestions()` zwraca (datasource'y, URL, użytkownicy) do list wyboru, `current()` –
+    bieżący wybór z formularza (datasource albo "", URL, użytkownik) dla nowej reguły."""
+
+    def __init__(self, master, settings, suggestions, current, on_saved=None, name=""):
+        super().__init__(master)
+        self.settings = settings
+        self.current = current
+        self.on_saved = on_saved
+        self.datasources, self.urls, self.users = suggestions()
+        self.title("Profile środowisk")
+        self.geometry("1100x500")
+        self.columnconfigure(0, weight=1)
+        self.rowconfigure(1, weight=1)
+
+        top = ctk.CTkFrame(self)
+        top.grid(row=0, column=0, sticky="ew", padx=10, pady=(10, 0))
+        top.columnconfigure(1, weight=1)
+        ctk.CTkLabel(top, text="Profil:").grid(row=0, column=0, padx=10, pady=10, sticky="w")
+        self.name_var = tk.StringVar(value=name)
+        self.name_combo = ctk.CTkComboBox(top, values=self._names(), variable=self.name_var,
+                                          command=lambda _v: self._load())
+        self.name_combo.grid(row=0, column=1, padx=10, pady=10, sticky="ew")
+        ctk.CTkButton(top, text="Usuń profil", fg_color="#8b0000", hover_color="#a40000",
+                      command=self._delete).grid(row=0, column=2, padx=10, pady=10)
+
+        self.rules_frame = ctk.CTkScrollableFrame(self)
+        self.rules_frame.grid(row=1, column=0, sticky="nsew", padx=10, pady=10)
+        for col, weight in enumerate((1, 1, 2, 1, 0)):
+            self.rules_frame.columnconfigure(col, weight=weight)
+        for col, text in enumerate(("Datasource (puste – cały plik)", "Pliki (glob, puste – wszystkie)",
+                                    "URL", "Użytkownik")):
+            ctk.CTkLabel(self.rules_frame, text=text, anchor="w").grid(row=0, column=col, padx=4, sticky="ew")
+        self.rows = []
+
+        btns = ctk.CTkFrame(self)
+        btns.grid(row=2, column=0, sticky="ew", padx=10, pady=(0, 10))
+        ctk.CTkButton(btns, text="Dodaj regułę", command=self._add_current).pack(side="left", padx=6, pady=10)
+        ctk.CTkButton(btns, text="Zamknij", command=self.destroy).pack(side="right", padx=6, pady=10)
+        ctk.CTkButton(btns, text="Zapisz", fg_color="#0b6e4f", hover_color="#0c7d59",
+                      command=self._save).pack(side="right", padx=6, pady=10)
+        ctk.CTkLabel(btns, text="Reguły dla całych plików są stosowane przed regułami datasource'ów; "
+                                "późniejsza reguła wygrywa.", anchor="w").pack(side="left", padx=10)
+
+        self._load()
+
+    def _names(self):
+        return sorted(self.settings.get_environment_profiles())
+
+    def _load(self):
+        for row in self.rows:
+            for widget in row[1]:
+                widget.destroy()
+        self.rows = []
+        for rule in self.settings.get_environment_profiles().get(self.name_var.get().strip(), []):
+            self._add_row(ProfileRule.from_dict(rule))
+
+    def _add_current(self):
+        datasource, url, user = self.current()
+        self._add_row(ProfileRule(datasource=datasource, url=url, user=user))
+
+    def _add_row(self, rule):
+        r = len(self.rows) + 1
+        variables = [tk.StringVar(value=getattr(rule, f)) for f in ProfileRule.FIELDS]
+        widgets = [
+            ctk.CTkComboBox(self.rules_frame, values=self.datasources, variable=variables[0]),
+            ctk.CTkEntry(self.rules_frame, textvariable=variables[1]),
+            ctk.CTkComboBox(self.rules_frame, values=self.urls, variable=variables[2]),
+            ctk.CTkComboBox(self.rules_frame, values=self.users, variable=variables[3]),
+        ]
+        row = (variables, widgets)
+        widgets.append(ctk.CTkButton(self.rules_frame, text="✕", width=30, fg_color="#8b0000",
+                                     hover_color="#a40000", command=lambda: self._remove_row(row)))
+        for col, widget in enumerate(widgets):
+            widget.grid(row=r, column=col, padx=4, pady=3, sticky="ew")
+        self.rows.append(row)
+
+    def _remove_row(self, row):
+        for widget in row[1]:
+            widget.destroy()
+        self.rows.remove(row)
+
+    def _rules(self):
+        rules = [ProfileRule(*(v.get() for v in variables)) for variables, _w in self.rows]
+        return [r for r in rules if not r.empty]
+
+    def _save(self):
+        name = self.name_var.get().strip()
+        if not name:
+            messagebox.showwarning("Profile środowisk", "Podaj nazwę profilu.", parent=self)
+            return
+        rules = self._rules()
+        if not rules:
+            messagebox.showwarning("Profile środowisk", "Profil musi mieć co najmniej jedną regułę z URL "
+                                                       "lub użytkownikiem.", parent=self)
+            return
+        self.settings.set_environment_profile(name, [r.to_dict() for r in rules])
+        self.name_combo.configure(values=self._names())
+        if self.on_saved is not None:
+            self.on_saved(name)
+
+    def _delete(self):
+        name = self.name_var.get().strip()
+        if name not in self.settings.get_environment_profiles():
+            return
+        if not messagebox.askyesno("Profile środowisk", f"Usunąć profil {name}?", parent=self):
+            return
+        self.settings.delete_environment_profile(name)
+        self.name_var.set("")
+        self.name_combo.configure(values=self._names())
+        self._load()
+        if self.on_saved is not None:
+            self.on_saved("")
@@ -5,7 +5,19 @@ import tkinter as tk
 from tkinter import filedialog, messagebox
 import customtkinter as ctk
 
+from core.backup import BackupStore, available_compressions
+from core.discovery import FolderScan, parse_excludes
+from core.metrics import metrics
+from core.profiling import PROFILE_DIR, PROFILE_ENV
+from .file_list import VirtualFileList
+from .worker import BackgroundTask
+
 class SettingsView(ctk.CTkFrame):
+    WRITE_MODES = {
+        "normalize": "Normalizacja (pełny zapis)",
+        "surgical": "Chirurgiczny (tylko zmienione fragmenty)",
+    }
+
     def __init__(self, master, settings, on_paths_changed, on_theme_changed):
         super().__init__(master)
         self.settings = settings
@@ -24,34 +36,20 @@ class SettingsView(ctk.CTkFrame):
         list_frame.rowconfigure(0, weight=1)
         list_frame.columnconfigure(0, weight=1)
 
-        self.paths_list = tk.Listbox(list_frame, selectmode=tk.EXTENDED, height=12)
-
-        if ctk.get_appearance_mode() == "Dark":
-            self.paths_list.configure(
-                bg="#333333",
-                fg="#FFFFFF",
-                selectbackground="#555555",  # lub np. "#1f6aa5" aby pasował do CTk
-                selectforeground="#FFFFFF",
-                highlightthickness=0,
-                borderwidth=0,
-            )
-        else:
-            self.paths_list.configure(
-                bg="#FFFFFF",
-                fg="#000000",
-                selectbackground="#E5E5E5",
-                selectforeground="#000000",
-                highlightthickness=0,
-                borderwidth=0,
-            )
-
+        self.paths_list = VirtualFileList(
+            list_frame,
+            selectmode="extended",
+            path_color=lambda p: None if os.path.exists(p) else "#888888",
+            placeholder="Filtruj ścieżki…",
+        )
         self.paths_list.grid(row=0, column=0, sticky="nsew", padx=(10, 5), pady=10)
 
         btns = ctk.CTkFrame(list_frame)
         btns.grid(row=0, column=1, sticky="ns", padx=(5, 10), pady=10)
 
         ctk.CTkButton(btns, text="Dodaj pliki…", command=self._add_files).pack(fill="x", pady=4)
-        ctk.CTkButton(btns, text="Dodaj folder…", command=self._add_folder).pack(fill="x", pady=4)
+        self.btn_add_folder = ctk.CTkButton(btns, text="Dodaj folder…", command=self._add_folder)
+        self.btn_add_folder.pack(fill="x", pady=4)
         ctk.CTkButton(btns, text="Edytuj zaznaczony…", command=self._edit_selected).pack(fill="x", pady=4)
         ctk.CTkButton(btns, text="Usuń zaznaczone", fg_color="#8b0000", hover_color="#a40000",
                       command=self._remove_selected).pack(fill="x", pady=8)
@@ -63,6 +61,13 @@ class SettingsView(ctk.CTkFrame):
         self.path_entry = ctk.CTkEntry(paste_frame, placeholder_text=r"C:\folder\plik.xml lub /home/u/plik.xml")
         self.path_entry.grid(row=0, column=1, padx=(0, 10), pady=10, sticky="ew")
         ctk.CTkButton(paste_frame, text="Dodaj", command=self._add_from_entry).grid(row=0, column=2, padx=10, pady=10)
+        ctk.CTkLabel(paste_frame, text="Pomijaj w folderach:").grid(row=1, column=0, padx=10, pady=(0, 10), sticky="w")
+        self.excludes_var = tk.StringVar(value=", ".join(self.settings.get_discovery_excludes()))
+        ctk.CTkEntry(paste_frame, textvariable=self.excludes_var).grid(row=1, column=1, padx=(0, 10), pady=(0, 10),
+                                                                       sticky="ew")
+        self.discovery_label = ctk.CTkLabel(paste_frame, text="", anchor="w")
+        self.discovery_label.grid(row=2, column=0, columnspan=3, padx=10, pady=(0, 10), sticky="ew")
+        self.discovery_task = None
 
         self._setup_optional_dnd()
 
@@ -112,6 +117,64 @@ class SettingsView(ctk.CTkFrame):
             text="Otwórz folder kopii…",
             command=self._open_backup_dir
         ).grid(row=2, column=2, padx=10, pady=(4, 10))
+        ctk.CTkButton(
+            backup_frame,
+            text="Historia kopii…",
+            command=self._show_backup_history
+        ).grid(row=2, column=1, padx=(0, 10), pady=(4, 10), sticky="e")
+
+        ctk.CTkLabel(backup_frame, text="Tryb zapisu plików:").grid(row=3, column=0, padx=10, pady=(4, 10), sticky="w")
+        self.write_mode_var = tk.StringVar(value=self.WRITE_MODES[self.settings.get_write_mode()])
+        self.write_mode_menu = ctk.CTkOptionMenu(
+            backup_frame,
+            values=list(self.WRITE_MODES.values()),
+            variable=self.write_mode_var,
+            command=self._change_write_mode
+        )
+        self.write_mode_menu.grid(row=3, column=1, padx=(0, 10), pady=(4, 10), sticky="w")
+
+        ctk.CTkLabel(backup_frame, text="Kompresja kopii:").grid(row=4, column=0, padx=10, pady=(4, 10), sticky="w")
+        self.compression_var = tk.StringVar(value=self.settings.get_backup_compression())
+        self.compression_menu = ctk.CTkOptionMenu(
+            backup_frame,
+            values=available_compressions(),
+            variable=self.compression_var,
+            command=self._change_compression
+        )
+        self.compression_menu.grid(row=4, column=1, padx=(0, 10), pady=(4, 10), sticky="w")
+
+        diag_frame = ctk.CTkFrame(self)
+        diag_frame.grid(row=7, column=0, sticky="ew", padx=10, pady=(0, 10))
+        diag_frame.columnconfigure(1, weight=1)
+        ctk.CTkLabel(diag_frame, text="Diagnostyka:").grid(row=0, column=0, padx=10, pady=(10, 4), sticky="nw")
+        self.metrics_label = ctk.CTkLabel(diag_frame, text="", anchor="w", justify="left",
+                                          font=ctk.CTkFont(family="Courier", size=12))
+        self.metrics_label.grid(row=0, column=1, columnspan=2, padx=(0, 10), pady=(10, 4), sticky="ew")
+
+        diag_btns = ctk.CTkFrame(diag_frame, fg_color="transparent")
+        diag_btns.grid(row=1, column=1, columnspan=2, padx=(0, 10), pady=4, sticky="w")
+        ctk.CTkButton(diag_btns, text="Odśwież", width=90, command=self._refresh_metrics).pack(side="left", padx=(0, 6))
+        ctk.CTkButton(diag_btns, text="Szczegóły…", width=90, command=self._show_metrics).pack(side="left", padx=6)
+        ctk.CTkButton(diag_btns, text="Eksportuj…", width=90, command=self._export_metrics).pack(side="left", padx=6)
+        ctk.CTkButton(diag_btns, text="Wyzeruj", width=90, command=self._reset_metrics).pack(side="left", padx=6)
+
+        ctk.CTkLabel(diag_frame, text="Eksport po każdej operacji:").grid(row=2, column=0, padx=10, pady=(4, 10), sticky="w")
+        self.metrics_export_var = tk.StringVar(value=self.settings.get_metrics_export())
+        ctk.CTkEntry(diag_frame, textvariable=self.metrics_export_var,
+                     placeholder_text="(wyłączony; *.prom – Prometheus, inaczej JSON)").grid(
+            row=2, column=1, padx=(0, 10), pady=(4, 10), sticky="ew")
+        ctk.CTkButton(diag_frame, text="Zapisz", command=self._save_metrics_export).grid(row=2, column=2, padx=10, pady=(4, 10))
+
+        self.profiling_var = tk.BooleanVar(value=self.settings.get_profiling())
+        ctk.CTkCheckBox(
+            diag_frame,
+            text=f"Profilowanie operacji (cProfile + tracemalloc; także zmienna {PROFILE_ENV}=1)",
+            variable=self.profiling_var,
+            command=self._toggle_profiling
+        ).grid(row=3, column=0, columnspan=2, padx=10, pady=(4, 10), sticky="w")
+        ctk.CTkButton(diag_frame, text="Folder profili…", command=lambda: _open_folder(PROFILE_DIR)).grid(
+            row=3, column=2, padx=10, pady=(4, 10))
+        self.bind("<Map>", lambda _e: self._refresh_metrics())
 
         self._reload_paths()
 
@@ -119,8 +182,8 @@ class SettingsView(ctk.CTkFrame):
         try:
             import tkinterdnd2  # noqa: F401
             self.tk.call('package', 'require', 'tkdnd')
-            self.paths_list.drop_target_register('DND_Files')
-            self.paths_list.dnd_bind('<<Drop>>', self._on_drop)
+            self.paths_list.canvas.drop_target_register('DND_Files')
+            self.paths_list.canvas.dnd_bind('<<Drop>>', self._on_drop)
             tip = "Możesz przeciągnąć tu pliki *.xml."
         except Exception:
             tip = "Drag&Drop wymaga pakietu tkinterdnd2 (opcjonalne)."
@@ -152,9 +215,7 @@ class SettingsView(ctk.CTkFrame):
         self.on_paths_changed()
 
     def _reload_paths(self):
-        self.paths_list.delete(0, tk.END)
-        for p in self.settings.data["paths"]:
-            self.paths_list.insert(tk.END, p)
+        self.paths_list.set_items(self.settings.data["paths"])
 
     def _add_files(self):
         files = filedialog.askopenfilenames(filetypes=[("XML files", "*.xml")])
@@ -164,20 +225,44 @@ class SettingsView(ctk.CTkFrame):
             self.on_paths_changed()
 
     def _add_folder(self):
+        """Wyszukiwanie w tle plików XML zawierających <datasource>/<xa-datasource>; ponowne
+        kliknięcie w trakcie wyszukiwania je przerywa (dodawane są pliki znalezione do tej pory)."""
+        if self.discovery_task is not None and self.discovery_task.running:
+            self.discovery_task.cancel()
+            return
         folder = filedialog.askdirectory()
         if not folder:
             return
-        found = []
-        for root, _dirs, files in os.walk(folder):
-            for f in files:
-                if f.lower().endswith(".xml"):
-                    found.append(os.path.join(root, f))
-        self.settings.add_paths(found)
-        self._reload_paths()
-        self.on_paths_changed()
+        excludes = parse_excludes(self.excludes_var.get())
+        self.settings.data["discovery_excludes"] = excludes
+        self.settings.save()
+        scan = FolderScan(folder, excludes)
+
+        def progress(checked, found, path):
+            where = f" – {os.path.relpath(path, scan.root)}" if path else ""
+            self.discovery_label.configure(text=f"Sprawdzono plików XML: {checked}, ze źródłami danych: {found}{where}")
+
+        def done(result):
+            self.btn_add_folder.configure(text="Dodaj folder…")
+            self.settings.add_paths(result.found)
+            self._reload_paths()
+            self.on_paths_changed()
+            status = "Przerwano" if task.cancelled else "Gotowe"
+            self.discovery_label.configure(
+                text=(f"{status}: dodano {len(result.found)} z {result.checked} sprawdzonych plików XML, "
+                      f"pominięto katalogów: {result.skipped_dirs}"))
+
+        def failed(error):
+            self.btn_add_folder.configure(text="Dodaj folder…")
+            messagebox.showerror("Błąd", f"Wyszukiwanie plików: {error}")
+
+        self.btn_add_folder.configure(text="Przerwij wyszukiwanie")
+        task = BackgroundTask(self, lambda report, cancel: scan.run(report, cancel),
+                              on_done=done, on_progress=progress, on_error=failed)
+        self.discovery_task = task.start()
 
     def _remove_selected(self):
-        sel = [self.paths_list.get(i) for i in self.paths_list.curselection()]
+        sel = self.paths_list.selected_paths()
         if not sel:
             return
         self.settings.remove_paths(sel)
@@ -185,10 +270,10 @@ class SettingsView(ctk.CTkFrame):
         self.on_paths_changed()
 
     def _edit_selected(self):
-        sel = self.paths_list.curselection()
+        sel = self.paths_list.selected_paths()
         if not sel:
             return
-        from_path = self.paths_list.get(sel[0])
+        from_path = sel[0]
         to_path = filedialog.askopenfilename(filetypes=[("XML files", "*.xml")], initialdir=os.path.dirname(from_path))
         if to_path:
             try:
@@ -223,11 +308,17 @@ class SettingsView(ctk.CTkFrame):
         ctk.set_default_color_theme(theme)
         self.on_theme_changed()
 
+    def _change_write_mode(self, label):
+        mode = next(k for k, v in self.WRITE_MODES.items() if v == label)
+        self.settings.data["write_mode"] = mode
+        self.settings.save()
+
+    def _change_compression(self, value):
+        self.settings.data["backup_compression"] = value
+        self.settings.save()
+
     def update_listbox_style(self):
-        if ctk.get_appearance_mode() == "Dark":
-            self.paths_list.configure(bg="#333333", fg="#FFFFFF", selectbackground="#555555", selectforeground="#FFFFFF")
-        else:
-            self.paths_list.configure(bg="#FFFFFF", fg="#000000", selectbackground="#E5E5E5", selectforeground="#000000")
+        self.paths_list.update_style()
 
     def _choose_backup_dir(self):
         folder = filedialog.askdirectory()
@@ -249,17 +340,122 @@ class SettingsView(ctk.CTkFrame):
         self.settings.save()
         messagebox.showinfo("Ustawienia", "Zapisano ustawienia kopii zapasowych.")
 
+    def _show_backup_history(self):
+        """Historia kopii zaznaczonych plików (lub wszystkich) – z dziennika kopii, bez przeszukiwania folderów."""
+        paths = self.paths_list.selected_paths() or list(self.settings.data["paths"])
+        store = BackupStore(self.settings.get_effective_backup_dir(), self.settings.get_backup_limit())
+        lines = []
+        for p in paths:
+            history = store.history(p)
+            lines.append(f"{p}  ({len(history)})")
+            for r in history:
+                missing = "" if os.path.exists(r.path) else "  [brak pliku]"
+                lines.append(f"    {r.created:%Y-%m-%d %H:%M:%S}  {r.size / 1024:8.1f} KB  "
+                             f"operacja {r.op or '-':<12}  {os.path.basename(r.path)}{missing}")
+            legacy = store.legacy(p)
+            if legacy:
+                lines.append("    kopie sprzed dziennika (nieprzypisane – mogą pochodzić z innego pliku o tej nazwie):")
+                for r in legacy:
+                    lines.append(f"    {r.created:%Y-%m-%d %H:%M:%S}  {r.size / 1024:8.1f} KB  {r.path}")
+            lines.append("")
+
+        win = ctk.CTkToplevel(self)
+        win.title("Historia kopii zapasowych")
+        win.geometry("900x500")
+        txt = tk.Text(win, wrap="none")
+        txt.pack(fill="both", expand=True, padx=10, pady=10)
+        txt.insert("1.0", "\n".join(lines) or "Brak plików.")
+        txt.configure(state="disabled")
+
+    def _refresh_metrics(self):
+        self.metrics_label.configure(text="\n".join(_metrics_summary(metrics.snapshot())))
+
+    def _show_metrics(self):
+        self._refresh_metrics()
+        win = ctk.CTkToplevel(self)
+        win.title("Diagnostyka – pomiary etapów")
+        win.geometry("900x500")
+        txt = tk.Text(win, wrap="none")
+        txt.pack(fill="both", expand=True, padx=10, pady=10)
+        txt.insert("1.0", "\n".join(_metrics_details(metrics.snapshot())))
+        txt.configure(state="disabled")
+
+    def _export_metrics(self):
+        path = filedialog.asksaveasfilename(
+            defaultextension=".json",
+            filetypes=[("JSON", "*.json"), ("Prometheus (textfile)", "*.prom")],
+        )
+        if not path:
+            return
+        try:
+            metrics.export(path)
+        except OSError as e:
+            messagebox.showerror("Diagnostyka", f"Nie udało się zapisać pomiarów: {e}")
+
+    def _reset_metrics(self):
+        metrics.reset()
+        self._refresh_metrics()
+
+    def _save_metrics_export(self):
+        self.settings.data["metrics_export"] = self.metrics_export_var.get().strip()
+        self.settings.save()
+        messagebox.showinfo("Ustawienia", "Zapisano ustawienia eksportu pomiarów.")
+
     def _open_backup_dir(self):
         from config.settings_manager import CONFIG_DIR
         bdir = self.settings.data.get("backup_dir", "")
         if not bdir:
             bdir = os.path.join(CONFIG_DIR, "backups")
 
-        os.makedirs(bdir, exist_ok=True)
+        _open_folder(bdir)
+
+    def _toggle_profiling(self):
+        self.settings.data["profiling"] = bool(self.profiling_var.get())
+        self.settings.save()
+
 
-        if sys.platform.startswith("win"):
-            os.startfile(bdir)
-        elif sys.platform == "darwin":  # macOS
-            subprocess.Popen(["open", bdir])
-        else:
-            subprocess.Popen(["xdg-open", bdir])
\ No newline at end of file
+def _open_folder(path):
+    os.makedirs(path, exist_ok=True)
+
+    if sys.platform.startswith("win"):
+        os.startfile(path)
+    elif sys.platform == "darwin":  # macOS
+        subprocess.Popen(["open", path])
+    else:
+        subprocess.Popen(["xdg-open", path])
+
+
+def _metrics_summary(snap):
+    """Kilka linii dla sekcji Diagnostyka: główne etapy, liczniki, najwolniejszy plik."""
+    phases = snap["phases"]
+    if not phases:
+        return ["Brak pomiarów – uruchom skanowanie, podgląd lub zapis."]
+    c = snap["counters"]
+    lines = ["  ".join(f"{name} {p['total_s']:.3f} s" for name, p in list(phases.items())[:5])]
+    lines.append(f"pliki: {c.get('files_parsed', 0)} parsowanych, {c.get('files_written', 0)} zapisanych, "
+                 f"odczyt {c.get('bytes_read', 0) / 1024:.0f} KB, zapis {c.get('bytes_written', 0) / 1024:.0f} KB, "
+                 f"komentarzy: {c.get('comments_inspected', 0)}")
+    lines.append(f"kopie: {c.get('backups_created', 0)} nowych, {c.get('backups_unchanged', 0)} bez zmian, "
+                 f"{c.get('backups_pruned', 0)} usuniętych")
+    if snap["slowest_files"]:
+        f = snap["slowest_files"][0]
+        lines.append(f"najwolniejszy: {os.path.basename(f['path'])} – {f['total_s'] * 1e3:.0f} ms "
+                     f"(najdłużej: {f['slowest_phase']})")
+    return lines
+
+
+def _metrics_details(snap):
+    lines = [f"{'etap':<12} {'razem [s]':>10} {'liczba':>8} {'śr. [ms]':>10} {'maks. [ms]':>11}"]
+    for name, p in snap["phases"].items():
+        lines.append(f"{name:<12} {p['total_s']:>10.3f} {p['count']:>8} {p['avg_ms']:>10.2f} {p['max_s'] * 1e3:>11.2f}")
+    lines += ["", "Liczniki:"]
+    lines += [f"  {name:<22} {value}" for name, value in snap["counters"].items()]
+    lines += ["", "Cache:"]
+    for cache, stats in snap["caches"].items():
+        lines.append(f"  {cache:<22} " + ", ".join(f"{k}={v}" for k, v in stats.items()))
+    lines += ["", "Najwolniejsze pliki:"]
+    for f in snap["slowest_files"]:
+        phases = ", ".join(f"{k} {v * 1e3:.1f}" for k, v in f["phases"].items())
+        lines.append(f"  {f['total_s'] * 1e3:8.1f} ms  {f['path']}")
+        lines.append(f"              {phases}")
+    return lines
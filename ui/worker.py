@@ -0,0 +1,82 @@
+import queue
+import threading
+import time
+
+
+class BackgroundTask:
+    """Uruchamia `fn(progress, cancel)` w wątku roboczym i przekazuje postęp oraz wynik
+    do wątku Tk przez kolejkę odpytywaną metodą `after()`.
+
+    - progress(done, total, path) – wołane z wątku roboczego,
+    - cancel – threading.Event sprawdzany przez logikę `core` pomiędzy plikami.
+    """
+
+    POLL_MS = 50
+
+    def __init__(self, widget, fn, on_done, on_progress=None, on_error=None):
+        self.widget = widget
+        self.fn = fn
+        self.on_done = on_done
+        self.on_progress = on_progress
+        self.on_error = on_error
+        self.cancel_event = threading.Event()
+        self.started_at = None
+        self._queue = queue.Queue()
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    @property
+    def cancelled(self):
+        return self.cancel_event.is_set()
+
+    def start(self):
+        self.started_at = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        self.widget.after(self.POLL_MS, self._poll)
+        return self
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    def _run(self):
+        try:
+            result = self.fn(self._report, self.cancel_event)
+            self._queue.put(("done", result))
+        except Exception as e:
+            self._queue.put(("error", e))
+
+    def _report(self, done, total, path=None):
+        self._queue.put(("progress", (done, total, path)))
+
+    def _poll(self):
+        last_progress = None
+        try:
+            while True:
+                kind, payload = self._queue.get_nowait()
+                if kind == "progress":
+                    last_progress = payload
+                    continue
+                if last_progress is not None and self.on_progress:
+                    self.on_progress(*last_progress)
+                if kind == "done":
+                    self.on_done(payload)
+                elif self.on_error:
+                    self.on_error(payload)
+                return
+        except queue.Empty:
+            pass
+        # zbieramy postęp z całej partii, aby nie przerysowywać UI po każdym pliku
+        if last_progress is not None and self.on_progress:
+            self.on_progress(*last_progress)
+        try:
+            self.widget.after(self.POLL_MS, self._poll)
+        except Exception:
+            pass  # widżet został zniszczony
+
+    def throughput(self, done):
+        elapsed = time.perf_counter() - (self.started_at or time.perf_counter())
+        return done / elapsed if elapsed > 0 else 0.0